@@ -1,68 +1,68 @@
-import matplotlib.pyplot as plt
 import numpy as np
 import argparse
-import argparse
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'processor'))
+from manchester import decodeManchesterFrames, FRAME_SYMBOLS
+
 parser = argparse.ArgumentParser()
 parser.add_argument("-f", "--filename", help="path to recording")
+parser.add_argument("-o", "--output", help="write the frame image to this PNG file instead of showing it")
+parser.add_argument("--chunk", type=int, default=4096, help="frames read from the recording at once")
+parser.add_argument("--max-rows", type=int, default=2000, help="image height, consecutive frames are averaged together above this")
 args = parser.parse_args()
 
-def decodeManchester(arr):
-	length = len(arr)
-
-	index = 0
-
-	decoded_arr = []
-	if not length % 2 == 0:
-		raise Exception("array must be of even length!")
-
-	while True:
-		if arr[index] == False and arr[index + 1] == True:
-			decoded_arr.append(False)
-			index = index + 2
-		elif arr[index] == True and arr[index + 1] == False:
-			decoded_arr.append(True)
-			index = index + 2
-		else:
-			raise Exception("Bad symbol decode at index {I}".format(I=index))
+import matplotlib
+if args.output:
+	matplotlib.use('Agg')
+import matplotlib.pyplot as plt
 
-		if index + 1 > length:
-			break
 
-	return decoded_arr
+def readFrames(filename, chunk):
+	'''
+	Memory-map a recording (1 byte per symbol) and yield (first frame index, (n, 1200) symbol view) chunks.
+	'''
+	recording = np.memmap(filename, dtype=np.uint8, mode='r')
+	n_frames = len(recording) // FRAME_SYMBOLS
+	for start in range(0, n_frames, chunk):
+		stop = min(start + chunk, n_frames)
+		yield start, recording[start*FRAME_SYMBOLS:stop*FRAME_SYMBOLS].reshape(-1, FRAME_SYMBOLS)
 
-symbols = []
-file = open(args.filename, "rb")
-byte = file.read(1)
-while byte:
-	val = ord(byte)
-	byte = file.read(1)
-	if val == 1:
-		symbols.append(True)
-	else:
-		symbols.append(False)
 
-file.close()
+n_frames = os.path.getsize(args.filename) // FRAME_SYMBOLS
+frames_per_row = max(1, -(-n_frames // args.max_rows))
+n_rows = -(-n_frames // frames_per_row)
 
-formatted_frames = np.array(symbols).reshape(-1,1200)
+#Only the downsampled image is kept in memory, every row is the average of frames_per_row decoded frames
+row_sums = np.zeros((n_rows, FRAME_SYMBOLS // 2), dtype=np.float32)
+row_counts = np.zeros(n_rows, dtype=np.int64)
 
-decoded_frames = []
 good_frames = 0
 bad_frames = 0
-for frame in formatted_frames:
-	try:
-		decoded_frame = decodeManchester(frame)
-		decoded_frames.append(decoded_frame)
-		good_frames += 1
-	except Exception as e:
-		bad_frames += 1
+for start, symbols in readFrames(args.filename, args.chunk):
+	frames, valid = decodeManchesterFrames(symbols)
+	good_frames += int(np.count_nonzero(valid))
+	bad_frames += len(valid) - int(np.count_nonzero(valid))
+
+	rows = (start + np.flatnonzero(valid)) // frames_per_row
+	np.add.at(row_sums, rows, np.unpackbits(frames[valid], axis=1))
+	np.add.at(row_counts, rows, 1)
+
+image = row_sums[row_counts > 0] / row_counts[row_counts > 0, None]
 
-print('Processed {N} frames:'.format(N=len(formatted_frames)))
+print('Processed {N} frames:'.format(N=n_frames))
 print('{N} GOOD frames'.format(N=good_frames))
 print('{N} BAD frames'.format(N=bad_frames))
+if frames_per_row > 1:
+	print('{N} frames per image row'.format(N=frames_per_row))
 
 
 fig = plt.figure()
 fig.suptitle(args.filename)
 ax = fig.add_subplot(111)
-ax.imshow(decoded_frames, aspect='auto', cmap=plt.cm.gray, interpolation='nearest')
-plt.show()
+ax.imshow(image, aspect='auto', cmap=plt.cm.gray, interpolation='nearest')
+if args.output:
+	fig.savefig(args.output)
+else:
+	plt.show()
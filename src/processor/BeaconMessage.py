@@ -1,7 +1,12 @@
 from bitarray import bitarray, util
 import datetime
 import logging
-from countries import countries
+import numpy as np
+from collections import OrderedDict, namedtuple
+from threading import Lock
+from types import MappingProxyType
+from countries import COUNTRIES
+from bch import checkBeacon
 
 logger = logging.getLogger('event_logger')
 
@@ -27,20 +32,7 @@ USER_PROTOCOLS_SHORTENED = {
 		7: "Test User"
 		}
 
-POS_SOURCE_BIT = {
-		False: "External",
-		True: "Internal"
-		}
-
-POS_LAT_FLAG = {
-		False: "N",
-		True: "S"
-		}
-
-POS_LON_FLAG = {
-		False: "E",
-		True: "W"
-		}
+SHORT_BEACON_LENGTH = 88
 
 MODIFIED_BAUDOT = {
 		56: "A",
@@ -85,11 +77,328 @@ MODIFIED_BAUDOT = {
 		}
 
 
+#Beacon message layouts, C/S T.001 annex A. Bit 0 is the format flag (bit 25 of the transmitted message), so bit b of the
+#specification is at index b - 25. Fields are (name, start, length, encoding), encoded fields are decoded into strings.
+#PDF-1 fields apply to short and long messages, the short/long fields only to messages of that length.
+BeaconField = namedtuple('BeaconField', ['name', 'start', 'length', 'encoding'])
+Coordinate = namedtuple('Coordinate', ['flag', 'parts']) #flag bit set for S/W, parts (start, length, degrees per unit)
+Offset = namedtuple('Offset', ['sign', 'parts']) #sign bit set to add the offset to the coarse position
+BeaconPosition = namedtuple('BeaconPosition', ['latitude', 'longitude', 'offset_check', 'latitude_offset', 'longitude_offset'])
+BeaconLayout = namedtuple('BeaconLayout', ['protocol', 'name', 'shortened', 'fields', 'short_fields', 'long_fields', 'position'])
+
+
+def field(name, start, length, encoding=None):
+	return BeaconField(name, start, length, encoding)
+
+
+COMMON_FIELDS = [field('format_flag', 0, 1), field('protocol_flag', 1, 1), field('country_code', 2, 10)]
+
+AUX_DEVICE = field('aux_device', 59, 2) #auxiliary radio locating device
+USER_SHORT_FIELDS = [field('emergency_code_flag', 82, 1), field('activation_type', 83, 1), field('emergency_code', 84, 4)]
+USER_LOCATION_FIELDS = [field('position_source', 82, 1)]
+USER_LOCATION_POSITION = BeaconPosition(
+		latitude=Coordinate(83, ((84, 7, 1.0), (91, 4, 4/60.0))),
+		longitude=Coordinate(95, ((96, 8, 1.0), (104, 4, 4/60.0))),
+		offset_check=None, latitude_offset=None, longitude_offset=None)
+
+
+def userLayout(code, fields, long_fields=(), position=None, name=None, shortened=None):
+	return BeaconLayout('USER' if position is None else 'USER_LOCATION', name or USER_PROTOCOLS[code], shortened or USER_PROTOCOLS_SHORTENED[code],
+						fields, USER_SHORT_FIELDS, list(long_fields), position)
+
+
+SERIAL_FIELDS = [field('serial_type', 15, 3), field('cs_certificate_flag', 18, 1), field('cs_certificate', 49, 10), AUX_DEVICE]
+SERIAL_NUMBER_FIELDS = [field('serial_number', 19, 20), field('national_use', 39, 10)]
+SERIAL_TYPES = {
+		0: ('ELT', SERIAL_NUMBER_FIELDS),
+		1: ('ELT Operator', [field('operator_designator', 19, 15, 'baudot5'), field('serial_number', 34, 12)]),
+		2: ('EPIRB Float Free', SERIAL_NUMBER_FIELDS),
+		3: ('ELT Aircraft Address', [field('aircraft_address', 19, 24), field('additional_elts', 43, 6)]),
+		4: ('EPIRB Non Float Free', SERIAL_NUMBER_FIELDS),
+		5: ('Spare', [field('serial_data', 19, 30)]),
+		6: ('PLB', SERIAL_NUMBER_FIELDS),
+		7: ('Spare', [field('serial_data', 19, 30)])
+		}
+
+#keyed by (user protocol code, serial user beacon type), the beacon type only matters for the serial user protocol
+USER_LAYOUTS = {}
+for serial_type in range(8):
+	USER_LAYOUTS[(0, serial_type)] = userLayout(0, [field('orbitography_data', 15, 46)])
+	USER_LAYOUTS[(1, serial_type)] = userLayout(1, [field('aircraft_registration', 15, 42, 'baudot'), field('elt_number', 57, 2), AUX_DEVICE],
+												USER_LOCATION_FIELDS, USER_LOCATION_POSITION)
+	USER_LAYOUTS[(2, serial_type)] = userLayout(2, [field('mmsi_callsign', 15, 36, 'baudot'), field('beacon_number', 51, 6, 'baudot'), AUX_DEVICE],
+												USER_LOCATION_FIELDS, USER_LOCATION_POSITION)
+	USER_LAYOUTS[(3, serial_type)] = userLayout(3, SERIAL_FIELDS + SERIAL_TYPES[serial_type][1], USER_LOCATION_FIELDS, USER_LOCATION_POSITION,
+												name='{NAME} - {TYPE}'.format(NAME=USER_PROTOCOLS[3], TYPE=SERIAL_TYPES[serial_type][0]))
+	USER_LAYOUTS[(4, serial_type)] = userLayout(4, [field('national_use', 15, 46)], [field('national_use_pdf2', 82, 26)])
+	USER_LAYOUTS[(5, serial_type)] = userLayout(5, [])
+	USER_LAYOUTS[(6, serial_type)] = userLayout(6, [field('radio_callsign', 15, 36, 'callsign'), field('beacon_number', 51, 6, 'baudot'), AUX_DEVICE],
+												USER_LOCATION_FIELDS, USER_LOCATION_POSITION)
+	USER_LAYOUTS[(7, serial_type)] = userLayout(7, [field('test_data', 15, 46)], [field('test_data_pdf2', 82, 26)])
+
+#Location protocols are defined for long messages, PDF-2 carries the position offsets
+STANDARD_LOCATION_POSITION = BeaconPosition(
+		latitude=Coordinate(40, ((41, 9, 0.25),)),
+		longitude=Coordinate(50, ((51, 10, 0.25),)),
+		offset_check=(82, 4, 0b1101),
+		latitude_offset=Offset(88, ((89, 5, 1/60.0), (94, 4, 4/3600.0))),
+		longitude_offset=Offset(98, ((99, 5, 1/60.0), (104, 4, 4/3600.0))))
+STANDARD_LOCATION_FIELDS = [field('position_source', 86, 1), field('homing', 87, 1)]
+
+NATIONAL_LOCATION_POSITION = BeaconPosition(
+		latitude=Coordinate(34, ((35, 7, 1.0), (42, 5, 2/60.0))),
+		longitude=Coordinate(47, ((48, 8, 1.0), (56, 5, 2/60.0))),
+		offset_check=(82, 3, 0b110),
+		latitude_offset=Offset(88, ((89, 2, 1/60.0), (91, 4, 4/3600.0))),
+		longitude_offset=Offset(95, ((96, 2, 1/60.0), (98, 4, 4/3600.0))))
+NATIONAL_LOCATION_FIELDS = [field('additional_data_flag', 85, 1), field('position_source', 86, 1), field('homing', 87, 1), field('national_use', 102, 6)]
+
+
+def standardLocation(name, shortened, fields):
+	return BeaconLayout('STANDARD_LOCATION', name, shortened, fields, [], STANDARD_LOCATION_FIELDS, STANDARD_LOCATION_POSITION)
+
+
+def nationalLocation(name, shortened):
+	return BeaconLayout('NATIONAL_LOCATION', name, shortened, [field('national_id', 16, 18)], [], NATIONAL_LOCATION_FIELDS, NATIONAL_LOCATION_POSITION)
+
+
+LOCATION_SERIAL_FIELDS = [field('cs_certificate', 16, 10), field('serial_number', 26, 14)]
+LOCATION_LAYOUTS = {
+		0: BeaconLayout('SPARE', 'Spare Location Protocol', 'Spare', [], [], [], None),
+		1: BeaconLayout('SPARE', 'Spare Location Protocol', 'Spare', [], [], [], None),
+		2: standardLocation('EPIRB - MMSI Standard Location Protocol', 'Std Loc EPIRB MMSI', [field('mmsi', 16, 20), field('specific_beacon_number', 36, 4)]),
+		3: standardLocation('ELT - 24-bit Address Standard Location Protocol', 'Std Loc ELT Address', [field('aircraft_address', 16, 24)]),
+		4: standardLocation('ELT - Serial Standard Location Protocol', 'Std Loc ELT Serial', LOCATION_SERIAL_FIELDS),
+		5: standardLocation('ELT - Operator Designator Standard Location Protocol', 'Std Loc ELT Operator',
+							[field('operator_designator', 16, 15, 'baudot5'), field('serial_number', 31, 9)]),
+		6: standardLocation('EPIRB - Serial Standard Location Protocol', 'Std Loc EPIRB Serial', LOCATION_SERIAL_FIELDS),
+		7: standardLocation('PLB - Serial Standard Location Protocol', 'Std Loc PLB Serial', LOCATION_SERIAL_FIELDS),
+		8: nationalLocation('ELT - National Location Protocol', 'Nat Loc ELT'),
+		9: BeaconLayout('ELT_DT_LOCATION', 'ELT(DT) Location Protocol', 'ELT(DT) Loc', [field('identification_data', 16, 24)], [], [], None),
+		10: nationalLocation('EPIRB - National Location Protocol', 'Nat Loc EPIRB'),
+		11: nationalLocation('PLB - National Location Protocol', 'Nat Loc PLB'),
+		12: standardLocation('Ship Security Standard Location Protocol', 'Std Loc SSAS', [field('mmsi', 16, 20)]),
+		13: BeaconLayout('RLS_LOCATION', 'RLS Location Protocol', 'RLS Loc', [field('identification_data', 16, 24)], [], [], None),
+		14: standardLocation('Test Standard Location Protocol', 'Std Loc Test', [field('test_data', 16, 24)]),
+		15: nationalLocation('Test National Location Protocol', 'Nat Loc Test')
+		}
+
+#Flat list of all layouts, the batch decoder works on the index of the layout of every beacon
+LAYOUTS = list(USER_LAYOUTS.values()) + list(LOCATION_LAYOUTS.values())
+USER_LAYOUT_INDEX = np.array([LAYOUTS.index(USER_LAYOUTS[(code, serial_type)]) for code in range(8) for serial_type in range(8)])
+LOCATION_LAYOUT_INDEX = np.array([len(USER_LAYOUTS) + code for code in range(16)])
+LAYOUT_PROTOCOL_NUMS = np.array([code for code, serial_type in USER_LAYOUTS] + [-1]*len(LOCATION_LAYOUTS)) #protocol_num, -1 for 'N/A'
+
+BAUDOT_TABLE = [MODIFIED_BAUDOT.get(code, '*') for code in range(64)]
+BAUDOT5_TABLE = [MODIFIED_BAUDOT.get(32 | code, '*') for code in range(32)] #letters without their leading 1
+BCD_TABLE = [str(digit) for digit in range(10)] + ['*']*6
+
+
+def encodingSegments(encoding, length):
+	'''
+	(bits, table) of every character of an encoded field.
+	'''
+	if encoding == 'baudot':
+		return [(6, BAUDOT_TABLE)]*(length//6)
+	if encoding == 'baudot5':
+		return [(5, BAUDOT5_TABLE)]*(length//5)
+	if encoding == 'callsign':
+		return [(6, BAUDOT_TABLE)]*4 + [(4, BCD_TABLE)]*3
+	raise ValueError("Unknown beacon field encoding {ENC}".format(ENC=encoding))
+
+
+def beaconLayout(beacon, beacon_length):
+	if (beacon >> (beacon_length - 2)) & 1:
+		return USER_LAYOUTS[((beacon >> (beacon_length - 15)) & 7, (beacon >> (beacon_length - 18)) & 7)]
+	return LOCATION_LAYOUTS[(beacon >> (beacon_length - 16)) & 15]
+
+
+def layoutFields(layout, beacon_length):
+	return COMMON_FIELDS + layout.fields + (layout.long_fields if beacon_length > SHORT_BEACON_LENGTH else layout.short_fields)
+
+
+def protocolNumber(beacon, beacon_length):
+	'''
+	protocol_num of a beacon given as integer of beacon_length bits, without decoding the rest of the beacon.
+	'''
+	if (beacon >> (beacon_length - 2)) & 1: #protocol flag set, user protocol
+		return (beacon >> (beacon_length - 15)) & 7
+	return 'N/A'
+
+
+#The 15 hex ID of a beacon are bits 1 up to 61 (bits 26-85 of the message)
+BEACON_ID_START, BEACON_ID_STOP = 1, 61
+
+
+def beaconId(beacon, beacon_length):
+	'''
+	15 hex ID of a beacon given as integer of beacon_length bits. The PDF-1 position of location protocols is replaced by
+	its default value: N/E flag, all bits of the coarse part set and the finer parts 0.
+	'''
+	beacon_id = (beacon >> (beacon_length - BEACON_ID_STOP)) & ((1 << (BEACON_ID_STOP - BEACON_ID_START)) - 1)
+	position = beaconLayout(beacon, beacon_length).position
+	if position is not None:
+		for coordinate in (position.latitude, position.longitude):
+			if coordinate.flag >= BEACON_ID_STOP: #position in PDF-2, not part of the ID
+				continue
+			beacon_id &= ~(1 << (BEACON_ID_STOP - 1 - coordinate.flag))
+			for part, (start, length, unit) in enumerate(coordinate.parts):
+				mask = ((1 << length) - 1) << (BEACON_ID_STOP - start - length)
+				beacon_id = beacon_id | mask if part == 0 else beacon_id & ~mask
+	return '{ID:015X}'.format(ID=beacon_id)
+
+
+def decodeBeaconFields(beacon, beacon_length):
+	'''
+	The layout fields and position (degrees, negative for S/W, NaN when not available) of a beacon given as integer of beacon_length bits.
+	'''
+	def value(start, length):
+		return (beacon >> (beacon_length - start - length)) & ((1 << length) - 1)
+
+	layout = beaconLayout(beacon, beacon_length)
+	data = {'protocol': layout.protocol, 'protocol_name': layout.name, 'protocol_name_shortened': layout.shortened,
+			'protocol_num': protocolNumber(beacon, beacon_length)}
+	if layout.protocol not in ('USER', 'USER_LOCATION'):
+		data['location_protocol_num'] = value(12, 4)
+
+	for name, start, length, encoding in layoutFields(layout, beacon_length):
+		if encoding is None:
+			data[name] = value(start, length)
+		else:
+			characters = []
+			for bits, table in encodingSegments(encoding, length):
+				characters.append(table[value(start, bits)])
+				start += bits
+			data[name] = ''.join(characters)
+
+	data['latitude'] = data['longitude'] = float('nan')
+	position = layout.position
+	if position is not None and beacon_length > SHORT_BEACON_LENGTH:
+		offsets = position.offset_check is not None and value(*position.offset_check[:2]) == position.offset_check[2]
+		for key, coordinate, offset, limit in (('latitude', position.latitude, position.latitude_offset, 90.0),
+												('longitude', position.longitude, position.longitude_offset, 180.0)):
+			degrees = sum(value(start, length)*scale for start, length, scale in coordinate.parts)
+			if offsets:
+				degrees += (1 if value(offset.sign, 1) else -1)*sum(value(start, length)*scale for start, length, scale in offset.parts)
+			if 0 <= degrees <= limit:
+				data[key] = -degrees if value(coordinate.flag, 1) else degrees
+	return data
+
+
+def decodeBeacons(beacons, beacon_lengths):
+	'''
+	Vectorized decodeBeaconFields() of the decodeMessages() beacon and beacon_length columns, returns a dict of (M,) columns:
+	layout (index in LAYOUTS), every layout field (-1 or '' where the field does not apply to the beacon), latitude and longitude.
+	Beacons are grouped by layout, there is no Python code per beacon.
+	'''
+	bits = np.unpackbits(np.asarray(beacons, dtype=np.uint8).reshape(len(beacon_lengths), -1), axis=1).astype(np.int64)
+	beacon_lengths = np.asarray(beacon_lengths)
+	long = beacon_lengths > SHORT_BEACON_LENGTH
+	#short beacons are left aligned in the column, field positions count from the first bit for both lengths
+
+	def value(rows, start, length):
+		return bits[rows, start:start + length] @ (1 << np.arange(length - 1, -1, -1, dtype=np.int64))
+
+	everything = np.arange(len(bits))
+	layouts = np.where(value(everything, 1, 1) == 1,
+						USER_LAYOUT_INDEX[value(everything, 12, 3)*8 + value(everything, 15, 3)],
+						LOCATION_LAYOUT_INDEX[value(everything, 12, 4)])
+	columns = {'layout': layouts, 'latitude': np.full(len(bits), np.nan), 'longitude': np.full(len(bits), np.nan)}
+
+	for index in np.unique(layouts):
+		layout = LAYOUTS[index]
+		selected = layouts == index
+		for fields, rows in ((COMMON_FIELDS + layout.fields, selected), (layout.short_fields, selected & ~long), (layout.long_fields, selected & long)):
+			rows = np.flatnonzero(rows)
+			if len(rows) == 0:
+				continue
+			for name, start, length, encoding in fields:
+				if encoding is None:
+					column = columns.setdefault(name, np.full(len(bits), -1, dtype=np.int64))
+					column[rows] = value(rows, start, length)
+				else:
+					segments = encodingSegments(encoding, length)
+					characters = np.empty((len(rows), len(segments)), dtype='U1')
+					for number, (segment_bits, table) in enumerate(segments):
+						characters[:, number] = np.array(table)[value(rows, start, segment_bits)]
+						start += segment_bits
+					column = columns.setdefault(name, np.full(len(bits), '', dtype='U{N}'.format(N=len(segments))))
+					column[rows] = characters.view('U{N}'.format(N=len(segments))).ravel()
+
+		position = layout.position
+		rows = np.flatnonzero(selected & long)
+		if position is None or len(rows) == 0:
+			continue
+		if position.offset_check is not None:
+			start, length, check = position.offset_check
+			offsets = value(rows, start, length) == check
+		else:
+			offsets = np.zeros(len(rows), dtype=bool)
+		for key, coordinate, offset, limit in (('latitude', position.latitude, position.latitude_offset, 90.0),
+												('longitude', position.longitude, position.longitude_offset, 180.0)):
+			degrees = sum(value(rows, start, length)*scale for start, length, scale in coordinate.parts)
+			if offset is not None:
+				magnitude = sum(value(rows, start, length)*scale for start, length, scale in offset.parts)
+				degrees = degrees + np.where(offsets, np.where(value(rows, offset.sign, 1) == 1, magnitude, -magnitude), 0.0)
+			degrees = np.where((degrees >= 0) & (degrees <= limit), degrees, np.nan)
+			columns[key][rows] = np.where(value(rows, coordinate.flag, 1) == 1, -degrees, degrees)
+	return columns
+
+
+class BeaconCache(object):
+
+	'''
+	Bounded LRU cache of decoded beacons keyed by the beacon bits, a beacon repeats every ~50 s and again in every playback dump.
+	The cached fields are shared by all messages of the same beacon and therefore read-only, a size of 0 disables the cache.
+	'''
+
+	def __init__(self, size=4096):
+		self.size = size
+		self.hits = 0
+		self.misses = 0
+		self.cache = OrderedDict()
+		self.lock = Lock()
+
+	def __len__(self):
+		return len(self.cache)
+
+	def resize(self, size):
+		with self.lock:
+			self.size = size
+			while len(self.cache) > self.size:
+				self.cache.popitem(last=False)
+
+	def lookup(self, beacon_message):
+		key = (len(beacon_message.bitarray), beacon_message.bitarray.tobytes())
+		with self.lock:
+			data = self.cache.get(key)
+			if data is not None:
+				self.cache.move_to_end(key)
+				self.hits += 1
+				return data
+			self.misses += 1
+
+		data = MappingProxyType(beacon_message.decode())
+		with self.lock:
+			if self.size > 0:
+				self.cache[key] = data
+				if len(self.cache) > self.size:
+					self.cache.popitem(last=False)
+		return data
+
+	def stats(self):
+		with self.lock:
+			return {'size': self.size, 'entries': len(self.cache), 'hits': self.hits, 'misses': self.misses}
+
+
+BEACON_CACHE = BeaconCache()
+
+
 class BeaconMessage(object):
 
 
 	def __init__(self, beacon_bitarray, creation_time):
-		length = beacon_bitarray.length()
+		length = len(beacon_bitarray)
 		'''
 		if int(length) != 88:
 			raise ValueError("Supplied bitarray length is not compatible with a short beacon message (88), got {BITS} bits instead".format(BITS=length))
@@ -99,86 +408,35 @@ class BeaconMessage(object):
 
 		self.bitarray = beacon_bitarray
 		self.creation_time = creation_time
+		self._data = None
 
-		self.data = {}
-		self.data['type'] = 'N/A'
-		self.data['BCH-1'] = 'N/A'
-		self.data['BCH-2'] = 'N/A'
-		self.data['format_flag'] = 'N/A'
-		self.data['country_code'] = 'N/A'
-		self.data['country_name'] = 'N/A'
-		self.data['country_name_alpha2'] = 'N/A'
-		self.data['protocol_num'] = 'N/A'
-		self.data['protocol_name'] = 'N/A'
-		self.data['protocol_name_shortened'] = 'N/A'
-		self.data['beacon_hex'] = util.ba2hex(self.bitarray).decode('utf-8')
-
-		if length == 88:
-			self.data['type'] = 'SHORT'
-			self.data['BCH-1'] = self.bitarray[61:82]
-		else:
-			self.data['type'] = 'LONG'
-			self.data['BCH-1'] = self.bitarray[61:82]
-			self.data['BCH-2'] = self.bitarray[107:119]
-
-
-		self.data['format_flag'] = self.bitarray[0]
-		self.data['protocol_flag'] = self.bitarray[1]
-		self.data['country_code'] = util.ba2int(self.bitarray[2:12])
-		try:
-			self.data['country_name'] = countries[str(self.data['country_code'])][3]
-			self.data['country_name_alpha2'] = countries[str(self.data['country_code'])][0]
-		except Exception as e:
-			pass
-
-		if (self.data['type'] == 'SHORT' and self.data['protocol_flag']) or (self.data['type'] == 'LONG' and self.data['protocol_flag']):
-			self.data['protocol'] = 'USER'
-			self.data['protocol_num'] = util.ba2int(self.bitarray[11:14])
-			self.data['protocol_name'] = USER_PROTOCOLS[self.data['protocol_num']]
-
-			if self.data['protocol_name'] == 0:
-				self.data['id'] = util.ba2int(self.bitarray[15:61])
-				self.data['id_type'] = 'Orbitography data'
-			elif self.data['protocol_name'] == 1:
-				self.data['id'] = util.ba2int(self.bitarray[15:57])
-				self.data['id_type'] = 'Aircraft Registration Marking'
-			elif self.data['protocol_name'] == 2:
-				self.data['id'] = util.ba2int(self.bitarray[15:57])
-				self.data['id_type'] = 'MMSI or Call Sign'
-			elif self.data['protocol_name'] == 3:
-				self.data['id'] = util.ba2int(self.bitarray[19:49])
-				self.data['id_type'] = 'Serial Number'
-			'''
-			elif self.data['protocol_name'] == 4:
-
-			elif self.data['protocol_name'] == 5:
-
-			elif self.data['protocol_name'] == 6:
-
-			elif self.data['protocol_name'] == 7:
-			'''
-
-			if self.data['country_name_alpha2'] == 'FR' and self.data['type'] == 'LONG' and self.data['protocol_num'] == 4:
-				#print(self.bitarray.to01())
-				#print(self.data['BCH-2'].to01())
-				pass
-
-
-
-			self.data['protocol_name_shortened'] = USER_PROTOCOLS_SHORTENED[self.data['protocol_num']]
-			if self.data['protocol_name'] == USER_PROTOCOLS[6]:
-				self.data['radio_callsign'] = MODIFIED_BAUDOT.get(util.ba2int(self.bitarray[15:21]), '*') + MODIFIED_BAUDOT.get(util.ba2int(self.bitarray[21:27]), '*') + MODIFIED_BAUDOT.get(util.ba2int(self.bitarray[27:33]), '*') + MODIFIED_BAUDOT.get(util.ba2int(self.bitarray[33:39]), '*')
-
-			if self.data['type'] == 'LONG':
-				self.data['pos_source'] = POS_SOURCE_BIT[self.bitarray[82]]
-				self.data['pos_lat_flag'] = POS_LAT_FLAG[self.bitarray[83]]
-				self.data['pos_lat_deg'] = util.ba2int(self.bitarray[84:91])
-				self.data['pos_lat_min'] = util.ba2int(self.bitarray[91:95])*(4.0/60)
-
-				self.data['pos_lon_flag'] = POS_LON_FLAG[self.bitarray[95]]
-				self.data['pos_lon_deg'] = util.ba2int(self.bitarray[95:103])
-				self.data['pos_lon_min'] = util.ba2int(self.bitarray[103:107])*(4.0/60)
-
-				#logger.info("Position is {NS}{LAT}°{LATMIN}' {EW}{LON}°{LONMIN}'".format(NS=self.data['pos_lat_flag'], LAT=self.data['pos_lat_deg'], LATMIN=self.data['pos_lat_min'], EW=self.data['pos_lon_flag'], LON=self.data['pos_lon_deg'], LONMIN=self.data['pos_lon_min']))
-		else:
-			self.data['protocol'] ='STANDARD_NATIONAL'
+	@property
+	def data(self):
+		'''
+		The decoded beacon fields, looked up in BEACON_CACHE on first access.
+		'''
+		if self._data is None:
+			self._data = BEACON_CACHE.lookup(self)
+		return self._data
+
+	def decode(self):
+		length = len(self.bitarray)
+		received = util.ba2int(self.bitarray)
+		bch1_errors, bch2_errors, beacon = checkBeacon(received, length) #fields are decoded from the corrected bits
+
+		#The record is shared through BEACON_CACHE, so it only holds immutable values: the parity bits as bit strings
+		data = {}
+		data['type'] = 'SHORT' if length == SHORT_BEACON_LENGTH else 'LONG'
+		data['BCH-1'] = format(beacon >> (length - 82) & 0x1FFFFF, '021b')
+		data['BCH-2'] = format(beacon & 0xFFF, '012b') if length > SHORT_BEACON_LENGTH else 'N/A'
+		data['BCH-1_errors'] = bch1_errors
+		data['BCH-2_errors'] = bch2_errors if bch2_errors is not None else 'N/A'
+		data['bch_valid'] = bch1_errors >= 0 and (bch2_errors is None or bch2_errors >= 0)
+		data['beacon_hex'] = format(beacon, '0{N}x'.format(N=length//4)) #util.ba2hex returns bytes or str depending on the bitarray version
+		data['beacon_id'] = beaconId(beacon, length)
+
+		data.update(decodeBeaconFields(beacon, length))
+		country = COUNTRIES.get(data['country_code'])
+		data['country_name'] = country[3] if country is not None else 'N/A'
+		data['country_name_alpha2'] = country[0] if country is not None else 'N/A'
+		return data
@@ -0,0 +1,128 @@
+import queue
+import logging
+import multiprocessing
+import numpy as np
+from multiprocessing import shared_memory
+from threading import Thread
+from manchester import FRAME_SYMBOLS
+from decodeworker import decodeSymbols, initWorker, decodeSlots, workerMain
+
+logger = logging.getLogger('event_logger')
+
+
+class DecodePipeline(object):
+
+	'''
+	Decodes symbol payloads in a pool of worker processes behind the receiver.
+	submit() copies the payload into a free shared memory slot, flush() hands the slot numbers submitted since the
+	previous flush to the pool as one task. The sequencer thread restores the submission order and calls
+	deliver(source, sarp_frame, error, symbols, creation_time) for every payload, symbols is only valid during the call. The receiver takes at most available() payloads
+	off its sockets, so the others stay queued there. submit() never waits, when all slots are in flight the payload is dropped and submit() returns False.
+	'''
+
+	def __init__(self, deliver, workers, n_slots=256):
+		self.deliver = deliver
+		self.n_slots = n_slots
+		self.memory = shared_memory.SharedMemory(create=True, size=n_slots*FRAME_SYMBOLS)
+		self.slots = np.ndarray((n_slots, FRAME_SYMBOLS), dtype=np.uint8, buffer=self.memory.buf)
+
+		self.free = queue.Queue()
+		for slot in range(n_slots):
+			self.free.put(slot)
+		self.results = queue.Queue()
+		self.next_seq = 0
+		self.tasks = []
+
+		#spawn, forking the GUI process with its threads is not safe
+		with workerMain():
+			self.pool = multiprocessing.get_context('spawn').Pool(workers, initializer=initWorker, initargs=(self.memory.name, n_slots))
+		self.sequencer = Thread(target=self.sequence, daemon=True)
+		self.sequencer.start()
+		logger.info('Started {N} decode processes with {SLOTS} shared memory slots'.format(N=workers, SLOTS=n_slots))
+
+	def submit(self, symbols, message_format, source, creation_time):
+		if len(symbols) != FRAME_SYMBOLS: #does not fit a slot and fails anyway, decode it right here
+			self.results.put((self.nextSeq(), symbols, source, creation_time) + decodeSymbols(symbols, message_format, source, creation_time))
+			return True
+
+		if self.free.empty():
+			self.flush()
+		try:
+			slot = self.free.get_nowait()
+		except queue.Empty: #the workers are behind, shed the payload rather than stall the receiver
+			return False
+		self.slots[slot] = symbols
+		self.tasks.append((self.nextSeq(), slot, message_format, source, creation_time))
+		return True
+
+	def available(self, timeout):
+		'''
+		Number of free slots, waits up to timeout seconds for a slot when all of them are in flight.
+		The submitted payloads are handed to the pool first, so their slots can come back.
+		'''
+		if self.free.empty():
+			self.flush()
+			try:
+				self.free.put(self.free.get(timeout=timeout))
+			except queue.Empty:
+				return 0
+		return self.free.qsize()
+
+	def nextSeq(self):
+		seq = self.next_seq
+		self.next_seq += 1
+		return seq
+
+	def flush(self):
+		if self.tasks:
+			tasks = self.tasks
+			self.pool.apply_async(decodeSlots, (tasks,), callback=self.queueResults, error_callback=lambda error: self.queueErrors(tasks, error))
+			self.tasks = []
+
+	def queueResults(self, results):
+		for result in results:
+			self.results.put(result)
+
+	def queueErrors(self, tasks, error):
+		'''
+		A task that failed in the pool is delivered as a bad decode of all its payloads, so the sequencer carries on and the slots are freed.
+		'''
+		logger.error('Decode of {N} payloads failed: {ERR}'.format(N=len(tasks), ERR=error))
+		for seq, slot, message_format, source, creation_time in tasks:
+			self.results.put((seq, slot, source, creation_time, None, str(error)))
+
+	def sequence(self):
+		pending = {}
+		next_seq = 0
+		while True:
+			result = self.results.get()
+			if result is None:
+				break
+			seq, slot, source, creation_time, sarp_frame, error = result
+			pending[seq] = (slot, source, creation_time, sarp_frame, error)
+			while next_seq in pending:
+				slot, source, creation_time, sarp_frame, error = pending.pop(next_seq)
+				try:
+					if isinstance(slot, int):
+						self.deliver(source, sarp_frame, error, self.slots[slot], creation_time)
+					else: #payload that did not fit a slot
+						self.deliver(source, sarp_frame, error, slot, creation_time)
+				except Exception:
+					logger.exception('Delivery of payload {SEQ} failed'.format(SEQ=next_seq))
+				finally:
+					if isinstance(slot, int):
+						self.free.put(slot) #the payload stays in its slot until it is delivered
+				next_seq += 1
+
+	def close(self):
+		'''
+		Finish the submitted payloads, deliver their results and release the workers and shared memory.
+		'''
+		self.flush()
+		self.pool.close()
+		self.pool.join()
+		self.results.put(None)
+		self.sequencer.join()
+		del self.slots
+		self.memory.close()
+		self.memory.unlink()
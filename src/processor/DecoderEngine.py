@@ -0,0 +1,254 @@
+import zmq
+import numpy as np
+import logging
+import datetime
+from collections import namedtuple
+from threading import Thread
+from SARPMessage import MESSAGE_FORMATS, NA
+from SARPStore import SARPFrameStore, SARPMessageStore
+from DecodePipeline import DecodePipeline
+from decodeworker import decodeSymbols
+
+logger = logging.getLogger('event_logger')
+
+DEFAULT_MESSAGE_FORMAT = 'SARSAT SARP-3'
+
+#One symbol stream published by a GNU Radio flowgraph, frames and messages are tagged with the index of their stream
+Stream = namedtuple('Stream', ['endpoint', 'message_format', 'label'])
+
+
+def readStreams(config):
+	'''
+	Streams listed in the [NETWORK] STREAMS option of config.ini, every name refers to a [STREAM <name>] section with
+	ENDPOINT, FORMAT and LABEL. Without STREAMS the single flowgraph on SYMBOL_STREAM_PORT of localhost is used.
+	'''
+	names = config.get('NETWORK', 'STREAMS', fallback='').split()
+	if not names:
+		port = config.getint('NETWORK', 'SYMBOL_STREAM_PORT', fallback=38211)
+		return [Stream('tcp://127.0.0.1:{PORT}'.format(PORT=port), DEFAULT_MESSAGE_FORMAT, 'localhost:{PORT}'.format(PORT=port))]
+
+	streams = []
+	for name in names:
+		section = 'STREAM ' + name
+		message_format = config.get(section, 'FORMAT', fallback=DEFAULT_MESSAGE_FORMAT)
+		if message_format not in MESSAGE_FORMATS:
+			raise ValueError("Unsupported message format {FMT} for stream {NAME}".format(FMT=message_format, NAME=name))
+		streams.append(Stream(config.get(section, 'ENDPOINT'), message_format, config.get(section, 'LABEL', fallback=name)))
+	return streams
+
+
+#Receive side settings: ZMQ receive high water mark and kernel buffer per socket (0 keeps the ZMQ/OS default),
+#maximum number of payloads drained from one socket per wake-up, and the delay after which a decoded frame counts as late
+ReceiveSettings = namedtuple('ReceiveSettings', ['hwm', 'buffer', 'drain_batch', 'late_ms'])
+DEFAULT_RECEIVE = ReceiveSettings(10000, 0, 1000, 1000)
+SLOT_WAIT = 0.1 #seconds the receiver waits for a free decode slot before polling again
+
+
+def readReceiveSettings(config):
+	'''
+	Receive settings from the [NETWORK] section of config.ini.
+	'''
+	return ReceiveSettings(config.getint('NETWORK', 'RCVHWM', fallback=DEFAULT_RECEIVE.hwm),
+						config.getint('NETWORK', 'RCVBUF', fallback=DEFAULT_RECEIVE.buffer),
+						config.getint('NETWORK', 'DRAIN_BATCH', fallback=DEFAULT_RECEIVE.drain_batch),
+						config.getint('NETWORK', 'LATE_MS', fallback=DEFAULT_RECEIVE.late_ms))
+
+
+class EngineConsumer(object):
+	'''
+	Base class for everything that wants to be notified by the DecoderEngine, override what you need.
+	All callbacks are invoked from the engine thread, or from the sequencer thread of its decode pipeline.
+	'''
+
+	def updateSymbolStatus(self, ok):
+		pass
+
+	def updateDecoderStatus(self, ok):
+		pass
+
+	def updateSyncStatus(self, ok):
+		pass
+
+	def updateFormatStatus(self, ok):
+		pass
+
+	def newFrame(self, sarp_frame):
+		pass
+
+	def newMessages(self, sarp_messages):
+		pass
+
+	def updateCounters(self, len_frames, len_messages):
+		pass
+
+	def updateReceiveCounters(self, received, dropped, late):
+		pass
+
+
+class DecoderEngine(Thread):
+	'''
+	Qt independent decoder, owns the ZMQ subscriptions to the flowgraphs, decodes the symbol streams
+	into SARP frames and messages and hands the results to the registered consumers.
+	All streams are served by one poller in the engine thread, with workers > 0 the payloads are decoded by a
+	DecodePipeline of that many processes and the engine thread only receives.
+	Every wake-up drains all queued payloads of the ready sockets into one batch. The engine counts received payloads,
+	payloads it dropped because the decode pipeline was full and frames decoded later than receive.late_ms after arrival.
+	Payloads dropped by ZMQ itself at the high water mark are not reported by PUB/SUB and can not be counted.
+	'''
+
+	def __init__(self, streams, frame_store=None, message_store=None, workers=0, slots=256, receive=DEFAULT_RECEIVE, archive=None):
+		Thread.__init__(self)
+		self.daemon = True
+		self.active = True
+		self.streams = list(streams)
+		self.workers = workers
+		self.slots = slots
+		self.pipeline = None
+		self.receive = receive
+		self.archive = archive
+		self.late_delay = datetime.timedelta(milliseconds=receive.late_ms)
+		self.received = 0
+		self.dropped = 0
+		self.late = 0
+
+		self.sarp_frames = frame_store if frame_store is not None else SARPFrameStore(100000)
+		self.sarp_messages = message_store if message_store is not None else SARPMessageStore(300000)
+		self.consumers = []
+
+		self.context = zmq.Context()
+		self.poller = zmq.Poller()
+		self.sockets = {}
+		for source, stream in enumerate(self.streams):
+			socket = self.context.socket(zmq.SUB)
+			socket.setsockopt(zmq.RCVHWM, receive.hwm) #before connect, the options apply to new connections only
+			if receive.buffer > 0:
+				socket.setsockopt(zmq.RCVBUF, receive.buffer)
+			socket.connect(stream.endpoint)
+			socket.setsockopt_string(zmq.SUBSCRIBE, "")
+			self.poller.register(socket, zmq.POLLIN)
+			self.sockets[socket] = source
+			logger.info('Started listening on {HOST} ({LABEL}, {FMT}) for incoming data from GNU Radio flowgraph'.format(
+				HOST=stream.endpoint, LABEL=stream.label, FMT=stream.message_format))
+
+	def addConsumer(self, consumer):
+		self.consumers.append(consumer)
+
+	def setMessageFormat(self, message_format, source=0):
+		self.streams[source] = self.streams[source]._replace(message_format=message_format)
+
+	def stop(self):
+		self.active = False
+
+	def notify(self, callback, *args):
+		for consumer in self.consumers:
+			try:
+				getattr(consumer, callback)(*args)
+			except Exception: #a failing consumer must not stop the receiver, the stores and the archive
+				logger.exception('Consumer {NAME}.{CALLBACK} failed'.format(NAME=type(consumer).__name__, CALLBACK=callback))
+
+	def processSymbols(self, symbols, source=0, receive_time=None):
+		if receive_time is None:
+			receive_time = datetime.datetime.utcnow()
+		sarp_frame, error = decodeSymbols(symbols, self.streams[source].message_format, source, receive_time)
+		self.deliver(source, sarp_frame, error, symbols, receive_time)
+
+	def drain(self, ready, limit=None):
+		'''
+		Receive every queued payload of the ready sockets without blocking, at most receive.drain_batch per socket and limit in total,
+		the rest stays queued in the sockets. Returns a list of (source, symbols, receive time).
+		'''
+		batch = []
+		for socket in ready:
+			source = self.sockets[socket]
+			count = self.receive.drain_batch if limit is None else min(self.receive.drain_batch, limit - len(batch))
+			for _ in range(count):
+				try:
+					frame = socket.recv(zmq.NOBLOCK, copy=False) #1200 symbols
+				except zmq.Again:
+					break
+				symbols = np.frombuffer(frame.buffer, dtype=np.uint8) #view on the zmq message buffer, no copy and no per-symbol objects
+				batch.append((source, symbols, datetime.datetime.utcnow()))
+		self.received += len(batch)
+		return batch
+
+	def deliver(self, source, sarp_frame, error, symbols, receive_time):
+		'''
+		Archive the received payload, store the decoded frame and its messages and notify the consumers, error is set for a bad decode.
+		'''
+		if self.archive:
+			self.archive.write(receive_time, source, symbols, sarp_frame.bytes if sarp_frame is not None else None, self.streams[source].message_format)
+		if datetime.datetime.utcnow() - receive_time > self.late_delay:
+			self.late += 1
+
+		if sarp_frame is None:
+			self.notify('updateDecoderStatus', False)
+			self.notify('updateSyncStatus', False)
+			self.notify('updateFormatStatus', False)
+			logger.error('BAD FRAME DECODE: %s, Source: %s', error, self.streams[source].label, extra={'event': 'bad_frame'})
+			self.notify('updateCounters', self.sarp_frames.count, self.sarp_messages.count)
+			return
+
+		self.notify('updateDecoderStatus', True)
+		self.sarp_frames.appendFrame(sarp_frame)
+		if sarp_frame.valid: #if the frame structure looks ok, proceed and get the messages
+			self.notify('updateSyncStatus', True)
+			messages = [sarp_frame.message1, sarp_frame.message2, sarp_frame.message3]
+			#HK messages and messages of an unknown format carry no beacon, format_valid alone is 'N/A' (truthy) for the latter
+			if all(message.record.format_valid is True and message.record.beacon is not None and message.record.format != NA for message in messages):
+				for message in messages:
+					self.sarp_messages.appendMessage(message)
+				self.notify('newMessages', messages)
+				self.notify('updateFormatStatus', True)
+			else:
+				self.notify('updateFormatStatus', False)
+		else:
+			self.notify('updateSyncStatus', False)
+			self.notify('updateFormatStatus', False)
+
+		self.notify('newFrame', sarp_frame)
+		#lazy formatting, most of these lines are sampled away by the event log
+		logger.info('GOOD FRAME DECODE: %d bytes, Frame valid: %s, Source: %s', sarp_frame.length, sarp_frame.valid, self.streams[source].label, extra={'event': 'good_frame'})
+		self.notify('updateCounters', self.sarp_frames.count, self.sarp_messages.count)
+
+	def run(self):
+		if self.workers > 0:
+			self.pipeline = DecodePipeline(self.deliver, self.workers, self.slots)
+
+		try:
+			while self.active:
+				ready = dict(self.poller.poll(1000))
+				if not ready:
+					self.notify('updateSymbolStatus', False)
+					self.notify('updateDecoderStatus', False)
+					self.notify('updateSyncStatus', False)
+					self.notify('updateFormatStatus', False)
+					continue
+
+				self.notify('updateSymbolStatus', True)
+				limit = None
+				if self.pipeline:
+					#only as many payloads as there are free slots are taken, the others wait in the socket queue up to RCVHWM
+					limit = self.pipeline.available(SLOT_WAIT)
+					if not limit:
+						continue
+				for source, symbols, receive_time in self.drain(ready, limit):
+					if self.pipeline:
+						if not self.pipeline.submit(symbols, self.streams[source].message_format, source, receive_time):
+							self.dropped += 1
+					else:
+						self.processSymbols(symbols, source, receive_time)
+				if self.pipeline:
+					self.pipeline.flush()
+				self.notify('updateReceiveCounters', self.received, self.dropped, self.late)
+		finally: #the stores, spill files and archive are closed also when the receiver fails
+			if self.pipeline:
+				self.pipeline.close()
+			for socket in self.sockets:
+				self.poller.unregister(socket)
+				socket.close()
+			self.sarp_frames.close()
+			self.sarp_messages.close()
+			if self.archive:
+				self.archive.close()
+		logger.info('Received {RECEIVED} payloads, dropped {DROPPED}, {LATE} frames late'.format(RECEIVED=self.received, DROPPED=self.dropped, LATE=self.late))
+		logger.info('Stopped listening on {HOSTS}'.format(HOSTS=', '.join(stream.endpoint for stream in self.streams)))
@@ -0,0 +1,248 @@
+import os
+import sqlite3
+import queue
+import logging
+from threading import Thread
+from SARPMessage import NA
+from DecoderEngine import EngineConsumer
+
+logger = logging.getLogger('event_logger')
+
+#One row per decoded SARP message with the fields of its beacon, times are stored as ISO 8601 UTC text so they sort and compare as text.
+#'N/A' fields are stored as NULL.
+MESSAGE_COLUMNS = [
+		('time', 'TEXT'),
+		('source', 'INTEGER'),
+		('message_format', 'TEXT'),
+		('format', 'TEXT'),
+		('rt_pb', 'TEXT'),
+		('timecode', 'INTEGER'),
+		('abs_freq', 'REAL'),
+		('level_dbm', 'REAL'),
+		('s_no_db', 'REAL'),
+		('message_hex', 'TEXT'),
+		('beacon_hex', 'TEXT'),
+		('beacon_id', 'TEXT'),
+		('country_code', 'INTEGER'),
+		('country', 'TEXT'),
+		('protocol_num', 'INTEGER'),
+		('protocol', 'TEXT'),
+		('bch1_errors', 'INTEGER'),
+		('bch2_errors', 'INTEGER'),
+		('bch_valid', 'INTEGER'),
+		('latitude', 'REAL'),
+		('longitude', 'REAL')
+		]
+MESSAGE_INDEXES = ['time', 'timecode', 'beacon_hex', 'beacon_id', 'country_code', 'protocol']
+
+INSERT = 'INSERT INTO messages ({COLUMNS}) VALUES ({VALUES})'.format(
+		COLUMNS=', '.join(name for name, type in MESSAGE_COLUMNS), VALUES=', '.join('?'*len(MESSAGE_COLUMNS)))
+
+
+def sqlTime(time):
+	return time.isoformat(sep=' ', timespec='microseconds')
+
+
+def sqlValue(value):
+	if value == NA or value != value: #'N/A' and NaN
+		return None
+	return value
+
+
+def messageRow(sarp_message):
+	'''
+	Column values of one SARPMessage and its BeaconMessage in MESSAGE_COLUMNS order.
+	'''
+	data = sarp_message.data
+	beacon = sarp_message.beacon_message.data if sarp_message.beacon_message is not None else {}
+	return tuple(sqlValue(value) for value in (sqlTime(sarp_message.message_creation_time), sarp_message.source, data['message_format'], data['format'], data['rt/pb'],
+			data['timecode'], data['abs_freq'], data['level_dbm'], data['s/no_db'], sarp_message.bytes.hex().upper(),
+			beacon.get('beacon_hex', NA).upper(), beacon.get('beacon_id', NA), beacon.get('country_code', NA), beacon.get('country_name_alpha2', NA),
+			beacon.get('protocol_num', NA), beacon.get('protocol_name_shortened', NA), beacon.get('BCH-1_errors', NA), beacon.get('BCH-2_errors', NA),
+			beacon.get('bch_valid', NA), beacon.get('latitude', NA), beacon.get('longitude', NA)))
+
+
+def connect(filename):
+	connection = sqlite3.connect(filename)
+	connection.row_factory = sqlite3.Row
+	connection.execute('PRAGMA journal_mode=WAL') #readers do not block the writer and the other way around
+	connection.execute('PRAGMA synchronous=NORMAL')
+	return connection
+
+
+def createSchema(connection):
+	connection.execute('CREATE TABLE IF NOT EXISTS messages (id INTEGER PRIMARY KEY, {COLUMNS})'.format(
+			COLUMNS=', '.join('{NAME} {TYPE}'.format(NAME=name, TYPE=type) for name, type in MESSAGE_COLUMNS)))
+	for column in MESSAGE_INDEXES:
+		connection.execute('CREATE INDEX IF NOT EXISTS messages_{COLUMN} ON messages ({COLUMN})'.format(COLUMN=column))
+	connection.commit()
+
+
+class SARPDatabase(EngineConsumer):
+
+	'''
+	Optional persistent sink of the decoded messages. newMessages() only queues the messages, a writer thread with its own
+	connection converts them to rows and inserts them in one transaction per batch, at least every flush_interval seconds.
+	At most max_queue frames of messages wait for the writer, newer messages are dropped when it falls behind. A batch that
+	fails is retried row by row, rows that cannot be converted or inserted are skipped. Both are counted and logged.
+	'''
+
+	def __init__(self, filename, batch_size=500, flush_interval=1.0, max_queue=10000):
+		self.filename = filename
+		self.batch_size = batch_size
+		self.flush_interval = flush_interval
+		self.queue = queue.Queue(max_queue)
+		self.rows = 0
+		self.dropped = 0
+		self.skipped = 0
+		self.failed = False
+
+		connection = connect(filename)
+		createSchema(connection)
+		connection.close()
+
+		self.writer = Thread(target=self.run, daemon=True)
+		self.writer.start()
+		logger.info('Writing messages to database {FILE}'.format(FILE=filename))
+
+	def newMessages(self, sarp_messages):
+		if self.failed:
+			self.dropped += len(sarp_messages)
+			return
+		try:
+			self.queue.put_nowait(sarp_messages)
+		except queue.Full: #the writer is behind, shed the messages rather than stall the receiver
+			if not self.dropped:
+				logger.warning('Database {FILE} is behind, dropping messages'.format(FILE=self.filename))
+			self.dropped += len(sarp_messages)
+
+	def makeRows(self, batch):
+		rows = []
+		for message in batch:
+			try:
+				rows.append(messageRow(message))
+			except Exception:
+				logger.exception('Message {HEX} could not be converted to a database row'.format(HEX=message.bytes.hex().upper()))
+				self.skipped += 1
+		return rows
+
+	def insert(self, connection, rows):
+		try:
+			with connection: #one transaction per batch
+				connection.executemany(INSERT, rows)
+			self.rows += len(rows)
+			return
+		except sqlite3.Error:
+			logger.exception('Insert of {N} messages into {FILE} failed, retrying them one by one'.format(N=len(rows), FILE=self.filename))
+		for row in rows:
+			try:
+				with connection:
+					connection.execute(INSERT, row)
+				self.rows += 1
+			except sqlite3.Error:
+				self.skipped += 1
+
+	def run(self):
+		try:
+			connection = connect(self.filename)
+			active = True
+			while active:
+				batch = []
+				try:
+					messages = self.queue.get(timeout=self.flush_interval)
+					while messages is not None:
+						batch.extend(messages)
+						if len(batch) >= self.batch_size:
+							break
+						messages = self.queue.get_nowait()
+					active = messages is not None
+				except queue.Empty:
+					pass
+				if batch:
+					rows = self.makeRows(batch)
+					if rows:
+						self.insert(connection, rows)
+			connection.close()
+		except Exception: #newMessages() drops everything from here on, so the queue does not grow
+			self.failed = True
+			logger.exception('Database writer of {FILE} failed'.format(FILE=self.filename))
+
+	def close(self):
+		'''
+		Write the queued messages and stop the writer.
+		'''
+		while self.writer.is_alive():
+			try:
+				self.queue.put(None, timeout=self.flush_interval)
+				break
+			except queue.Full:
+				pass
+		self.writer.join()
+		logger.info('Wrote {N} messages to database {FILE}, dropped {DROPPED}, skipped {SKIPPED}'.format(N=self.rows, FILE=self.filename,
+					DROPPED=self.dropped, SKIPPED=self.skipped))
+
+
+class SARPQuery(object):
+
+	'''
+	Read access to a message database, also while it is being written. Results are iterated from the cursor as sqlite3.Row,
+	so a range is never loaded in memory as a whole. Times are datetime objects (UTC) or None for an open range.
+	'''
+
+	def __init__(self, filename):
+		self.connection = connect(filename)
+
+	def select(self, conditions, parameters, order='time, id'):
+		where = ' WHERE ' + ' AND '.join(conditions) if conditions else ''
+		return self.connection.execute('SELECT * FROM messages{WHERE} ORDER BY {ORDER}'.format(WHERE=where, ORDER=order), parameters)
+
+	def timeConditions(self, start, stop):
+		conditions, parameters = [], []
+		if start is not None:
+			conditions.append('time >= ?')
+			parameters.append(sqlTime(start))
+		if stop is not None:
+			conditions.append('time < ?')
+			parameters.append(sqlTime(stop))
+		return conditions, parameters
+
+	def timeRange(self, start=None, stop=None, valid_only=False):
+		'''
+		Messages received from start up to stop.
+		'''
+		conditions, parameters = self.timeConditions(start, stop)
+		if valid_only:
+			conditions.append('bch_valid = 1')
+		return self.select(conditions, parameters)
+
+	def beaconHistory(self, beacon_id, start=None, stop=None):
+		'''
+		Messages of one beacon, given by its 15 hex ID or its full beacon hex.
+		'''
+		conditions, parameters = self.timeConditions(start, stop)
+		conditions.append('(beacon_id = ? OR beacon_hex = ?)')
+		parameters += [beacon_id.upper(), beacon_id.upper()]
+		return self.select(conditions, parameters)
+
+	def beacons(self, start=None, stop=None):
+		'''
+		One row per BCH valid beacon ID with its number of messages, first and last receive time, country and protocol.
+		'''
+		conditions, parameters = self.timeConditions(start, stop)
+		conditions.append('bch_valid = 1')
+		return self.connection.execute('SELECT beacon_id, COUNT(*) AS messages, MIN(time) AS first, MAX(time) AS last, country, protocol '
+									'FROM messages WHERE {WHERE} GROUP BY beacon_id ORDER BY first'.format(WHERE=' AND '.join(conditions)), parameters)
+
+	def close(self):
+		self.connection.close()
+
+
+def createDatabase(config, path):
+	'''
+	Database sink from the [DATABASE] section of config.ini, None when it is not enabled. Relative file names are relative to path.
+	'''
+	if not config.getboolean('DATABASE', 'ENABLED', fallback=False):
+		return None
+	return SARPDatabase(os.path.join(path, config.get('DATABASE', 'FILE', fallback='log/sarp_messages.db')),
+						config.getint('DATABASE', 'BATCH_SIZE', fallback=500), config.getfloat('DATABASE', 'FLUSH_INTERVAL', fallback=1.0),
+						config.getint('DATABASE', 'MAX_QUEUE', fallback=10000))
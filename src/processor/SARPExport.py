@@ -0,0 +1,180 @@
+import os
+import csv
+import json
+import logging
+import numpy as np
+from threading import Thread
+from SARPMessage import MESSAGE_FORMATS
+
+logger = logging.getLogger('event_logger')
+
+EXPORT_FORMATS = ['csv', 'columnar']
+CSV_HEADER = ['time', 'source', 'message_format', 'timecode', 'frequency', 'protocol_num', 'bch_valid', 'message_hex']
+
+#The columnar export writes every column of every protocol to its own raw file, <prefix>.json describes their dtype and length
+COLUMNAR_COLUMNS = ['time', 'source', 'message_format', 'timecode', 'abs_freq', 'protocol_num', 'bch_valid', 'bytes']
+
+BUFFER_SIZE = 1 << 20
+
+
+def protocolKey(protocol_num):
+	return str(protocol_num) if protocol_num >= 0 else 'NA'
+
+
+class CSVExportWriter(object):
+
+	def __init__(self, filename):
+		self.filename = filename
+		self.file = open(filename, 'w', newline='', buffering=BUFFER_SIZE)
+		self.writer = csv.writer(self.file)
+		self.writer.writerow(CSV_HEADER)
+		self.rows = 0
+
+	def write(self, rows):
+		timecode = rows['timecode'].tolist()
+		abs_freq = rows['abs_freq'].tolist()
+		protocol_num = rows['protocol_num'].tolist()
+		self.writer.writerows(zip(np.datetime_as_string(rows['time']).tolist(), rows['source'].tolist(),
+								[MESSAGE_FORMATS[code] for code in rows['message_format'].tolist()],
+								[value if value >= 0 else 'N/A' for value in timecode],
+								[value if value == value else 'N/A' for value in abs_freq],
+								[value if value >= 0 else 'N/A' for value in protocol_num],
+								rows['bch_valid'].tolist(),
+								[message.tobytes().hex().upper() for message in rows['bytes']]))
+		self.rows += len(rows)
+
+	def close(self):
+		self.file.close()
+		return {'file': os.path.basename(self.filename), 'rows': self.rows}
+
+
+class ColumnarExportWriter(object):
+
+	def __init__(self, prefix):
+		self.filenames = {column: '{PREFIX}_{COLUMN}.bin'.format(PREFIX=prefix, COLUMN=column) for column in COLUMNAR_COLUMNS}
+		self.files = {column: open(filename, 'wb', buffering=BUFFER_SIZE) for column, filename in self.filenames.items()}
+		self.dtypes = {}
+		self.rows = 0
+
+	def write(self, rows):
+		for column, file in self.files.items():
+			values = np.ascontiguousarray(rows[column])
+			self.dtypes[column] = rows.dtype[column]
+			file.write(values.tobytes())
+		self.rows += len(rows)
+
+	def close(self):
+		for file in self.files.values():
+			file.close()
+		columns = {}
+		for column, filename in self.filenames.items():
+			dtype = self.dtypes.get(column)
+			columns[column] = {'file': os.path.basename(filename),
+							'dtype': dtype.base.str if dtype is not None else None,
+							'shape': list(dtype.shape) if dtype is not None else []}
+		return {'rows': self.rows, 'columns': columns}
+
+
+class SARPExporter(Thread):
+
+	'''
+	Exports the rows of a SARPMessageStore in one pass, grouped by protocol_num: <prefix>_<protocol_num>.csv (NA for no user protocol)
+	or the columnar format described by <prefix>.json. The rows are read in chunks, spilled rows included, and written through
+	buffered writers, so the memory use does not grow with the session. Rows appended after the start are not exported.
+	progress(done, total) is called after every chunk and finished(files, rows, error) at the end, both from the export thread.
+	finished is also called when the export fails, with the files written so far and the error message, error is None otherwise.
+	'''
+
+	def __init__(self, store, prefix, export_format='csv', chunk_size=10000, progress=None, finished=None):
+		Thread.__init__(self)
+		self.daemon = True
+		if export_format not in EXPORT_FORMATS:
+			raise ValueError("Unsupported export format {FMT}".format(FMT=export_format))
+		self.store = store
+		self.prefix = prefix
+		self.export_format = export_format
+		self.chunk_size = chunk_size
+		self.progress = progress
+		self.finished = finished
+		self.cancelled = False
+		self.exported = 0
+
+	def cancel(self):
+		self.cancelled = True
+
+	def openWriter(self, key):
+		if self.export_format == 'csv':
+			return CSVExportWriter('{PREFIX}_{KEY}.csv'.format(PREFIX=self.prefix, KEY=key))
+		return ColumnarExportWriter('{PREFIX}_{KEY}'.format(PREFIX=self.prefix, KEY=key))
+
+	def exportRows(self, writers):
+		start = 0 if self.store.spill else self.store.first()
+		stop = self.store.count
+		for chunk_start in range(start, stop, self.chunk_size):
+			if self.cancelled:
+				break
+			rows = self.store.readRange(chunk_start, min(chunk_start + self.chunk_size, stop))
+			protocols = rows['protocol_num']
+			order = np.argsort(protocols, kind='stable') #keeps the receive order within every protocol
+			keys, firsts = np.unique(protocols[order], return_index=True)
+			for key, group in zip(keys.tolist(), np.split(order, firsts[1:])):
+				key = protocolKey(key)
+				if key not in writers:
+					writers[key] = self.openWriter(key)
+				writers[key].write(rows[group])
+			self.exported += len(rows)
+			if self.progress:
+				self.progress(min(chunk_start + self.chunk_size, stop) - start, stop - start)
+
+	def closeWriters(self, writers):
+		manifest = {}
+		error = None
+		for key, writer in writers.items(): #every writer is closed, also when another one fails
+			try:
+				manifest[key] = writer.close()
+			except Exception as e:
+				logger.exception('Export file of protocol {KEY} could not be closed'.format(KEY=key))
+				error = error or str(e)
+		files = [self.prefix + '_' + key + '.csv' for key in manifest]
+		if self.export_format == 'columnar':
+			files = [self.prefix + '.json']
+			with open(files[0], 'w') as file:
+				json.dump({'rows': self.exported, 'protocols': manifest}, file, indent=4)
+		if error is not None:
+			raise IOError(error)
+		return files
+
+	def run(self):
+		writers = {}
+		files = []
+		error = None
+		try:
+			self.exportRows(writers)
+		except Exception as e:
+			logger.exception('Export to {PREFIX} failed after {N} messages'.format(PREFIX=self.prefix, N=self.exported))
+			error = str(e) or type(e).__name__
+		finally:
+			try:
+				files = self.closeWriters(writers)
+			except Exception as e:
+				logger.exception('Export files of {PREFIX} could not be written'.format(PREFIX=self.prefix))
+				error = error or str(e) or type(e).__name__
+			if error is None:
+				logger.info('Exported {N} messages to {FILES}{CANCEL}'.format(N=self.exported, FILES=', '.join(files), CANCEL=' (cancelled)' if self.cancelled else ''))
+			if self.finished:
+				self.finished(files, self.exported, error)
+
+
+def readColumnar(manifest_file):
+	'''
+	Columns of a columnar export as {protocol key: {column: memory mapped array}}.
+	'''
+	with open(manifest_file) as file:
+		manifest = json.load(file)
+	directory = os.path.dirname(manifest_file)
+	protocols = {}
+	for key, entry in manifest['protocols'].items():
+		protocols[key] = {column: np.memmap(os.path.join(directory, description['file']), dtype=description['dtype'], mode='r',
+											shape=(entry['rows'],) + tuple(description['shape']))
+						for column, description in entry['columns'].items() if description['dtype'] is not None}
+	return protocols
@@ -1,5 +1,6 @@
-from SARPMessage import SARPMessage
+from SARPMessage import SARPMessage, decodeMessages
 from bitarray import bitarray, util
+import numpy as np
 import datetime
 import logging
 
@@ -28,22 +29,47 @@ LMESSAGE2_LEN = 24
 
 logger = logging.getLogger('event_logger')
 
+MESSAGE_STARTS = [LMESSAGE1_START, SMESSAGE_START, LMESSAGE2_START]
+MESSAGES_LEN = LMESSAGE1_LEN + SMESSAGE_LEN + LMESSAGE2_LEN
+
+
+def decodeFrames(sarp_frames, message_format):
+	'''
+	Vectorized decode of an (N, 75) uint8 array of SARP frames, returns a dict of frame columns (sync_valid, marker_valid with
+	one column per message, valid) and the decodeMessages() columns of the 3*N messages, extended with the frame index,
+	the message number in the frame and frame_valid. Messages of invalid frames are decoded as well, mask them with frame_valid.
+	'''
+	frames = np.asarray(sarp_frames, dtype=np.uint8).reshape(-1, 75)
+	sync_valid = (frames[:, SYNC_WORD_START:SYNC_WORD_START + SYNC_WORD_LEN] == np.frombuffer(SYNCWORD, dtype=np.uint8)).all(axis=1)
+	marker_valid = frames[:, MESSAGE_STARTS] == MARKER[0]
+	valid = sync_valid & marker_valid.all(axis=1)
+	frame_columns = {'sync_valid': sync_valid, 'marker_valid': marker_valid, 'valid': valid}
+
+	message_columns = decodeMessages(frames[:, :MESSAGES_LEN].reshape(-1, LMESSAGE1_LEN), message_format)
+	message_columns['frame'] = np.repeat(np.arange(len(frames)), len(MESSAGE_STARTS))
+	message_columns['message'] = np.tile(np.arange(len(MESSAGE_STARTS), dtype=np.uint8), len(frames))
+	message_columns['frame_valid'] = np.repeat(valid, len(MESSAGE_STARTS))
+	return frame_columns, message_columns
+
 
 class SARPFrame(object):
 
 	valid = False
 	message_format = None
 
-	def __init__(self, sarp_bytes, message_format):
+	def __init__(self, sarp_bytes, message_format, creation_time=None, source=0):
 		length = len(sarp_bytes)
 		if len(sarp_bytes) != 75:
 			raise ValueError("SARP frame does not have 75 bytes!")
 
-		self.frame_creation_time = datetime.datetime.utcnow()
+		if creation_time is None:
+			creation_time = datetime.datetime.utcnow()
+		self.frame_creation_time = creation_time
 
 		self.bytes = sarp_bytes
 		self.length = length
 		self.message_format = message_format
+		self.source = source #index of the stream the frame was received on
 
 		if self.bytes[SYNC_WORD_START:SYNC_WORD_START + SYNC_WORD_LEN] != SYNCWORD:
 			self.valid = False
@@ -58,9 +84,9 @@ class SARPFrame(object):
 
 
 		if self.valid:
-			self.message1 = SARPMessage(self.bytes[LMESSAGE1_START:LMESSAGE1_START + LMESSAGE1_LEN], self.frame_creation_time, self.message_format)
-			self.message2 = SARPMessage(self.bytes[SMESSAGE_START:SMESSAGE_START + SMESSAGE_LEN], self.frame_creation_time, self.message_format)
-			self.message3 = SARPMessage(self.bytes[LMESSAGE2_START:LMESSAGE2_START + LMESSAGE2_LEN], self.frame_creation_time, self.message_format)
+			self.message1 = SARPMessage(self.bytes[LMESSAGE1_START:LMESSAGE1_START + LMESSAGE1_LEN], self.frame_creation_time, self.message_format, source)
+			self.message2 = SARPMessage(self.bytes[SMESSAGE_START:SMESSAGE_START + SMESSAGE_LEN], self.frame_creation_time, self.message_format, source)
+			self.message3 = SARPMessage(self.bytes[LMESSAGE2_START:LMESSAGE2_START + LMESSAGE2_LEN], self.frame_creation_time, self.message_format, source)
 
 	def updateMessageFormats(self, message_format):
 		self.message_format = message_format
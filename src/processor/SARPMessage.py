@@ -1,301 +1,377 @@
 from bitarray import bitarray, util
-from BeaconMessage import BeaconMessage
+from collections import namedtuple
+import numpy as np
+from BeaconMessage import BeaconMessage, protocolNumber
+from bch import checkBeacon
 import datetime
 import logging
 
 logger = logging.getLogger('event_logger')
 
+MESSAGE_FORMATS = ['SARSAT SARP-2', 'SARSAT SARP-3', 'COSPAS SARP-2']
+
+MESSAGE_BITS = 192
+
+#Fields as (first bit, number of bits), bits are counted from the MSB of the 24 byte message (word0 bit 0 = bit 0, word1 bit 0 = bit 24, ...)
+FIELDS = {
+		'pseudo':			(12, 1),
+		's/no':				(12, 3),
+		'dru':				(15, 2),
+		'type':				(15, 1),
+		'latest':			(16, 1),
+		'rt/pb':			(17, 1),
+		'level':			(18, 6),
+		'timecode':			(24, 23),
+		'word2':			(48, 24),
+		'short_doppler':	(144, 24),
+		'long_doppler':		(168, 24),
+		'last_word':		(168, 24)
+		}
+
+#Same fields as (shift, mask) on the message read as one 192 bit integer
+FIELD_MASKS = {name: (MESSAGE_BITS - start - length, (1 << length) - 1) for name, (start, length) in FIELDS.items()}
+
+#Per message format: position of the short/long format flag, the word 0 fields it carries, whether the timecode and the
+#doppler word of short messages are supported and the first bit of the beacon data (which starts after the format flag)
+MessageLayout = namedtuple('MessageLayout', ['format_flag', 'word0', 'timecode', 'short_doppler', 'beacon_start'])
+
+MESSAGE_LAYOUTS = {
+		'SARSAT SARP-2': MessageLayout(format_flag=15, word0=('level', 'rt/pb', 'latest', 'dru', 'pseudo'), timecode=True, short_doppler=True, beacon_start=48),
+		'SARSAT SARP-3': MessageLayout(format_flag=48, word0=('level', 'rt/pb', 'latest', 'type', 's/no'), timecode=True, short_doppler=True, beacon_start=49),
+		'COSPAS SARP-2': MessageLayout(format_flag=72, word0=(), timecode=False, short_doppler=False, beacon_start=72)
+		}
+
+SHORT_BEACON_BITS = 87 #without the format flag, which is prepended again
+LONG_BEACON_BITS = 119
+UNKNOWN_FORMAT_BEACON_START = 72
+
+HK_WORD2 = 13516288
+SHORT_LAST_WORD = 0x000001
+
+SNO_LEVELS = {	0: "32.3",
+				1: "34.8",
+				2: "37.5",
+				3: "41.1",
+				4: "45.2",
+				5: "50.1",
+				6: "55.5",
+				7: "62.1"}
+
+#Signal level in dBm for every value of the 6 bit level field
+LEVEL_DBM = [round((0.55*level) - 140.0, 2) for level in range(64)]
+
+#Parity of every 12 bit value, the parity of a 24 bit word is the xor of the parity of its two halves
+PARITY12 = bytes(bin(value).count('1') & 1 for value in range(4096))
+
+NA = 'N/A'
+
+#Decoded message, the beacon data is kept as an integer (including the format flag) of beacon_length bits
+SARPRecord = namedtuple('SARPRecord', ['message_creation_time', 'message_format', 'format', 'format_valid', 'level', 'level_dbm', 'rt_pb', 'latest',
+				'dru', 'pseudo', 'type', 's_no', 's_no_db', 'timecode', 'timecode_parity_valid', 'doppler_word', 'abs_freq',
+				'doppler_parity_valid', 'beacon', 'beacon_length', 'doppler_parity'])
+
+
+def makeDecoder(message_format):
+	'''
+	Resolve FIELDS and the layout of one message format into the shifts and masks of a decoder function once,
+	so decoding a message is only integer arithmetic. An unknown format has no format check, word 0,
+	timecode or short doppler word, the beacon data is taken from bit 72.
+	'''
+	layout = MESSAGE_LAYOUTS.get(message_format)
+	if layout is None:
+		logger.warning('Unknown message format {FORMAT}, only the beacon data is decoded'.format(FORMAT=message_format))
+	elif not (layout.timecode and layout.short_doppler):
+		logger.warning('{FORMAT} not yet supported, timecode and short message doppler word are N/A'.format(FORMAT=message_format))
+
+	word2_shift, word2_mask = FIELD_MASKS['word2']
+	last_word_shift, last_word_mask = FIELD_MASKS['last_word']
+	level_shift, level_mask = FIELD_MASKS['level']
+	rt_pb_shift, rt_pb_mask = FIELD_MASKS['rt/pb']
+	latest_shift, latest_mask = FIELD_MASKS['latest']
+	dru_shift, dru_mask = FIELD_MASKS['dru']
+	pseudo_shift, pseudo_mask = FIELD_MASKS['pseudo']
+	type_shift, type_mask = FIELD_MASKS['type']
+	s_no_shift, s_no_mask = FIELD_MASKS['s/no']
+	timecode_shift, timecode_mask = FIELD_MASKS['timecode']
+	timecode_word_shift = MESSAGE_BITS - 48
+	short_doppler_shift, short_doppler_mask = FIELD_MASKS['short_doppler']
+	long_doppler_shift, long_doppler_mask = FIELD_MASKS['long_doppler']
+
+	known = layout is not None
+	format_flag_shift = MESSAGE_BITS - 1 - layout.format_flag if known else None
+	word0 = layout.word0 if known else ()
+	has_word0 = len(word0) > 0
+	has_dru = 'dru' in word0
+	has_timecode = known and layout.timecode
+	has_short_doppler = known and layout.short_doppler
+	beacon_start = layout.beacon_start if known else UNKNOWN_FORMAT_BEACON_START
+	short_beacon_shift = MESSAGE_BITS - beacon_start - SHORT_BEACON_BITS
+	short_beacon_mask = (1 << SHORT_BEACON_BITS) - 1
+	long_beacon_shift = MESSAGE_BITS - beacon_start - LONG_BEACON_BITS
+	long_beacon_mask = (1 << LONG_BEACON_BITS) - 1
+	long_format_flag = 1 << LONG_BEACON_BITS
+	parity = PARITY12
+	level_dbm_table = LEVEL_DBM
+
+	def decode(sarp_message_bytes, creation_time, message_format):
+		value = int.from_bytes(sarp_message_bytes, 'big')
+
+		format = format_valid = level = level_dbm = rt_pb = latest = dru = pseudo = type = s_no = s_no_db = NA
+		timecode = timecode_parity_valid = doppler_word = abs_freq = doppler_parity_valid = NA
+		beacon = beacon_length = doppler_parity = None
+
+		if (value >> word2_shift) & word2_mask == HK_WORD2:
+			format_valid = False #HK frames carry no beacon, the format is left N/A
+		elif (value >> last_word_shift) & last_word_mask == SHORT_LAST_WORD: # if last word = 0x000001
+			format = 'SHORT'
+		else:
+			format = 'LONG'
+
+		#The 0x000001 above tells us with quite good cerntainty if this frame is LONG or SHORT, however there is also a bit indicating this,
+		#We should check this bit as it allows us to detect if the frame format is wrong if it does not correspond with our findings above.
+		if known and format != NA:
+			format_valid = ((value >> format_flag_shift) & 1) == (format == 'LONG')
+
+		#================================== WORD 0 ======================================
+		if has_word0:
+			level = (value >> level_shift) & level_mask
+			level_dbm = level_dbm_table[level]
+			rt_pb = 'REALTIME' if (value >> rt_pb_shift) & rt_pb_mask else 'PLAYBACK'
+			latest = 'Most recent message' if (value >> latest_shift) & latest_mask else 'Other'
+			if has_dru:
+				dru = (value >> dru_shift) & dru_mask
+				pseudo = bool((value >> pseudo_shift) & pseudo_mask)
+			else:
+				type = 'C/S T.001' if (value >> type_shift) & type_mask else 'New type'
+				s_no = (value >> s_no_shift) & s_no_mask
+				s_no_db = SNO_LEVELS.get(s_no)
+
+		#================================ TIMECODE =======================================
+		if has_timecode:
+			timecode = (value >> timecode_shift) & timecode_mask
+			word = (value >> timecode_word_shift) & 0xFFFFFF
+			timecode_parity_valid = parity[word >> 12] == parity[word & 0xFFF] #even parity over the word including the parity bit
+
+		#========================= BEACON DATA AND DOPPLER WORD ==========================
+		if format == 'SHORT' and format_valid:
+			beacon = (value >> short_beacon_shift) & short_beacon_mask
+			beacon_length = SHORT_BEACON_BITS + 1
+			if has_short_doppler:
+				word = (value >> short_doppler_shift) & short_doppler_mask
+				doppler_word = word >> 1 #23 bit two's complement (sign bit + 22 bits), the last bit is the parity bit
+				if doppler_word & 0x400000:
+					doppler_word -= 0x800000
+				abs_freq = (8121.0/200.0)*10000000 + doppler_word*0.015 #Assumes the spacecraft USO is still at 10 MHz
+				doppler_parity_valid = parity[word >> 12] == parity[word & 0xFFF]
+		elif format == 'LONG' and format_valid:
+			beacon = ((value >> long_beacon_shift) & long_beacon_mask) | long_format_flag
+			beacon_length = LONG_BEACON_BITS + 1
+			word = (value >> long_doppler_shift) & long_doppler_mask
+			doppler_word = word >> 1
+			if doppler_word & 0x400000:
+				doppler_word -= 0x800000
+			abs_freq = (8121.0/200.0)*10000000 + doppler_word*0.015 #Assumes the spacecraft USO is still at 10 MHz
+			doppler_parity = parity[word >> 12] == parity[word & 0xFFF]
+
+		return tuple.__new__(SARPRecord, (creation_time, message_format, format, format_valid, level, level_dbm, rt_pb, latest, dru, pseudo, type, s_no, s_no_db,
+						timecode, timecode_parity_valid, doppler_word, abs_freq, doppler_parity_valid, beacon, beacon_length, doppler_parity))
+
+	return decode
+
+
+#Decoder per message format, built on the first message of a format
+MESSAGE_DECODERS = {}
+
+
+def decodeMessage(sarp_message_bytes, creation_time, message_format):
+	'''
+	Decode the 24 bytes of a SARP message into a SARPRecord, fields that do not apply to the message are 'N/A'.
+	'''
+	try:
+		decode = MESSAGE_DECODERS[message_format]
+	except KeyError:
+		decode = MESSAGE_DECODERS[message_format] = makeDecoder(message_format)
+	return decode(sarp_message_bytes, creation_time, message_format)
+
+
+#Batch decoding, see decodeMessages
+FORMAT_NAMES = ['N/A', 'SHORT', 'LONG']
+BEACON_BYTES = 15
+
+PARITY12_ARRAY = np.frombuffer(PARITY12, dtype=np.uint8)
+LEVEL_DBM_ARRAY = np.array(LEVEL_DBM)
+
+
+def decodeMessages(sarp_messages, message_format):
+	'''
+	Vectorized decode of an (M, 24) uint8 array of SARP messages, returns a dict of (M,) columns:
+	format (index in FORMAT_NAMES), format_valid, the word 0 fields of the message format (rt/pb, latest and type as booleans),
+	timecode and timecode_parity_valid (-1 and False when not supported), doppler_word, abs_freq and doppler_parity_valid
+	(0, NaN and False when the message has no doppler word), and the beacon bits including the format flag, left aligned
+	in an (M, 15) beacon column with their number in beacon_length (0 when the message carries no beacon data).
+	'''
+	if message_format not in MESSAGE_LAYOUTS:
+		raise ValueError("Unsupported message format {FMT}".format(FMT=message_format))
+	layout = MESSAGE_LAYOUTS[message_format]
+
+	messages = np.asarray(sarp_messages, dtype=np.uint8).reshape(-1, 24)
+	b = messages.astype(np.uint32)
+	words = (b[:, 0::3] << 16) | (b[:, 1::3] << 8) | b[:, 2::3]
+
+	def column(name):
+		start, length = FIELDS[name]
+		word, offset = divmod(start, 24)
+		return (words[:, word] >> (24 - offset - length)) & ((1 << length) - 1)
+
+	def parityValid(word):
+		return PARITY12_ARRAY[word >> 12] == PARITY12_ARRAY[word & 0xFFF]
+
+	hk = column('word2') == HK_WORD2
+	short = ~hk & (column('last_word') == SHORT_LAST_WORD)
+	long = ~hk & ~short
+	word, offset = divmod(layout.format_flag, 24)
+	format_flag = ((words[:, word] >> (23 - offset)) & 1).astype(bool)
+	format_valid = ~hk & (format_flag == long)
+
+	columns = {}
+	columns['format'] = np.where(short, 1, np.where(long, 2, 0)).astype(np.uint8)
+	columns['format_valid'] = format_valid
+
+	if layout.word0:
+		columns['level'] = column('level').astype(np.uint8)
+		columns['level_dbm'] = LEVEL_DBM_ARRAY[columns['level']]
+		columns['rt/pb'] = column('rt/pb').astype(bool)
+		columns['latest'] = column('latest').astype(bool)
+		if 'dru' in layout.word0:
+			columns['dru'] = column('dru').astype(np.uint8)
+			columns['pseudo'] = column('pseudo').astype(bool)
+		else:
+			columns['type'] = column('type').astype(bool)
+			columns['s/no'] = column('s/no').astype(np.uint8)
+
+	if layout.timecode:
+		columns['timecode'] = column('timecode').astype(np.int32)
+		columns['timecode_parity_valid'] = parityValid(words[:, 1])
+	else:
+		columns['timecode'] = np.full(len(messages), -1, dtype=np.int32)
+		columns['timecode_parity_valid'] = np.zeros(len(messages), dtype=bool)
+
+	has_doppler = format_valid & (long | layout.short_doppler)
+	doppler = np.where(long, words[:, 7], words[:, 6])
+	doppler_word = (doppler >> 1).astype(np.int32)
+	doppler_word -= (doppler_word & 0x400000) << 1 #23 bit two's complement (sign bit + 22 bits)
+	columns['doppler_word'] = np.where(has_doppler, doppler_word, 0)
+	columns['abs_freq'] = np.where(has_doppler, (8121.0/200.0)*10000000 + doppler_word*0.015, np.nan) #Assumes the spacecraft USO is still at 10 MHz
+	columns['doppler_parity_valid'] = has_doppler & parityValid(doppler)
+
+	bits = np.unpackbits(messages, axis=1)
+	beacon = np.zeros((len(messages), 8*BEACON_BYTES), dtype=np.uint8)
+	beacon[:, 0] = long
+	beacon[:, 1:] = bits[:, layout.beacon_start:layout.beacon_start + LONG_BEACON_BITS]
+	beacon[short, SHORT_BEACON_BITS + 1:] = 0
+	beacon[~format_valid] = 0
+	columns['beacon'] = np.packbits(beacon, axis=1)
+	columns['beacon_length'] = np.where(format_valid, np.where(long, LONG_BEACON_BITS + 1, SHORT_BEACON_BITS + 1), 0).astype(np.uint8)
+
+	return columns
+
+
+def beaconBits(beacon, beacon_length):
+	'''
+	bitarray of a row of the decodeMessages() beacon column, as passed to BeaconMessage.
+	'''
+	bits = bitarray(endian='big')
+	bits.frombytes(beacon.tobytes())
+	return bits[:beacon_length]
+
+
+#format() specs of beacon_bits and beacon_hex per beacon_length
+BEACON_TEXT_FORMATS = {SHORT_BEACON_BITS + 1: ('088b', '022x'), LONG_BEACON_BITS + 1: ('0120b', '030x')}
+
+
+def recordData(record):
+	'''
+	The fields of a SARPRecord as the dict keyed like the GUI and exports expect, doppler_parity only appears when set.
+	'''
+	(creation_time, message_format, format_name, format_valid, level, level_dbm, rt_pb, latest, dru, pseudo, type, s_no, s_no_db,
+		timecode, timecode_parity_valid, doppler_word, abs_freq, doppler_parity_valid, beacon, beacon_length, doppler_parity) = record
+	if beacon is not None:
+		bits_format, hex_format = BEACON_TEXT_FORMATS[beacon_length]
+		beacon_bits = format(beacon, bits_format)
+		beacon_hex = format(beacon, hex_format)
+	else:
+		beacon_bits = beacon_hex = NA
+	data = {'message_creation_time': str(creation_time), 'message_format': message_format, 'format': format_name, 'format_valid': format_valid,
+			'level': level, 'level_dbm': level_dbm, 'rt/pb': rt_pb, 'latest': latest, 'dru': dru, 'pseudo': pseudo, 'type': type,
+			's/no': s_no, 's/no_db': s_no_db, 'timecode': timecode, 'timecode_parity_valid': timecode_parity_valid,
+			'doppler_word': doppler_word, 'abs_freq': abs_freq, 'doppler_parity_valid': doppler_parity_valid,
+			'beacon_bits': beacon_bits, 'beacon_hex': beacon_hex}
+	if doppler_parity is not None:
+		data['doppler_parity'] = doppler_parity
+	return data
+
+
 class SARPMessage(object):
 
 
-	def __init__(self, sarp_message_bytes, creation_time, message_format):
+	def __init__(self, sarp_message_bytes, creation_time, message_format, source=0):
 		length = len(sarp_message_bytes)
 		if length != 24:
 			raise ValueError("SARP message does not have 24 bytes!, got {LEN} instead".format(LEN=length))
 		self.bytes = sarp_message_bytes
 		self.message_creation_time = creation_time
-
-		self.data = {}
-		self.data['message_creation_time'] = str(self.message_creation_time)
-		self.data['message_format'] = message_format
-		self.data['format'] = 'N/A'
-		self.data['format_valid'] = 'N/A'
-		self.data['level'] = 'N/A'
-		self.data['level_dbm'] = 'N/A'
-		self.data['rt/pb'] = 'N/A'
-		self.data['latest'] = 'N/A'
-		self.data['dru'] = 'N/A'
-		self.data['pseudo'] = 'N/A'
-		self.data['type'] = 'N/A'
-		self.data['s/no'] = 'N/A'
-		self.data['s/no_db'] = 'N/A'
-		self.data['timecode'] = 'N/A'
-		self.data['timecode_parity_valid'] = 'N/A'
-		self.data['doppler_word'] = 'N/A'
-		self.data['abs_freq'] = 'N/A'
-		self.data['doppler_parity_valid'] = 'N/A'
-		self.data['beacon_bits'] = 'N/A'
-		self.data['beacon_hex'] = 'N/A'
-
-		tmp = util.hex2ba(self.bytes.hex())
-		self.bitarray = bitarray(tmp, endian='big')
-
-		self.word0 = self.bitarray[0:24]
-		self.word1 = self.bitarray[24:48]
-		self.word2 = self.bitarray[48:72]
-		self.word3 = self.bitarray[72:96]
-		self.word4 = self.bitarray[96:120]
-		self.word5 = self.bitarray[120:144]
-		self.word6 = self.bitarray[144:168]
-		self.word7 = self.bitarray[168:192]
-
-		if 	util.ba2int(self.word2) == 13516288:
-			self.data['format'] == 'HK'
-		elif util.ba2int(self.word7) == 1: # if last word = 0x000001
-			self.data['format'] = 'SHORT'
-		else:
-			self.data['format'] = 'LONG'
-
-		#The 0x000001 above tells us with quite good cerntainty if this frame is LONG or SHORT, however there is also a bit indicating this,
-		#We should check this bit as it allows us to detect if the frame format is wrong if it does not correspond with our findings above.
-
-		if self.data['format'] != 'HK': #only proceed if the frame we are dealing with is not an HK frame
-
-			#=============================== FORMAT CHECK ===================================
-			if self.data['format'] == 'SHORT' and self.data['message_format'] == 'SARSAT SARP-2':
-				if self.word0[15] == False:
-					self.data['format_valid'] = True
-				else:
-					 self.data['format_valid'] = False
-			elif self.data['format'] == 'LONG' and self.data['message_format'] == 'SARSAT SARP-2':
-				if self.word0[15] == True:
-					self.data['format_valid'] = True
-				else:
-					 self.data['format_valid'] = False
-			elif self.data['format'] == 'SHORT' and self.data['message_format'] == 'SARSAT SARP-3':
-				if self.word2[0] == False:
-					self.data['format_valid'] = True
-				else:
-					 self.data['format_valid'] = False
-			elif self.data['format'] == 'LONG' and self.data['message_format'] == 'SARSAT SARP-3':
-				if self.word2[0] == True:
-					self.data['format_valid'] = True
-				else:
-					 self.data['format_valid'] = False
-			elif self.data['format'] == 'SHORT' and self.data['message_format'] == 'COSPAS SARP-2':
-				if self.word3[0] == False:
-					self.data['format_valid'] = True
-				else:
-					 self.data['format_valid'] = False
-			elif self.data['format'] == 'LONG' and self.data['message_format'] == 'COSPAS SARP-2':
-				if self.word3[0] == True:
-					self.data['format_valid'] = True
-				else:
-					 self.data['format_valid'] = False
-
-
-
-
-
-			#================================================================================
-
-			#================================== WORD 0 ======================================
-			if self.data['message_format'] == 'SARSAT SARP-2':
-				self.data['level'] = util.ba2int(self.word0[18:24])
-				self.data['level_dbm'] = round((0.55*util.ba2int(self.word0[18:24])) - 140.0, 2)
-
-				if self.word0[17] == True:
-					self.data['rt/pb'] = 'REALTIME'
-					#print('RT/PB = REALTIME, bits {BITS}'.format(BITS=self.word0[17]))
-				else:
-					self.data['rt/pb'] = 'PLAYBACK'
-					#print('RT/PB = PLAYBACK, bits {BITS}'.format(BITS=self.word0[17]))
-
-				if self.word0[16] == True:
-					self.data['latest'] = 'Most recent message'
-					#print('Latest = MOST RECENT (PLAYBACK), bits {BITS}'.format(BITS=self.word0[16]))
-				else:
-					self.data['latest'] = 'Other'
-					#print('Latest = OTHER, bits {BITS}'.format(BITS=self.word0[16]))
-
-				self.data['dru'] = util.ba2int(self.word0[15:17])
-				self.data['pseudo'] = self.word0[12]
-
-
-			elif self.data['message_format'] == 'SARSAT SARP-3':
-				self.data['level'] = util.ba2int(self.word0[18:24])
-				self.data['level_dbm'] = round((0.55*util.ba2int(self.word0[18:24])) - 140.0, 2)
-
-				if self.word0[17] == True:
-					self.data['rt/pb'] = 'REALTIME'
-					#print('RT/PB = REALTIME, bits {BITS}'.format(BITS=self.word0[17]))
-				else:
-					self.data['rt/pb'] = 'PLAYBACK'
-					#print('RT/PB = PLAYBACK, bits {BITS}'.format(BITS=self.word0[17]))
-
-				if self.word0[16] == True:
-					self.data['latest'] = 'Most recent message'
-					#print('Latest = MOST RECENT (PLAYBACK), bits {BITS}'.format(BITS=self.word0[16]))
-				else:
-					self.data['latest'] = 'Other'
-					#print('Latest = OTHER, bits {BITS}'.format(BITS=self.word0[16]))
-
-				if self.word0[15] == True:
-					self.data['type'] = 'C/S T.001'
-					#print('Type = Cospas-Sarsat Beacon (document C/S T.001)')
-				else:
-					self.data['type'] = 'New type'
-					#print('Type = New type beacon')
-
-				self.data['s/no'] = util.ba2int(self.word0[12:15])
-
-				levels = {	0: "32.3",
-							1: "34.8",
-							2: "37.5",
-							3: "41.1",
-							4: "45.2",
-							5: "50.1",
-							6: "55.5",
-							7: "62.1"}
-
-				self.data['s/no_db'] = levels.get(self.data['s/no'])
-			else: #COSPAS SARP-2
-				pass
-				 #self.data['message_format'] == 'SARSAT SARP-3':
-
-			#=================================================================================
-
-
-
-			#================================ TIMECODE =======================================
-			if self.data['message_format'] == 'SARSAT SARP-2' or self.data['message_format'] == 'SARSAT SARP-3':
-				timecode_bitarray = self.word1[0:23]
-				self.data['timecode'] = util.ba2int(timecode_bitarray)
-				high_bits = timecode_bitarray.count(True)
-
-				timecode_parity = self.word1[23]
-				if timecode_parity:
-					if (high_bits % 2) != 0: #If the timecode parity bit is set we should have an odd number of ones
-						self.data['timecode_parity_valid'] = True
-					else:
-						self.data['timecode_parity_valid'] = False
-				else:
-					if (high_bits % 2) == 0: #If the timecode parity bit is set we should have an odd number of ones
-						self.data['timecode_parity_valid'] = True
-					else:
-						self.data['timecode_parity_valid'] = False
-			else:
-				print('COSPAS SARP-2 not yet supported!!')
-			#=================================================================================
-
-
-
-			#================================== BEACON DATA ==================================
-			if self.data['format'] == 'SHORT' and self.data['format_valid']:
-				if self.data['message_format'] == 'SARSAT SARP-2':
-					beacon_bits = self.bitarray[48:135] #87 bits
-					self.data['beacon_bits'] = '0' + beacon_bits.to01()
-					self.data['beacon_hex'] = util.ba2hex(bitarray(self.data['beacon_bits'], endian='big')).decode('utf-8')
-					self.beacon_message = BeaconMessage(bitarray(self.data['beacon_bits'], endian='big'), self.message_creation_time)
-				elif self.data['message_format'] == 'SARSAT SARP-3':
-					beacon_bits = self.bitarray[49:136] #87 bits
-					self.data['beacon_bits'] = '0' + beacon_bits.to01()
-					self.data['beacon_hex'] = util.ba2hex(bitarray(self.data['beacon_bits'], endian='big')).decode('utf-8')
-					self.beacon_message = BeaconMessage(bitarray(self.data['beacon_bits'], endian='big'), self.message_creation_time)
-				else:
-					beacon_bits = self.bitarray[72:159] #87 bits
-					self.data['beacon_bits'] = '0' + beacon_bits.to01()
-					self.data['beacon_hex'] = util.ba2hex(bitarray(self.data['beacon_bits'], endian='big')).decode('utf-8')
-					self.beacon_message = BeaconMessage(bitarray(self.data['beacon_bits'], endian='big'), self.message_creation_time)
-
-			elif self.data['format'] == 'LONG' and self.data['format_valid']:
-				if self.data['message_format'] == 'SARSAT SARP-2':
-					beacon_bits = self.bitarray[48:167] #87 bits
-					self.data['beacon_bits'] = '1' + beacon_bits.to01()
-					self.data['beacon_hex'] = util.ba2hex(bitarray(self.data['beacon_bits'], endian='big')).decode('utf-8')
-					self.beacon_message = BeaconMessage(bitarray(self.data['beacon_bits'], endian='big'), self.message_creation_time)
-				elif self.data['message_format'] == 'SARSAT SARP-3':
-					beacon_bits = self.bitarray[49:168] #87 bits
-					self.data['beacon_bits'] = '1' + beacon_bits.to01()
-					self.data['beacon_hex'] = util.ba2hex(bitarray(self.data['beacon_bits'], endian='big')).decode('utf-8')
-					self.beacon_message = BeaconMessage(bitarray(self.data['beacon_bits'], endian='big'), self.message_creation_time)
-				else:
-					beacon_bits = self.bitarray[72:191] #87 bits
-					self.data['beacon_bits'] = '1' + beacon_bits.to01()
-					self.data['beacon_hex'] = util.ba2hex(bitarray(self.data['beacon_bits'], endian='big')).decode('utf-8')
-					self.beacon_message = BeaconMessage(bitarray(self.data['beacon_bits'], endian='big'), self.message_creation_time)
-			elif self.data['format_valid'] == False:
-				pass
-
-			#print(self.data['beacon_bits'])
-			#=================================================================================
-
-
-			#=============================== DOPPLER WORD ====================================
-			if self.data['format'] == 'SHORT' and self.data['format_valid']:
-				if self.data['message_format'] == 'SARSAT SARP-2' or self.data['message_format'] == 'SARSAT SARP-3':
-					doppler_word_bitarray = self.word6[1:23]
-					sign_bit = self.word6[0]
-					if sign_bit:
-						doppler_word_bitarray.invert()
-						self.data['doppler_word'] = - (util.ba2int(doppler_word_bitarray) + 1)
-					else:
-						self.data['doppler_word'] = util.ba2int(doppler_word_bitarray)
-
-					self.data['abs_freq'] = (8121.0/200.0)*10000000 + self.data['doppler_word']*0.015 #Assumes the spacecraft USO is still at 10 MHz
-					doppler_word_bitarray_and_signbit = self.word6[0:23]
-					high_bits = doppler_word_bitarray_and_signbit.count(True)
-					doppler_parity = self.word6[23]
-					if doppler_parity:
-						if (high_bits % 2) != 0: #If the timecode parity bit is set we should have an odd number of ones
-							self.data['doppler_parity_valid'] = True
-							#print('parity CHECK OK')
-						else:
-							self.data['doppler_parity_valid'] = False
-							#print('parity CHECK FAILED')
-					else:
-						if (high_bits % 2) == 0: #If the timecode parity bit is set we should have an odd number of ones
-							self.data['doppler_parity_valid'] = True
-							#print('parity CHECK OK')
-						else:
-							self.data['doppler_parity_valid'] = False
-							#print('parity CHECK FAILED')
-				else:
-					print('COSPAS SARP-2 not yet supported!!')
-			elif self.data['format'] == 'LONG' and self.data['format_valid']:
-				#print('word7 = {W}'.format(W=util.ba2hex(self.word7)))
-				doppler_word_bitarray = self.word7[1:23]
-				sign_bit = self.word7[0]
-				#print('extracted doppler word= {DW}'.format(DW=doppler_word))
-				#print('extracted sign bit= {DW}'.format(DW=sign_bit))
-				if sign_bit:
-					doppler_word_bitarray.invert()
-					self.data['doppler_word'] = - (util.ba2int(doppler_word_bitarray) + 1)
-				else:
-					self.data['doppler_word'] = util.ba2int(doppler_word_bitarray)
-
-				self.data['abs_freq'] = (8121.0/200.0)*10000000 + self.data['doppler_word']*0.015 #Assumes the spacecraft USO is still at 10 MHz
-
-				doppler_word_bitarray_and_signbit = self.word7[0:23]
-				high_bits = doppler_word_bitarray_and_signbit.count(True)
-
-				doppler_parity = self.word7[23]
-				if doppler_parity:
-					if (high_bits % 2) != 0: #If the timecode parity bit is set we should have an odd number of ones
-						self.data['doppler_parity'] = True
-					else:
-						self.data['doppler_parity'] = False
-				else:
-					if (high_bits % 2) == 0: #If the timecode parity bit is set we should have an odd number of ones
-						self.data['doppler_parity'] = True
-					else:
-						self.data['doppler_parity'] = False
-			elif self.data['format_valid'] == False:
-				pass
-
-			#=================================================================================
-		else:
-			logger.warning('Parsing of HK packets is not supported!')
+		self.source = source
+
+		self.record = decodeMessage(sarp_message_bytes, creation_time, message_format)
+		self._data = None
+		self._beacon_message = None #only the raw beacon bits in record.beacon are kept until the beacon is needed
+		self._bch = None
+
+	@property
+	def beacon_message(self):
+		'''
+		BeaconMessage of the beacon bits, built on first access, None if the message carries no beacon data.
+		'''
+		if self._beacon_message is None and self.record.beacon is not None:
+			self._beacon_message = BeaconMessage(util.int2ba(self.record.beacon, length=self.record.beacon_length, endian='big'), self.message_creation_time)
+		return self._beacon_message
+
+	@property
+	def bch(self):
+		'''
+		checkBeacon() result of the beacon bits, (BCH-1 errors, BCH-2 errors, corrected beacon), None without beacon data.
+		'''
+		if self._bch is None and self.record.beacon is not None:
+			self._bch = checkBeacon(self.record.beacon, self.record.beacon_length)
+		return self._bch
+
+	@property
+	def bch_valid(self):
+		'''
+		True if the beacon bits pass BCH-1 and BCH-2 (long messages) or could be corrected.
+		'''
+		if self.bch is None:
+			return False
+		bch1_errors, bch2_errors, beacon = self.bch
+		return bch1_errors >= 0 and (bch2_errors is None or bch2_errors >= 0)
+
+	@property
+	def protocol_num(self):
+		'''
+		protocol_num of the corrected beacon, without decoding the beacon.
+		'''
+		if self.bch is None:
+			return NA
+		return protocolNumber(self.bch[2], self.record.beacon_length)
+
+	@property
+	def data(self):
+		'''
+		The decoded fields as a dict keyed like the GUI and exports expect, built on first access.
+		'''
+		if self._data is None:
+			self._data = recordData(self.record)
+		return self._data
 
 	def setMessageFormat(self, message_format):
 		pass
@@ -0,0 +1,213 @@
+import numpy as np
+import datetime
+import logging
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from threading import Lock
+from SARPFrame import SARPFrame
+from SARPMessage import SARPMessage, MESSAGE_FORMATS
+
+logger = logging.getLogger('event_logger')
+
+#Rows only keep the raw bytes plus the few columns the GUI and exports need without decoding,
+#the full SARPFrame/SARPMessage objects are rebuilt from the raw bytes when they are accessed.
+
+FRAME_DTYPE = np.dtype([
+		('time', 'datetime64[us]'),
+		('source', 'u1'),
+		('message_format', 'u1'),
+		('valid', '?'),
+		('bytes', 'u1', 75)
+		])
+
+MESSAGE_DTYPE = np.dtype([
+		('time', 'datetime64[us]'),
+		('source', 'u1'),
+		('message_format', 'u1'),
+		('bytes', 'u1', 24),
+		('timecode', 'i4'),
+		('abs_freq', 'f8'),
+		('protocol_num', 'i1'),
+		('bch_valid', '?')
+		])
+
+
+class RingStore(ABC):
+
+	'''
+	Fixed capacity ring buffer of structured numpy rows, the oldest rows are appended to the spill file (if any) when evicted.
+	Rows are addressed by their sequence number, which counts every row ever appended, len() and indexing only cover the rows in memory.
+	Subclasses rebuild the frame/message object of a row in build().
+	'''
+
+	def __init__(self, dtype, capacity, spill_file=None, cache_size=1024):
+		self.dtype = dtype
+		self.capacity = capacity
+		self.rows = np.zeros(capacity, dtype=dtype)
+		self.count = 0
+		self.lock = Lock()
+
+		self.spill_file = spill_file
+		self.spill = open(spill_file, 'w+b') if spill_file else None
+
+		self.cache_size = cache_size
+		self.cache = OrderedDict()
+
+	def __len__(self):
+		return min(self.count, self.capacity)
+
+	def __getitem__(self, index):
+		if index < 0:
+			index += len(self)
+		if index < 0 or index >= len(self):
+			raise IndexError('store index out of range')
+		return self.get(self.first() + index)
+
+	def __iter__(self):
+		first = self.first()
+		for seq in range(first, first + len(self)):
+			yield self.get(seq)
+
+	def first(self):
+		return max(0, self.count - self.capacity)
+
+	def append(self, row, item=None):
+		with self.lock:
+			position = self.count % self.capacity
+			if self.count >= self.capacity and self.spill:
+				self.spill.write(self.rows[position].tobytes())
+			self.rows[position] = row
+			if item is not None:
+				self.cacheItem(self.count, item)
+			self.count += 1
+			return self.count - 1
+
+	def row(self, seq):
+		'''
+		Return the raw row for a sequence number, rows evicted from memory are read back from the spill file, None if not available.
+		'''
+		with self.lock:
+			if seq >= self.count or seq < 0:
+				return None
+			if seq >= self.count - self.capacity:
+				return self.rows[seq % self.capacity].copy()
+			if not self.spill:
+				return None
+			self.spill.flush()
+			self.spill.seek(seq*self.dtype.itemsize)
+			row = np.frombuffer(self.spill.read(self.dtype.itemsize), dtype=self.dtype)[0].copy()
+			self.spill.seek(0, 2)
+			return row
+
+	def get(self, seq):
+		with self.lock:
+			item = self.cache.get(seq)
+			if item is not None:
+				self.cache.move_to_end(seq)
+				return item
+		row = self.row(seq)
+		if row is None:
+			return None
+		item = self.build(row)
+		with self.lock:
+			self.cacheItem(seq, item)
+		return item
+
+	def cacheItem(self, seq, item):
+		self.cache[seq] = item
+		self.cache.move_to_end(seq)
+		if len(self.cache) > self.cache_size:
+			self.cache.popitem(last=False)
+
+	def column(self, name):
+		'''
+		Copy of one column of the rows in memory, oldest first.
+		'''
+		with self.lock:
+			if self.count <= self.capacity:
+				return self.rows[name][:self.count].copy()
+			position = self.count % self.capacity
+			return np.concatenate((self.rows[name][position:], self.rows[name][:position]))
+
+	def rowRange(self, start, stop):
+		'''
+		Copy of the rows with sequence numbers start up to stop that are still in memory.
+		'''
+		with self.lock:
+			start = max(start, self.count - self.capacity, 0)
+			stop = min(stop, self.count)
+			if start >= stop:
+				return np.zeros(0, dtype=self.dtype)
+			return self.rows[np.arange(start, stop) % self.capacity]
+
+	def readRange(self, start, stop):
+		'''
+		Copy of the rows with sequence numbers start up to stop, evicted rows are read back from the spill file in one go.
+		Evicted rows without spill file are left out.
+		'''
+		with self.lock:
+			first = max(0, self.count - self.capacity)
+			stop = min(stop, self.count)
+			parts = []
+			if start < min(first, stop) and self.spill:
+				self.spill.flush()
+				self.spill.seek(start*self.dtype.itemsize)
+				parts.append(np.frombuffer(self.spill.read((min(first, stop) - start)*self.dtype.itemsize), dtype=self.dtype))
+				self.spill.seek(0, 2)
+			if max(start, first) < stop:
+				parts.append(self.rows[np.arange(max(start, first), stop) % self.capacity])
+		return np.concatenate(parts) if parts else np.zeros(0, dtype=self.dtype)
+
+	@abstractmethod
+	def build(self, row):
+		'''
+		Frame/message object of a stored row.
+		'''
+
+	def close(self):
+		if self.spill:
+			self.spill.close()
+			self.spill = None
+
+
+class SARPFrameStore(RingStore):
+
+	def __init__(self, capacity, spill_file=None, cache_size=1024):
+		RingStore.__init__(self, FRAME_DTYPE, capacity, spill_file, cache_size)
+
+	def appendFrame(self, sarp_frame):
+		return self.append((np.datetime64(sarp_frame.frame_creation_time, 'us'), sarp_frame.source, MESSAGE_FORMATS.index(sarp_frame.message_format),
+							sarp_frame.valid, np.frombuffer(sarp_frame.bytes, dtype=np.uint8)), sarp_frame)
+
+	def build(self, row):
+		return SARPFrame(row['bytes'].tobytes(), MESSAGE_FORMATS[row['message_format']], row['time'].astype(datetime.datetime), int(row['source']))
+
+
+class SARPMessageStore(RingStore):
+
+	def __init__(self, capacity, spill_file=None, cache_size=1024):
+		RingStore.__init__(self, MESSAGE_DTYPE, capacity, spill_file, cache_size)
+
+	def appendMessage(self, sarp_message):
+		timecode = sarp_message.record.timecode
+		abs_freq = sarp_message.record.abs_freq
+		protocol_num = sarp_message.protocol_num
+		return self.append((np.datetime64(sarp_message.message_creation_time, 'us'), sarp_message.source, MESSAGE_FORMATS.index(sarp_message.record.message_format),
+							np.frombuffer(sarp_message.bytes, dtype=np.uint8),
+							timecode if timecode != 'N/A' else -1,
+							abs_freq if abs_freq != 'N/A' else np.nan,
+							protocol_num if protocol_num != 'N/A' else -1,
+							sarp_message.bch_valid), sarp_message)
+
+	def build(self, row):
+		return SARPMessage(row['bytes'].tobytes(), row['time'].astype(datetime.datetime), MESSAGE_FORMATS[row['message_format']], int(row['source']))
+
+
+def createStores(config, spill_prefix):
+	'''
+	Build the frame and message stores from the [STORE] section of config.ini, evicted rows go to <spill_prefix>_frames.bin and <spill_prefix>_messages.bin.
+	'''
+	spill = config.getboolean('STORE', 'SPILL_ENABLED', fallback=False)
+	frame_store = SARPFrameStore(config.getint('STORE', 'FRAME_CAPACITY', fallback=100000), spill_prefix + '_frames.bin' if spill else None)
+	message_store = SARPMessageStore(config.getint('STORE', 'MESSAGE_CAPACITY', fallback=300000), spill_prefix + '_messages.bin' if spill else None)
+	return frame_store, message_store
@@ -0,0 +1,162 @@
+import numpy as np
+from itertools import combinations
+
+#Beacon message error correcting codes, C/S T.001 annex B. Bit 0 is the format flag (bit 25 of the transmitted message).
+#BCH-1 protects PDF-1 [0:61] with 21 parity bits [61:82], shortened from BCH(127,106).
+#BCH-2 protects PDF-2 [82:108] of long messages with 12 parity bits [108:120], shortened from BCH(63,51).
+
+BCH1_GENERATOR = 0b1001101101100111100011 #x^21+x^18+x^17+x^15+x^14+x^12+x^11+x^8+x^7+x^6+x^5+x+1
+BCH2_GENERATOR = 0b1010100111001 #x^12+x^10+x^8+x^5+x^4+x^3+1
+
+BCH1_START, BCH1_LEN = 0, 82
+BCH2_START, BCH2_LEN = 82, 38
+
+MAX_ERRORS = 2
+
+
+def polymod(value, generator):
+	'''
+	Remainder of the GF(2) polynomial division of value by generator, both given as integers.
+	'''
+	degree = generator.bit_length() - 1
+	while value.bit_length() > degree:
+		value ^= generator << (value.bit_length() - 1 - degree)
+	return value
+
+
+class BCHCode(object):
+
+	'''
+	Shortened binary BCH code with n bit codewords, k data bits followed by n-k parity bits.
+	Syndromes are computed with one lookup table per codeword byte, error patterns of up to max_errors bits
+	are corrected by looking up their syndrome.
+	'''
+
+	def __init__(self, n, k, generator, max_errors=MAX_ERRORS):
+		self.n = n
+		self.k = k
+		self.generator = generator
+		self.n_bytes = -(-n // 8)
+
+		#Codewords are handled left aligned in n_bytes bytes, codeword bit i is the coefficient of x^(n-1-i)
+		bit_syndromes = [polymod(1 << (n - 1 - i), generator) for i in range(n)]
+		self.byte_tables = np.zeros((self.n_bytes, 256), dtype=np.uint32)
+		for index in range(self.n_bytes):
+			for value in range(256):
+				syndrome = 0
+				for bit in range(8):
+					position = 8*index + bit
+					if position < n and (value >> (7 - bit)) & 1:
+						syndrome ^= bit_syndromes[position]
+				self.byte_tables[index, value] = syndrome
+		self.tables = self.byte_tables.tolist()
+
+		corrections = {}
+		for count in range(1, max_errors + 1):
+			for positions in combinations(range(n), count):
+				syndrome = 0
+				for position in positions:
+					syndrome ^= bit_syndromes[position]
+				corrections.setdefault(syndrome, positions)
+		self.corrections = corrections
+
+		#Sorted copy of the correction table for the vectorized lookups
+		self.sorted_syndromes = np.array(sorted(corrections), dtype=np.uint32)
+		self.patterns = np.zeros((len(self.sorted_syndromes), self.n_bytes), dtype=np.uint8)
+		self.error_counts = np.zeros(len(self.sorted_syndromes), dtype=np.int8)
+		for row, syndrome in enumerate(self.sorted_syndromes.tolist()):
+			for position in corrections[syndrome]:
+				self.patterns[row, position // 8] |= 0x80 >> (position % 8)
+			self.error_counts[row] = len(corrections[syndrome])
+
+	def syndrome(self, codeword):
+		'''
+		Syndrome of a codeword given as integer of n bits, 0 for a valid codeword.
+		'''
+		syndrome = 0
+		for table, value in zip(self.tables, (codeword << (8*self.n_bytes - self.n)).to_bytes(self.n_bytes, 'big')):
+			syndrome ^= table[value]
+		return syndrome
+
+	def correct(self, codeword):
+		'''
+		Returns (number of corrected bit errors, corrected codeword), the number of errors is -1 and the codeword
+		is returned unchanged when the errors can not be corrected.
+		'''
+		syndrome = self.syndrome(codeword)
+		if syndrome == 0:
+			return 0, codeword
+		positions = self.corrections.get(syndrome)
+		if positions is None:
+			return -1, codeword
+		for position in positions:
+			codeword ^= 1 << (self.n - 1 - position)
+		return len(positions), codeword
+
+	def encode(self, data):
+		'''
+		Codeword of k data bits given as integer.
+		'''
+		shifted = data << (self.n - self.k)
+		return shifted | polymod(shifted, self.generator)
+
+	def syndromeBatch(self, codewords):
+		'''
+		Syndromes of an (M, n_bytes) uint8 array of left aligned codewords, bits past n must be 0.
+		'''
+		syndromes = np.zeros(len(codewords), dtype=np.uint32)
+		for index in range(self.n_bytes):
+			syndromes ^= self.byte_tables[index][codewords[:, index]]
+		return syndromes
+
+	def correctBatch(self, codewords):
+		'''
+		Vectorized correct() of an (M, n_bytes) uint8 array of left aligned codewords, bits past n must be 0.
+		Returns (M,) int8 error counts and the corrected codewords.
+		'''
+		syndromes = self.syndromeBatch(codewords)
+		rows = np.minimum(np.searchsorted(self.sorted_syndromes, syndromes), len(self.sorted_syndromes) - 1)
+		found = self.sorted_syndromes[rows] == syndromes
+		errors = np.where(syndromes == 0, 0, np.where(found, self.error_counts[rows], -1)).astype(np.int8)
+		corrected = codewords ^ np.where(found[:, None], self.patterns[rows], 0).astype(np.uint8)
+		return errors, corrected
+
+
+BCH1 = BCHCode(BCH1_LEN, BCH1_LEN - 21, BCH1_GENERATOR)
+BCH2 = BCHCode(BCH2_LEN, BCH2_LEN - 12, BCH2_GENERATOR)
+
+
+def checkBeacon(beacon, beacon_length):
+	'''
+	Verify and correct a beacon given as integer of beacon_length (88 or 120) bits.
+	Returns (BCH-1 errors, BCH-2 errors, corrected beacon), errors are the number of corrected bits or -1 when uncorrectable,
+	BCH-2 errors are None for short messages.
+	'''
+	bch1_shift = beacon_length - BCH1_START - BCH1_LEN
+	bch1_errors, codeword = BCH1.correct((beacon >> bch1_shift) & ((1 << BCH1_LEN) - 1))
+	beacon = (beacon & ((1 << bch1_shift) - 1)) | (codeword << bch1_shift)
+	if beacon_length < BCH2_START + BCH2_LEN:
+		return bch1_errors, None, beacon
+
+	bch2_errors, codeword = BCH2.correct(beacon & ((1 << BCH2_LEN) - 1))
+	beacon = (beacon >> BCH2_LEN << BCH2_LEN) | codeword
+	return bch1_errors, bch2_errors, beacon
+
+
+def checkBeacons(beacons, beacon_lengths):
+	'''
+	Vectorized checkBeacon() of the decodeMessages() beacon and beacon_length columns.
+	Returns (BCH-1 errors, BCH-2 errors, corrected beacons), BCH-2 errors are 0 for short messages
+	and both are 0 when there is no beacon.
+	'''
+	bits = np.unpackbits(beacons, axis=1)
+	bch1_errors, corrected = BCH1.correctBatch(np.packbits(bits[:, BCH1_START:BCH1_START + BCH1_LEN], axis=1))
+	bits[:, BCH1_START:BCH1_START + BCH1_LEN] = np.unpackbits(corrected, axis=1)[:, :BCH1_LEN]
+
+	long = beacon_lengths >= BCH2_START + BCH2_LEN
+	bch2_errors = np.zeros(len(beacons), dtype=np.int8)
+	bch2_errors[long], corrected = BCH2.correctBatch(np.packbits(bits[long, BCH2_START:BCH2_START + BCH2_LEN], axis=1))
+	bits[long, BCH2_START:BCH2_START + BCH2_LEN] = np.unpackbits(corrected, axis=1)[:, :BCH2_LEN]
+
+	bch1_errors = np.where(beacon_lengths > 0, bch1_errors, 0).astype(np.int8)
+	return bch1_errors, bch2_errors, np.packbits(bits, axis=1)
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+__author__ = "Tom Mladenov, tom.mladenov@ieee.org"
+
+import time
+import json
+import logging
+import argparse
+import platform
+import datetime
+import numpy as np
+from bitarray import util
+from manchester import decodeManchester, decodeManchesterFrames
+from SARPFrame import SARPFrame, decodeFrames
+from SARPMessage import SARPMessage
+from BeaconMessage import BeaconMessage
+from DecoderEngine import DecoderEngine, EngineConsumer, Stream
+from synthetic import generateFrames, SYNTHETIC_FORMATS
+
+VERSION = 'v1.3'
+
+#Throughput and latency of every decoding stage on synthetic frames, the results can be written as JSON and compared with
+#the results of another version. The ingest stage runs the DecoderEngine the GUI and headless processors are built on,
+#fed over ZMQ on localhost like by a flowgraph.
+
+
+def latencyStats(latencies_ns):
+	latencies = np.asarray(latencies_ns, dtype=np.float64)/1000.0
+	if len(latencies) == 0:
+		return {}
+	return {'mean': float(latencies.mean()), 'p50': float(np.percentile(latencies, 50)), 'p90': float(np.percentile(latencies, 90)),
+			'p99': float(np.percentile(latencies, 99)), 'max': float(latencies.max())}
+
+
+def timeCalls(function, items, unit):
+	'''
+	Call function on every item, returns the stage result with the throughput and the latency of the calls.
+	'''
+	latencies = np.zeros(len(items), dtype=np.int64)
+	clock = time.perf_counter_ns
+	start = clock()
+	for index, item in enumerate(items):
+		call = clock()
+		function(item)
+		latencies[index] = clock() - call
+	seconds = (clock() - start)/1e9
+	return {'items': len(items), 'unit': unit, 'seconds': seconds, 'per_second': len(items)/seconds, 'latency_us': latencyStats(latencies)}
+
+
+def timeBatches(function, batches, unit):
+	'''
+	Like timeCalls for vectorized functions, the latency is per batch.
+	'''
+	result = timeCalls(function, batches, unit)
+	result['items'] = sum(len(batch) for batch in batches)
+	result['per_second'] = result['items']/result['seconds']
+	result['batch'] = len(batches[0]) if batches else 0
+	return result
+
+
+class IngestProbe(EngineConsumer):
+
+	def __init__(self):
+		self.latencies = []
+
+	def newFrame(self, sarp_frame):
+		self.latencies.append((datetime.datetime.utcnow() - sarp_frame.frame_creation_time) // datetime.timedelta(microseconds=1)*1000)
+
+
+def benchmarkIngest(symbols, expected, message_format, port, workers, slots, timeout=60.0):
+	'''
+	Publish the symbol payloads to a DecoderEngine as one burst and wait until the expected number of frames is delivered,
+	the latency is from receive to delivery. The decode pipeline has the given number of slots, payloads it drops are reported.
+	'''
+	import zmq
+	context = zmq.Context()
+	publisher = context.socket(zmq.PUB)
+	publisher.setsockopt(zmq.SNDHWM, len(symbols) + 1)
+	publisher.bind('tcp://127.0.0.1:{PORT}'.format(PORT=port))
+
+	engine = DecoderEngine([Stream('tcp://127.0.0.1:{PORT}'.format(PORT=port), message_format, 'benchmark')], workers=workers, slots=slots)
+	probe = IngestProbe()
+	engine.addConsumer(probe)
+	engine.start()
+	time.sleep(2.0 if workers else 0.5) #subscription handshake and worker start
+
+	payloads = [row.tobytes() for row in symbols]
+	start = time.perf_counter()
+	for payload in payloads:
+		publisher.send(payload)
+	while engine.sarp_frames.count + engine.dropped < expected and time.perf_counter() - start < timeout:
+		time.sleep(0.001)
+	seconds = time.perf_counter() - start
+	engine.stop()
+	engine.join()
+	publisher.close()
+	context.term()
+
+	delivered = engine.sarp_frames.count
+	return {'items': delivered, 'unit': 'frames', 'seconds': seconds, 'per_second': delivered/seconds, 'latency_us': latencyStats(probe.latencies),
+			'received': engine.received, 'dropped': engine.dropped, 'late': engine.late, 'workers': workers, 'slots': slots}
+
+
+def runBenchmarks(args):
+	symbols, frames = generateFrames(args.frames, args.format, args.seed, args.long_fraction, beacon_errors=args.beacon_errors,
+									symbol_error_rate=args.symbol_error_rate)
+	now = datetime.datetime.utcnow()
+	good = [row for row in symbols if decodeManchesterFrames(row)[1][0]] #the per item stages only get what the decoder passes on
+	frame_bytes = [decodeManchester(row) for row in good]
+	message_bytes = [frame[start:start + 24] for frame in frame_bytes for start in (0, 24, 48)]
+	records = [SARPMessage(message, now, args.format).record for message in message_bytes]
+	beacons = [util.int2ba(record.beacon, length=record.beacon_length, endian='big') for record in records if record.beacon is not None]
+	batches = [symbols[start:start + args.batch] for start in range(0, len(symbols), args.batch)]
+
+	def decodeFrame(data):
+		sarp_frame = SARPFrame(data, args.format, now)
+		return sarp_frame.valid
+
+	def decodeMessage(data):
+		message = SARPMessage(data, now, args.format)
+		return message.bch_valid
+
+	def decodeBeacon(bits):
+		return BeaconMessage(bits, now).decode() #uncached, BeaconMessage.data would hit BEACON_CACHE
+
+	def decodeBatch(batch):
+		decoded, valid = decodeManchesterFrames(batch)
+		return decodeFrames(decoded[valid], args.format)
+
+	stages = {}
+	stages['decodeManchester'] = timeCalls(lambda row: decodeManchester(row), good, 'frames')
+	stages['SARPFrame'] = timeCalls(decodeFrame, frame_bytes, 'frames')
+	stages['SARPMessage'] = timeCalls(decodeMessage, message_bytes, 'messages')
+	stages['BeaconMessage'] = timeCalls(decodeBeacon, beacons, 'beacons')
+	stages['decodeFrames (batch)'] = timeBatches(decodeBatch, batches, 'frames')
+	if not args.no_ingest:
+		stages['ingest'] = benchmarkIngest(symbols, len(good), args.format, args.port, args.workers, args.slots)
+
+	return {
+		'version': VERSION,
+		'timestamp': now.isoformat() + 'Z',
+		'python': platform.python_version(),
+		'numpy': np.__version__,
+		'machine': platform.machine(),
+		'platform': platform.platform(),
+		'settings': {'frames': args.frames, 'format': args.format, 'seed': args.seed, 'long_fraction': args.long_fraction,
+					'beacon_errors': args.beacon_errors, 'symbol_error_rate': args.symbol_error_rate, 'batch': args.batch, 'workers': args.workers, 'slots': args.slots},
+		'stages': stages
+		}
+
+
+def printResults(results, baseline=None):
+	print('SARSAT frame processor benchmark {VER}, {N} synthetic {FMT} frames'.format(VER=results['version'], N=results['settings']['frames'],
+																						FMT=results['settings']['format']))
+	print('{STAGE:<22} {RATE:>14} {MEAN:>10} {P99:>10} {DROP:>8} {CMP:>10}'.format(STAGE='stage', RATE='items/s', MEAN='mean us', P99='p99 us',
+																					DROP='dropped', CMP='vs base' if baseline else ''))
+	for name, stage in results['stages'].items():
+		compare = ''
+		if baseline and name in baseline['stages']:
+			compare = '{RATIO:.2f}x'.format(RATIO=stage['per_second']/baseline['stages'][name]['per_second'])
+		print('{STAGE:<22} {RATE:>14,.0f} {MEAN:>10.1f} {P99:>10.1f} {DROP:>8} {CMP:>10}'.format(STAGE=name, RATE=stage['per_second'],
+				MEAN=stage['latency_us'].get('mean', float('nan')), P99=stage['latency_us'].get('p99', float('nan')),
+				DROP=stage.get('dropped', ''), CMP=compare))
+
+
+if __name__ == '__main__':
+
+	parser = argparse.ArgumentParser(description='Throughput and latency benchmark of the decoding stages on synthetic SARP frames')
+	parser.add_argument("-n", "--frames", type=int, default=5000, help="number of synthetic frames")
+	parser.add_argument("--format", default='SARSAT SARP-3', choices=SYNTHETIC_FORMATS, help="SARP message format")
+	parser.add_argument("--seed", type=int, default=0, help="seed of the frame generator")
+	parser.add_argument("--long-fraction", type=float, default=0.5, help="fraction of long beacons among the user protocol beacons")
+	parser.add_argument("--beacon-errors", type=int, default=0, help="bit errors injected in every beacon, up to 2 per BCH code are corrected")
+	parser.add_argument("--symbol-error-rate", type=float, default=0.0, help="fraction of frames with an invalid Manchester symbol pair")
+	parser.add_argument("--batch", type=int, default=1024, help="frames per call of the batch decoder")
+	parser.add_argument("--workers", type=int, default=0, help="decode processes of the ingest stage, 0 decodes in the engine thread")
+	parser.add_argument("--slots", type=int, default=256, help="shared memory slots of the decode pipeline, like SLOTS in config.ini")
+	parser.add_argument("--port", type=int, default=38299, help="local port of the ingest stage")
+	parser.add_argument("--no-ingest", action='store_true', help="skip the ZMQ ingest stage")
+	parser.add_argument("-o", "--output", help="JSON file for the results")
+	parser.add_argument("-c", "--compare", help="JSON results of an earlier run to compare the throughput with")
+	args = parser.parse_args()
+
+	logging.getLogger('event_logger').setLevel(logging.CRITICAL) #bad decodes are expected with --symbol-error-rate
+	results = runBenchmarks(args)
+
+	baseline = None
+	if args.compare:
+		with open(args.compare) as file:
+			baseline = json.load(file)
+	printResults(results, baseline)
+
+	if args.output:
+		with open(args.output, 'w') as file:
+			json.dump(results, file, indent=4)
@@ -1,9 +1,13 @@
+import os
 import json
 
-f = open('countries.json',)
+f = open(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'countries.json'),)
 countries = json.load(f)
 
 #json file is from
 #https://github.com/michaeljfazio/MIDs/blob/master/mids.json
 
 f.close()
+
+#Same table keyed by the integer MID as decoded from the beacon, entries are [alpha2, alpha3, subdivision, name]
+COUNTRIES = {int(code): tuple(entry) for code, entry in countries.items()}
@@ -0,0 +1,57 @@
+import sys
+import numpy as np
+from contextlib import contextmanager
+from multiprocessing import shared_memory
+from manchester import decodeManchester, FRAME_SYMBOLS
+from SARPFrame import SARPFrame
+
+#Code run in the decode processes of the DecodePipeline. Spawned processes import the main module of the parent,
+#for process_live that is the GUI with PySide2 and pyqtgraph, so the pool is started with this small module as main.
+
+
+def decodeSymbols(symbols, message_format, source=0, creation_time=None):
+	'''
+	Manchester and SARP decode of one symbol payload, returns (SARPFrame, None) or (None, error) for a bad decode.
+	'''
+	try:
+		bytes = decodeManchester(symbols, inverted=False) #if we have a bad decode, this will raise an exception and the frame will not be considered
+		sarp_frame = SARPFrame(bytes, message_format, creation_time, source)
+	except Exception as e:
+		return None, str(e)
+
+	if sarp_frame.valid:
+		for message in (sarp_frame.message1, sarp_frame.message2, sarp_frame.message3):
+			message.bch #memoized, so the BCH check also runs in the decoding process
+	return sarp_frame, None
+
+
+#Every worker process attaches to the shared memory slots itself, only slot numbers travel through the pool
+worker_memory = None
+worker_slots = None
+
+
+def initWorker(name, n_slots):
+	global worker_memory, worker_slots
+	worker_memory = shared_memory.SharedMemory(name=name)
+	worker_slots = np.ndarray((n_slots, FRAME_SYMBOLS), dtype=np.uint8, buffer=worker_memory.buf)
+
+
+def decodeSlots(tasks):
+	results = []
+	for seq, slot, message_format, source, creation_time in tasks:
+		sarp_frame, error = decodeSymbols(worker_slots[slot], message_format, source, creation_time)
+		results.append((seq, slot, source, creation_time, sarp_frame, error))
+	return results
+
+
+@contextmanager
+def workerMain():
+	'''
+	Processes spawned within the block import this module as their main module instead of the one of the parent.
+	'''
+	main = sys.modules['__main__']
+	sys.modules['__main__'] = sys.modules[__name__]
+	try:
+		yield
+	finally:
+		sys.modules['__main__'] = main
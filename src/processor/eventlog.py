@@ -0,0 +1,114 @@
+import time
+import queue
+import logging
+import logging.handlers
+from collections import Counter
+from threading import Lock, Thread
+
+#Event types of the hot path log lines, tagged with extra={'event': <type>}
+EVENT_TYPES = ['good_frame', 'bad_frame', 'message']
+
+listeners = {}
+
+
+class EventSampler(logging.Filter):
+
+	'''
+	Rate limiting and sampling of log records tagged with an event type, untagged records always pass.
+	limits maps an event type to (rate, sample): per interval the first rate records pass, of the remaining ones
+	every sample-th record (0 passes none of them). Types without limits pass unchanged.
+	After every interval one summary line with the number of events and logged lines per type is written,
+	so the totals are kept when the individual lines are not.
+	'''
+
+	def __init__(self, logger, limits, interval=1.0):
+		logging.Filter.__init__(self)
+		self.logger = logger
+		self.limits = limits
+		self.interval = interval
+		self.lock = Lock()
+		self.events = Counter()
+		self.logged = Counter()
+		self.active = True
+		Thread(target=self.run, daemon=True).start()
+
+	def filter(self, record):
+		event = getattr(record, 'event', None)
+		if event is None or event not in self.limits:
+			return True
+		rate, sample = self.limits[event]
+		with self.lock:
+			count = self.events[event]
+			self.events[event] += 1
+			keep = count < rate or (sample > 0 and (count - rate) % sample == 0)
+			if keep:
+				self.logged[event] += 1
+		return keep
+
+	def summarize(self):
+		with self.lock:
+			events, self.events = self.events, Counter()
+			logged, self.logged = self.logged, Counter()
+		if events:
+			self.logger.info('EVENTS {INTERVAL:g} s: {COUNTS}'.format(INTERVAL=self.interval, COUNTS=', '.join(
+				'{EVENT} {N} ({LOGGED} logged)'.format(EVENT=event, N=n, LOGGED=logged[event]) for event, n in sorted(events.items()))))
+
+	def run(self):
+		while self.active:
+			time.sleep(self.interval)
+			self.summarize()
+
+	def stop(self):
+		self.active = False
+		self.summarize()
+
+
+def readEventLimits(config):
+	'''
+	(rate, sample) per event type from the [LOG] <EVENT>_RATE and <EVENT>_SAMPLE options of config.ini,
+	event types without a RATE option are not limited.
+	'''
+	limits = {}
+	for event in EVENT_TYPES:
+		key = event.upper()
+		if config.has_option('LOG', key + '_RATE'):
+			limits[event] = (config.getint('LOG', key + '_RATE'), config.getint('LOG', key + '_SAMPLE', fallback=0))
+	return limits
+
+
+def setup_logger(name, log_file, level=logging.INFO, limits=None, interval=1.0):
+	'''
+	The logger only puts records on a queue, a QueueListener thread writes them to the log file and the terminal.
+	With limits the tagged event records are rate limited and sampled, see EventSampler.
+	'''
+	formatter = logging.Formatter('%(asctime)s %(levelname)s %(message)s')
+	logging.Formatter.converter = time.gmtime
+	fileHandler = logging.FileHandler(log_file)
+	streamHandler = logging.StreamHandler()
+
+	fileHandler.setFormatter(formatter)
+	streamHandler.setFormatter(formatter)
+
+	log_queue = queue.SimpleQueue()
+	listener = logging.handlers.QueueListener(log_queue, fileHandler, streamHandler)
+	listener.start()
+
+	logger = logging.getLogger(name)
+	logger.setLevel(level)
+	logger.addHandler(logging.handlers.QueueHandler(log_queue))
+	sampler = None
+	if limits:
+		sampler = EventSampler(logger, limits, interval)
+		logger.addFilter(sampler)
+	listeners[name] = (listener, sampler)
+	return logger
+
+
+def shutdown_logger(name):
+	'''
+	Write the last summary and the queued records, call before exiting the process.
+	'''
+	listener, sampler = listeners.pop(name)
+	if sampler is not None:
+		sampler.stop()
+	listener.stop()
@@ -0,0 +1,40 @@
+import numpy as np
+
+FRAME_SYMBOLS = 1200
+FRAME_BYTES = FRAME_SYMBOLS // 16
+
+#The flowgraph publishes one byte per symbol, a symbol is considered high only if the byte equals 1.
+#A 10 symbol pair decodes to a 1, a 01 pair to a 0, 00 and 11 pairs are decode errors.
+
+def decodeManchesterFrames(symbols, inverted=False):
+	'''
+	Decode a batch of Manchester encoded frames in one go.
+
+	symbols is anything np.asarray accepts with shape (N, 2*k) (or a single frame of shape (2*k,)),
+	returns a (N, k/8) uint8 array with the decoded bytes and a (N,) boolean mask that is False
+	for every frame containing at least one invalid symbol pair.
+	'''
+	symbols = np.asarray(symbols)
+	if symbols.ndim == 1:
+		symbols = symbols.reshape(1, -1)
+	if symbols.shape[1] % 16 != 0:
+		raise ValueError("frames must contain a multiple of 16 symbols, got {LEN}".format(LEN=symbols.shape[1]))
+
+	high = (symbols == 1).reshape(symbols.shape[0], -1, 2)
+	first = high[:, :, 0]
+	valid = np.logical_xor(first, high[:, :, 1]).all(axis=1)
+
+	if inverted:
+		first = ~first
+
+	return np.packbits(first, axis=1), valid
+
+
+def decodeManchester(symbols, inverted=False):
+	'''
+	Decode a single frame, raises an exception on a bad symbol pair like the original per-bit decoder did.
+	'''
+	frames, valid = decodeManchesterFrames(symbols, inverted)
+	if not valid[0]:
+		raise Exception("Error in differential decoding of frame!")
+	return frames[0].tobytes()
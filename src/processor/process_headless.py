@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+__author__ = "Tom Mladenov, tom.mladenov@ieee.org"
+
+import os
+import signal
+import argparse
+import configparser
+import datetime
+import logging
+from DecoderEngine import DecoderEngine, EngineConsumer, Stream, readStreams, readReceiveSettings, DEFAULT_MESSAGE_FORMAT
+from SARPMessage import MESSAGE_FORMATS, NA
+from BeaconMessage import BEACON_CACHE
+from SARPStore import createStores
+from rawlog import createArchive
+from SARPDatabase import createDatabase
+from eventlog import setup_logger, shutdown_logger, readEventLimits
+
+VERSION = 'v1.3'
+
+
+class MessageLine(object):
+
+	'''
+	Text of the event log line of one message. It is only built, and the beacon only decoded, when the line is formatted,
+	which the event log does not do for the lines it samples away.
+	'''
+
+	__slots__ = ('message', 'label')
+
+	def __init__(self, message, label):
+		self.message = message
+		self.label = label
+
+	def __str__(self):
+		message = self.message
+		beacon = message.beacon_message.data if message.beacon_message is not None else {}
+		return '[{SRC}] {FMT} {RTPB} TC={TC} FREQ={FREQ} Hz BEACON={HEX} COUNTRY={CTRY} PROTOCOL={PROT}'.format(
+				SRC=self.label,
+				FMT=message.data['format'],
+				RTPB=message.data['rt/pb'],
+				TC=message.data['timecode'],
+				FREQ=message.data['abs_freq'],
+				HEX=beacon.get('beacon_hex', NA),
+				CTRY=beacon.get('country_name_alpha2', NA),
+				PROT=beacon.get('protocol_name_shortened', NA))
+
+
+class MessageLogger(EngineConsumer):
+
+	'''
+	Headless output, writes every decoded SARP message with its beacon summary and stream label to the event log.
+	'''
+
+	def __init__(self, streams):
+		self.streams = streams
+
+	def newMessages(self, sarp_messages):
+		for message in sarp_messages:
+			eventLogger.info('MESSAGE: %s', MessageLine(message, self.streams[message.source].label), extra={'event': 'message'})
+
+
+if __name__ == '__main__':
+
+	path = os.path.dirname(os.path.abspath(__file__))
+	config = configparser.ConfigParser()
+	config.read(path + '/config/config.ini')
+
+	parser = argparse.ArgumentParser(description='Headless SARSAT frame processor')
+	parser.add_argument("--host", help="address of a single GNU Radio flowgraph symbol publisher, overrides the streams of config.ini")
+	parser.add_argument("--port", type=int, default=config.getint('NETWORK', 'SYMBOL_STREAM_PORT', fallback=38211), help="symbol stream port of --host")
+	parser.add_argument("--format", default=DEFAULT_MESSAGE_FORMAT, choices=MESSAGE_FORMATS, help="SARP message format of --host")
+	args = parser.parse_args()
+
+	if args.host:
+		streams = [Stream('tcp://{HOST}:{PORT}'.format(HOST=args.host, PORT=args.port), args.format, '{HOST}:{PORT}'.format(HOST=args.host, PORT=args.port))]
+	else:
+		streams = readStreams(config)
+
+	now = datetime.datetime.utcnow()
+	os.makedirs(path + '/log', exist_ok=True)
+	eventLogger = setup_logger('event_logger', path + '/log/sarp_processor_{DATE}.log'.format(DATE=now.strftime("%Y%m%d_%H%M%SZ")), level=logging.INFO,
+							limits=readEventLimits(config), interval=config.getfloat('LOG', 'SUMMARY_INTERVAL', fallback=1.0))
+	eventLogger.info('SARSAT Frame Processor Headless {VER}'.format(VER=VERSION))
+
+	BEACON_CACHE.resize(config.getint('STORE', 'BEACON_CACHE_SIZE', fallback=4096))
+	frame_store, message_store = createStores(config, path + '/log/sarp_{DATE}'.format(DATE=now.strftime("%Y%m%d_%H%M%SZ")))
+	engine = DecoderEngine(streams, frame_store, message_store,
+						config.getint('DECODER', 'WORKERS', fallback=0), config.getint('DECODER', 'SLOTS', fallback=256), readReceiveSettings(config),
+						createArchive(config, path + '/log/sarp_raw'))
+	engine.addConsumer(MessageLogger(streams))
+	database = createDatabase(config, path)
+	if database:
+		engine.addConsumer(database)
+
+	signal.signal(signal.SIGINT, lambda signum, frame: engine.stop())
+	signal.signal(signal.SIGTERM, lambda signum, frame: engine.stop())
+
+	engine.start()
+	while engine.is_alive():
+		engine.join(1.0)
+
+	if database:
+		database.close()
+	eventLogger.info('Beacon cache: {HITS} hits, {MISSES} misses'.format(HITS=BEACON_CACHE.hits, MISSES=BEACON_CACHE.misses))
+	shutdown_logger('event_logger')
@@ -4,10 +4,10 @@
 __author__ = "Tom Mladenov, tom.mladenov@ieee.org"
 
 import os
-import zmq
 import sys
 import time
-import csv
+import configparser
+from collections import namedtuple, OrderedDict, deque
 from threading import Thread, Lock
 from PySide2 import QtWidgets
 from PySide2 import QtCore
@@ -15,44 +15,41 @@ from PySide2 import QtGui
 from PySide2 import QtUiTools
 import datetime
 import logging
-from bitarray import bitarray, util
-from SARPFrame import SARPFrame
-from BeaconMessage import USER_PROTOCOLS
+from DecoderEngine import DecoderEngine, EngineConsumer, readStreams, readReceiveSettings, DEFAULT_RECEIVE
+from SARPStore import createStores
+from SARPExport import SARPExporter
+from rawlog import createArchive
+from SARPDatabase import createDatabase
+from BeaconMessage import BEACON_CACHE
+from SARPMessage import NA
+from eventlog import setup_logger, shutdown_logger, readEventLimits
+from BeaconMessage import USER_PROTOCOLS_SHORTENED
 import pyqtgraph as pg
+import numpy as np
 import subprocess
 
 VERSION = 'v1.3'
 
-def decodeManchester(arr, inverted):
-	len = arr.length()
+#Doppler viewer symbol and colour per user protocol number, -1 collects everything else
+PROTOCOL_STYLES = {
+		0: ('o', (255, 0, 0, 255)),
+		1: ('s', (0, 255, 0, 255)),
+		2: ('t', (0, 0, 255, 255)),
+		3: ('d', (0, 0, 255, 255)),
+		4: ('s', (0, 255, 0, 255)),
+		5: ('t', (255, 0, 0, 255)),
+		6: ('d', (255, 0, 0, 255)),
+		-1: ('+', (255, 0, 0, 255))
+		}
 
-	if not len % 2 == 0:
-		raise Exception("bitarray must be of even length!")
-	else:
-		a = bitarray()
-
-	index = 0
-	while True:
-		if arr[index] == 0 and arr[index + 1] == 1:
-			if not inverted:
-				a.append(False)
-			else:
-				a.append(True)
-			index = index + 2
-		elif arr[index] == 1 and arr[index + 1] == 0:
-			if not inverted:
-				a.append(True)
-			else:
-				a.append(False)
-			index = index + 2
-		else:
-			raise Exception("Error in differential decoding of frame!")
+#File dialog filters of the message export and their SARPExporter format
+EXPORT_FILTERS = OrderedDict([('CSV per protocol (*.csv)', 'csv'), ('Columnar binary per protocol (*.json)', 'columnar')])
 
-		if index + 1 > len:
-			break
-
-	return a.tobytes()
+#Decoder state and counters as published by the TMAdapter at the status refresh rate
+StatusSnapshot = namedtuple('StatusSnapshot', ['symbol', 'decoder', 'sync', 'format', 'frames', 'messages', 'received', 'dropped', 'late'])
 
+DENSITY_BINS = (400, 300)
+DENSITY_DEBOUNCE_MS = 250 #the density image is binned again when the view range did not change for this long
 
 class BeaconQueryWindow(QtWidgets.QDialog):
 
@@ -89,11 +86,57 @@ class BeaconQueryWindow(QtWidgets.QDialog):
 
 
 
-class SARPFrameTableModel(QtCore.QAbstractTableModel):
+GREEN = QtGui.QColor(0,255,0)
+RED = QtGui.QColor(255,0,0)
+YELLOW = QtGui.QColor(255,255,0)
+
+#Display strings, background colours and flag codes of one table row, computed once when the row is appended
+TableRow = namedtuple('TableRow', ['display', 'background', 'decoration'])
+NO_DECORATION = (None, None, None)
+
+
+class FlagIcons(object):
+
+	'''
+	Flag icons keyed by lowercase alpha-2 country code, the flag directory is listed once
+	and every icon is decoded on first use and kept, so painting the table does no disk I/O.
+	'''
+
+	def __init__(self, directory):
+		self.paths = {}
+		for filename in os.listdir(directory):
+			code, extension = os.path.splitext(filename)
+			if extension == '.png':
+				self.paths[code] = os.path.join(directory, filename)
+		self.icons = {}
 
-	def __init__(self, data):
+	def icon(self, code):
+		icon = self.icons.get(code)
+		if icon is None and code in self.paths:
+			icon = QtGui.QIcon(QtGui.QPixmap(self.paths.pop(code)))
+			self.icons[code] = icon
+		return icon
+
+
+FLAG_ICONS = FlagIcons(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'gui', 'graphics', 'flags'))
+
+
+class AppendTableModel(QtCore.QAbstractTableModel):
+
+	'''
+	Append-only model on top of a SARP store, flush() pulls the rows added to the store since the last call
+	and inserts them in one batch, rows beyond max_rows are trimmed from the top.
+	make_row(item, source label) turns every frame/message into a TableRow once, data() only indexes the cached row.
+	'''
+
+	def __init__(self, store, make_row, max_rows=None, labels=()):
 		QtCore.QAbstractTableModel.__init__(self)
-		self._data = data
+		self._store = store
+		self._make_row = make_row
+		self._labels = list(labels) #stream labels, indexed by the source of the frames/messages
+		self._data = []
+		self._next_seq = store.count
+		self._max_rows = max_rows
 
 	def setHeader(self, header):
 		self._header = header
@@ -104,25 +147,42 @@ class SARPFrameTableModel(QtCore.QAbstractTableModel):
 	def columnCount(self, parent):
 		return len(self._header)
 
+	def flush(self):
+		count = self._store.count
+		first = max(self._next_seq, self._store.first())
+		if self._max_rows:
+			first = max(first, count - self._max_rows)
+		self._next_seq = count
+		if first >= count:
+			return False
+
+		items = [self._store.get(seq) for seq in range(first, count)]
+		rows = [self._make_row(item, self.sourceLabel(item)) for item in items if item is not None]
+		if not rows:
+			return False
+
+		if self._max_rows and len(self._data) + len(rows) > self._max_rows:
+			excess = min(len(self._data), len(self._data) + len(rows) - self._max_rows)
+			self.beginRemoveRows(QtCore.QModelIndex(), 0, excess - 1)
+			del self._data[:excess]
+			self.endRemoveRows()
+
+		self.beginInsertRows(QtCore.QModelIndex(), len(self._data), len(self._data) + len(rows) - 1)
+		self._data.extend(rows)
+		self.endInsertRows()
+		return True
+
+	def sourceLabel(self, item):
+		return self._labels[item.source] if item.source < len(self._labels) else str(item.source)
+
 	def data(self, index, role):
-		if role == QtCore.Qt.BackgroundColorRole:
-			if index.column() == 2:
-				if self._data[index.row()].valid:
-					return QtGui.QColor(0,255,0)
-				else:
-					return QtGui.QColor(255,0,0)
-		elif role != QtCore.Qt.DisplayRole:
+		if not index.isValid():
 			return None
-		else:
-			if index.column() == 0:
-				return str(self._data[index.row()].frame_creation_time)
-			elif index.column() == 1:
-				return self._data[index.row()].length
-			elif index.column() == 2:
-				if self._data[index.row()].valid:
-					return 'VALID'
-				else:
-					return 'ERROR'
+		if role == QtCore.Qt.DisplayRole:
+			return self._data[index.row()].display[index.column()]
+		elif role == QtCore.Qt.BackgroundColorRole:
+			return self._data[index.row()].background[index.column()]
+		return None
 
 	def headerData(self, section, orientation, role):
 		if role != QtCore.Qt.DisplayRole or orientation != QtCore.Qt.Horizontal:
@@ -130,91 +190,67 @@ class SARPFrameTableModel(QtCore.QAbstractTableModel):
 		return self._header[section]
 
 
-class SARPMessageTableModel(QtCore.QAbstractTableModel):
+def frameRow(sarp_frame, label):
+	valid = 'VALID' if sarp_frame.valid else 'ERROR'
+	return TableRow(
+				display=(str(sarp_frame.frame_creation_time), sarp_frame.length, valid, label),
+				background=(None, None, GREEN if sarp_frame.valid else RED, None),
+				decoration=NO_DECORATION)
 
-	def __init__(self, data):
-		QtCore.QAbstractTableModel.__init__(self)
-		self._data = data
 
-	def setHeader(self, header):
-		self._header = header
+def messageRow(sarp_message, label):
+	data = sarp_message.data
+	beacon_data = sarp_message.beacon_message.data if sarp_message.beacon_message is not None else {}
 
-	def rowCount(self, parent):
-		return len(self._data)
+	if data['abs_freq'] != 'N/A':
+		freq = str(round(float(data['abs_freq'])/1000.0, 2))
+	else:
+		freq = 'N/A'
 
-	def columnCount(self, parent):
-		return len(self._header)
+	if beacon_data.get('country_name', NA) != NA:
+		flag = beacon_data['country_name_alpha2'].lower()
+	else:
+		flag = None
 
-	def data(self, index, role):
-		if index.isValid():
-
-			if role == QtCore.Qt.DecorationRole:
-				if index.column() == 11:
-					if self._data[index.row()].beacon_message.data['country_name'] != 'N/A':
-						country_string = self._data[index.row()].beacon_message.data['country_name_alpha2'].lower()
-						return QtGui.QIcon('gui/graphics/flags/{STR}.png'.format(STR=country_string))
-					else:
-						return None
-				else:
-					return None
-
-
-			elif role == QtCore.Qt.BackgroundColorRole:
-				if index.column() == 2:
-					if self._data[index.row()].data['rt/pb'] == 'REALTIME':
-						return QtGui.QColor(255,255,0)
-					else:
-						return None
-
-				elif index.column() == 3:
-					if self._data[index.row()].data['timecode_parity_valid']:
-						return QtGui.QColor(0,255,0)
-					else:
-						return QtGui.QColor(255,0,0)
-
-
-				elif index.column() == 8:
-					if self._data[index.row()].data['doppler_parity_valid']:
-						return QtGui.QColor(0,255,0)
-					else:
-						return QtGui.QColor(255,0,0)
-
-				elif index.column() == 1:
-					if self._data[index.row()].data['format_valid']:
-						return QtGui.QColor(0,255,0)
-					else:
-						return QtGui.QColor(255,0,0)
-			elif role != QtCore.Qt.DisplayRole:
-				return None
-			else:
-				switcher={
-							0: str(self._data[index.row()].data['message_creation_time']),
-							1: self._data[index.row()].data['format'],
-							2: self._data[index.row()].data['rt/pb'],
-							3: str(self._data[index.row()].data['timecode']),
-							4: str(self._data[index.row()].data['dru']),
-							5: str(self._data[index.row()].data['pseudo']),
-							6: self._data[index.row()].data['latest'],
-							7: self._data[index.row()].data['type'],
-							8: str(round(float(self._data[index.row()].data['abs_freq'])/1000.0, 2)),
-							9: self._data[index.row()].data['level_dbm'],
-							10: self._data[index.row()].data['s/no_db'],
-							11: self._data[index.row()].beacon_message.data['country_name_alpha2'],
-							12: self._data[index.row()].beacon_message.data['protocol_name_shortened'],
-							13: self._data[index.row()].beacon_message.data['beacon_hex']
-						}
-
-				return switcher.get(index.column(), "N/A")
+	return TableRow(
+				display=(str(data['message_creation_time']), data['format'], data['rt/pb'], str(data['timecode']),
+						str(data['dru']), str(data['pseudo']), data['latest'], data['type'], freq, data['level_dbm'], data['s/no_db'],
+						beacon_data.get('country_name_alpha2', NA), beacon_data.get('protocol_name_shortened', NA), beacon_data.get('beacon_hex', NA),
+						label),
+				background=(None,
+						GREEN if data['format_valid'] else RED,
+						YELLOW if data['rt/pb'] == 'REALTIME' else None,
+						GREEN if data['timecode_parity_valid'] else RED,
+						None, None, None, None,
+						GREEN if data['doppler_parity_valid'] else RED,
+						None, None, None, None,
+						GREEN if beacon_data.get('bch_valid') else RED,
+						None),
+				decoration=(None,)*11 + (flag, None, None, None))
 
-	def headerData(self, section, orientation, role):
-		if role != QtCore.Qt.DisplayRole or orientation != QtCore.Qt.Horizontal:
-			return None
-		return self._header[section]
+
+class SARPFrameTableModel(AppendTableModel):
+
+	def __init__(self, store, max_rows=None, labels=()):
+		AppendTableModel.__init__(self, store, frameRow, max_rows, labels)
+
+
+class SARPMessageTableModel(AppendTableModel):
+
+	def __init__(self, store, max_rows=None, labels=()):
+		AppendTableModel.__init__(self, store, messageRow, max_rows, labels)
+
+	def data(self, index, role):
+		if index.isValid() and role == QtCore.Qt.DecorationRole:
+			flag = self._data[index.row()].decoration[index.column()]
+			return FLAG_ICONS.icon(flag) if flag else None
+		return AppendTableModel.data(self, index, role)
 
 
 class Main(QtWidgets.QMainWindow):
 
-	prev_len = 0
+	export_progress_signal = QtCore.Signal(int, int)
+	export_finished_signal = QtCore.Signal(object, int, object)
 
 	def __init__(self, parent=None):
 		super(Main, self).__init__(parent)
@@ -231,14 +267,36 @@ class Main(QtWidgets.QMainWindow):
 		self.layout_widget = pg.GraphicsLayoutWidget()
 		self.beaconwindow = self.layout_widget.addPlot()
 
-		self.beaconplot = pg.ScatterPlotItem(size=10, pen=pg.mkPen(None))
-		self.beaconplot.sigClicked.connect(self.querySample)
+		self.beaconwindow.addLegend()
 
+		#one scatter item per protocol so new points can be appended without per-point symbols and brushes
+		self.beaconplots = {}
+		for protocol, (symbol, color) in PROTOCOL_STYLES.items():
+			name = USER_PROTOCOLS_SHORTENED.get(protocol, 'Other')
+			self.beaconplots[protocol] = pg.ScatterPlotItem(size=10, pen=pg.mkPen(None), symbol=symbol, brush=pg.mkBrush(*color), name=name)
+			self.beaconplots[protocol].sigClicked.connect(self.querySample)
+			self.beaconwindow.addItem(self.beaconplots[protocol])
+		self.plotted_seq = 0
+		self.trimmed_seq = 0
+
+		#when more points than the threshold are in view the scatter items are replaced by a density image,
+		#its histogram is kept for the binned view range and only the new and the evicted rows are added and subtracted
+		self.density_threshold = config.getint('GUI', 'DOPPLER_DENSITY_THRESHOLD', fallback=20000)
+		self.density_mode = False
+		self.density_range = None
+		self.density_histogram = np.zeros(DENSITY_BINS, dtype=np.int64)
+		self.density_count = 0
+		self.density_chunks = deque() #(sequence numbers, flat bin numbers) of the binned rows per tick
+		self.density_image = pg.ImageItem()
+		self.density_image.hide()
+		self.beaconwindow.addItem(self.density_image, ignoreBounds=True)
+		self.densityTimer = QtCore.QTimer()
+		self.densityTimer.setSingleShot(True)
+		self.densityTimer.timeout.connect(self.rebinDensity)
+		self.beaconwindow.getViewBox().sigRangeChanged.connect(lambda *args: self.densityTimer.start(DENSITY_DEBOUNCE_MS))
 
 		self.ref_freq = pg.InfiniteLine(pos=406022500, angle=0)
-		self.beaconwindow.addItem(self.beaconplot)
 		self.beaconwindow.addItem(self.ref_freq)
-		self.beaconwindow.addLegend()
 		self.beaconwindow.setLabel('left', "Burst frequency [Hz]")
 		self.beaconwindow.setLabel('bottom', "Satellite Timecode [20-1 s]")
 		self.layout_widget.setWindowTitle('Beacon viewer')
@@ -248,25 +306,33 @@ class Main(QtWidgets.QMainWindow):
 		self.ui.setFixedSize(self.ui.size())
 		self.ui.version_label.setText('SARSAT Frame Processor Desktop {VER}'.format(VER=VERSION))
 
+		streams = readStreams(config)
 		self.ui.message_format_box.addItem('SARSAT SARP-2')
 		self.ui.message_format_box.addItem('SARSAT SARP-3')
-		self.ui.message_format_box.setCurrentIndex(1)
+		self.ui.message_format_box.setCurrentText(streams[0].message_format)
+		self.ui.message_format_box.setEnabled(len(streams) == 1) #with several streams the formats come from config.ini
 		self.ui.message_format_box.currentIndexChanged.connect(self.updateMessageFormat)
 
-		self.ui.actionSave_TM_to_csv.triggered.connect(self.test)
-
-		self.adapter = TMAdapter(self, "127.0.0.1", 38211, self.ui.message_format_box.currentText())
-		self.adapter.update_signal.connect(self.updateTableViews)
-		self.adapter.count_signal.connect(self.updateCounters)
-
-		self.adapter.symbol_signal.connect(self.updateSymbolStatus)
-		self.adapter.decoder_signal.connect(self.updateDecoderStatus)
-		self.adapter.sync_signal.connect(self.updateSyncStatus)
-		self.adapter.format_signal.connect(self.updateFormatStatus)
-
-		self.sarp_frame_table_model = SARPFrameTableModel(self.adapter.sarp_frames)
+		self.exporter = None
+		self.export_progress_signal.connect(self.updateExportProgress)
+		self.export_finished_signal.connect(self.exportFinished)
+		self.ui.actionSave_TM_to_csv.triggered.connect(self.exportMessages)
+
+		frame_store, message_store = createStores(config, path + '/log/sarp_{DATE}'.format(DATE=now.strftime("%Y%m%d_%H%M%SZ")))
+		self.adapter = TMAdapter(self, streams, frame_store, message_store,
+								config.getint('DECODER', 'WORKERS', fallback=0), config.getint('DECODER', 'SLOTS', fallback=256), readReceiveSettings(config),
+								createArchive(config, path + '/log/sarp_raw'))
+		self.status = None
+		self.adapter.status_signal.connect(self.updateStatus)
+		self.database = createDatabase(config, path)
+		if self.database:
+			self.adapter.engine.addConsumer(self.database)
+
+		table_max_rows = config.getint('GUI', 'TABLE_MAX_ROWS', fallback=0)
+		labels = [stream.label for stream in streams]
+		self.sarp_frame_table_model = SARPFrameTableModel(self.adapter.sarp_frames, table_max_rows, labels)
 		self.sarp_frame_table_model.dataChanged.connect(self.printMessage)
-		self.sarp_frame_table_model.setHeader(['RX UTC (Ground)', 'Length', 'Check'])
+		self.sarp_frame_table_model.setHeader(['RX UTC (Ground)', 'Length', 'Check', 'Source'])
 		self.ui.sarp_frame_table.setModel(self.sarp_frame_table_model)
 		self.ui.sarp_frame_table.setColumnWidth(0,175)
 		self.ui.sarp_frame_table.setColumnWidth(1,50)
@@ -278,8 +344,8 @@ class Main(QtWidgets.QMainWindow):
 		vheader.setDefaultSectionSize(15)
 		self.ui.sarp_frame_table.show()
 
-		self.sarp_message_table_model = SARPMessageTableModel(self.adapter.sarp_messages)
-		self.sarp_message_table_model.setHeader(['RX UTC (Ground)', 'Format', 'RT/PB', 'Timecode', 'DRU', 'Pseudo', 'Latest', 'Type', 'Burst freq', 'Level', 'S/No', 'Country', 'Protocol', 'Beacon hex'])
+		self.sarp_message_table_model = SARPMessageTableModel(self.adapter.sarp_messages, table_max_rows, labels)
+		self.sarp_message_table_model.setHeader(['RX UTC (Ground)', 'Format', 'RT/PB', 'Timecode', 'DRU', 'Pseudo', 'Latest', 'Type', 'Burst freq', 'Level', 'S/No', 'Country', 'Protocol', 'Beacon hex', 'Source'])
 
 		self.ui.sarp_message_table.setModel(self.sarp_message_table_model)
 		self.ui.sarp_message_table.setColumnWidth(0,175)
@@ -304,10 +370,13 @@ class Main(QtWidgets.QMainWindow):
 
 
 		self.ui.host_label.setText(self.adapter.host)
-		self.ui.frame_counter_label.setText('0')
-		self.ui.message_counter_label.setText('0')
 		eventLogger.info('GUI Thread started')
 
+		self.tableTimer = QtCore.QTimer()
+		self.tableTimer.timeout.connect(self.updateTableViews)
+		self.tableTimer.start(config.getint('GUI', 'TABLE_REFRESH_MS', fallback=250))
+		self.adapter.startStatusTimer(config.getint('GUI', 'STATUS_REFRESH_MS', fallback=100))
+
 		self.graphTimer = QtCore.QTimer()
 		self.graphTimer.timeout.connect(self.updateBeaconView)
 		self.graphTimer.start(1000)
@@ -316,21 +385,61 @@ class Main(QtWidgets.QMainWindow):
 
 	def querySample(self, points):
 		#print(points.ptsClicked[0].pos())
-		self.beaconquerywindow.setData(points.ptsClicked[0].data())
+		sarp_message = self.adapter.sarp_messages.get(points.ptsClicked[0].data())
+		if sarp_message is None: #no longer in the store
+			self.ui.statusbar.showMessage('The clicked message is no longer stored')
+			return
+		self.beaconquerywindow.setData(sarp_message)
 		self.beaconquerywindow.ui.show()
 
-	def test(self):
-		for key in USER_PROTOCOLS:
-			row_list = [["timecode", "frequency", "type"]]
-
-			for message in self.adapter.sarp_messages:
-
-				if message.beacon_message.data['protocol_num'] == key:
-					row_list.append([message.data['timecode'], message.data['abs_freq'], message.beacon_message.data['protocol_num']])
-
-			with open('log/beacon_messages_20161031_094324Z_1544478984Hz_{KEY}.csv'.format(KEY=key), 'w', newline='') as file:
-				writer = csv.writer(file)
-				writer.writerows(row_list)
+	def exportMessages(self):
+		'''
+		Export the message store grouped by protocol in a worker thread, progress is shown in the status bar.
+		'''
+		if self.exporter is not None and self.exporter.is_alive():
+			return
+		default = path + '/log/sarp_export_{DATE}'.format(DATE=datetime.datetime.utcnow().strftime("%Y%m%d_%H%M%SZ"))
+		filename, selected = QtWidgets.QFileDialog.getSaveFileName(self.ui, 'Export messages', default, ';;'.join(EXPORT_FILTERS))
+		if not filename:
+			return
+		self.exporter = SARPExporter(self.adapter.sarp_messages, os.path.splitext(filename)[0], EXPORT_FILTERS[selected],
+									progress=self.export_progress_signal.emit, finished=self.export_finished_signal.emit)
+		self.exporter.start()
+
+	def updateExportProgress(self, done, total):
+		self.ui.statusbar.showMessage('Exporting messages: {DONE}/{TOTAL}'.format(DONE=done, TOTAL=total))
+
+	def exportFinished(self, files, rows, error):
+		if error is not None:
+			self.ui.statusbar.showMessage('Export failed after {N} messages: {ERROR}'.format(N=rows, ERROR=error))
+			QtWidgets.QMessageBox.warning(self.ui, 'Export failed', 'Export of the messages failed after {N} messages:\n{ERROR}'.format(N=rows, ERROR=error))
+			return
+		self.ui.statusbar.showMessage('Exported {N} messages to {FILES}'.format(N=rows, FILES=', '.join(os.path.basename(file) for file in files)))
+
+	def updateStatus(self, status):
+		'''
+		Apply a StatusSnapshot of the adapter, only the labels whose value changed since the previous snapshot are touched.
+		'''
+		previous = self.status if self.status is not None else StatusSnapshot(*([None]*len(StatusSnapshot._fields)))
+		self.status = status
+		if status.symbol != previous.symbol:
+			self.updateSymbolStatus(status.symbol)
+		if status.decoder != previous.decoder:
+			self.updateDecoderStatus(status.decoder)
+		if status.sync != previous.sync:
+			self.updateSyncStatus(status.sync)
+		if status.format != previous.format:
+			self.updateFormatStatus(status.format)
+		if status.frames != previous.frames:
+			self.ui.frame_counter_label.setText('{FRAMES}'.format(FRAMES=status.frames))
+		if status.messages != previous.messages:
+			self.ui.message_counter_label.setText('{MESSAGES}'.format(MESSAGES=status.messages))
+		if status.received != previous.received:
+			self.ui.received_counter_label.setText('{RECEIVED}'.format(RECEIVED=status.received))
+		if status.dropped != previous.dropped:
+			self.ui.dropped_counter_label.setText('{DROPPED}'.format(DROPPED=status.dropped))
+		if status.late != previous.late:
+			self.ui.late_counter_label.setText('{LATE}'.format(LATE=status.late))
 
 	def updateSymbolStatus(self, bool):
 		if bool:
@@ -381,170 +490,195 @@ class Main(QtWidgets.QMainWindow):
 			self.ui.link_label.setText('NO TM')
 			self.ui.link_label.setStyleSheet('background-color: rgb(255, 0, 0)')
 
-	def updateCounters(self, len_frames, len_messages):
-		self.ui.frame_counter_label.setText('{FRAMES}'.format(FRAMES=len_frames))
-		self.ui.message_counter_label.setText('{MESSAGES}'.format(MESSAGES=len_messages))
-
 	def updateTableViews(self):
 
-		length = len(self.adapter.sarp_frames)
-
-		if not length == self.prev_len:
-			#=============== UPDATE TABLES FROM MODELS ================
-			self.sarp_frame_table_model = SARPFrameTableModel(self.adapter.sarp_frames)
-			self.sarp_frame_table_model.setHeader(['RX UTC (Ground)', 'Length', 'Check'])
-			self.ui.sarp_frame_table.setModel(self.sarp_frame_table_model)
-
-			self.sarp_message_table_model = SARPMessageTableModel(self.adapter.sarp_messages)
-			self.sarp_message_table_model.setHeader(['RX UTC (Ground)', 'Format', 'RT/PB', 'Timecode', 'DRU', 'Pseudo', 'Latest', 'Type', 'Burst freq', 'Level', 'S/No', 'Country', 'Protocol', 'Beacon hex'])
-			self.ui.sarp_message_table.setModel(self.sarp_message_table_model)
-			#======================= AUTO SCROLL ========================
+		#=============== APPEND NEW ROWS TO THE MODELS ================
+		if self.sarp_frame_table_model.flush() and self.ui.frames_auto_scroll_box.isChecked():
+			self.ui.sarp_frame_table.scrollToBottom()
 
-			if self.ui.frames_auto_scroll_box.isChecked():
-				self.ui.sarp_frame_table.scrollToBottom()
-
-			if self.ui.messages_auto_scroll_box.isChecked():
-				self.ui.sarp_message_table.scrollToBottom()
-
-			self.prev_len = len(self.adapter.sarp_frames)
+		if self.sarp_message_table_model.flush() and self.ui.messages_auto_scroll_box.isChecked():
+			self.ui.sarp_message_table.scrollToBottom()
 
 	def updateBeaconView(self):
 
-		datapoints_freq = []
-		datapoints_timecode = []
-
-		current_sarp_messages = [x for x in self.adapter.sarp_messages]
-
-		symbols = [		'o' 	if m.beacon_message.data['protocol_num'] == 0
-				else 	's' 	if m.beacon_message.data['protocol_num'] == 1
-				else 	't' 	if m.beacon_message.data['protocol_num'] == 2
-				else 	'd' 	if m.beacon_message.data['protocol_num'] == 3
-				else 	's' 	if m.beacon_message.data['protocol_num'] == 4
-				else 	't' 	if m.beacon_message.data['protocol_num'] == 5
-				else 	'd' 	if m.beacon_message.data['protocol_num'] == 6
-				else '+' for m in current_sarp_messages]
-
-		brushes = [		pg.mkBrush(255, 0, 0, 255)	if m.beacon_message.data['protocol_num'] == 0
-				else 	pg.mkBrush(0, 255, 0, 255) 	if m.beacon_message.data['protocol_num'] == 1
-				else 	pg.mkBrush(0, 0, 255, 255) 	if m.beacon_message.data['protocol_num'] == 2
-				else 	pg.mkBrush(0, 0, 255, 255) 	if m.beacon_message.data['protocol_num'] == 3
-				else 	pg.mkBrush(0, 255, 0, 255) 	if m.beacon_message.data['protocol_num'] == 4
-				else 	pg.mkBrush(255, 0, 0, 255) 	if m.beacon_message.data['protocol_num'] == 5
-				else 	pg.mkBrush(255, 0, 0, 255) 	if m.beacon_message.data['protocol_num'] == 6
-				else 	pg.mkBrush(255, 0, 0, 255)	for m in current_sarp_messages]
+		#only the messages stored since the previous tick are added, the clicked message is rebuilt from its sequence number in querySample
+		store = self.adapter.sarp_messages
+		count = store.count
+		first = store.first()
+		if first - self.trimmed_seq >= max(1, store.capacity // 10): #points of evicted messages are removed in batches
+			self.trimPoints(first)
+		if max(self.plotted_seq, first) < count:
+			rows = store.rowRange(max(self.plotted_seq, first), count)
+			seqs = np.arange(count - len(rows), count)
+			protocols = np.where(np.isin(rows['protocol_num'], list(PROTOCOL_STYLES)), rows['protocol_num'], -1)
+			for protocol, plot in self.beaconplots.items():
+				selection = (protocols == protocol) & rows['bch_valid'] #beacons failing BCH are kept in the tables but not plotted
+				if selection.any():
+					plot.addPoints(x=rows['timecode'][selection], y=rows['abs_freq'][selection], data=seqs[selection])
+			if self.density_range is not None:
+				self.addDensity(rows, seqs)
+		self.plotted_seq = count
+
+		if self.density_range is not None:
+			self.trimDensity(first)
+		self.updateDensityView()
+
+	def trimPoints(self, first):
+		for plot in self.beaconplots.values():
+			points = plot.data
+			if len(points) and points['data'][0] < first: #points are added in sequence order
+				keep = points[points['data'].astype(np.int64) >= first]
+				plot.setData(x=keep['x'], y=keep['y'], data=keep['data'])
+		self.trimmed_seq = first
+
+	def addDensity(self, rows, seqs):
+		'''
+		Add the BCH valid rows within the binned view range to the density histogram.
+		'''
+		(x_min, x_max), (y_min, y_max) = self.density_range
+		timecodes = rows['timecode']
+		freqs = rows['abs_freq']
+		in_view = (timecodes >= x_min) & (timecodes <= x_max) & (freqs >= y_min) & (freqs <= y_max) & rows['bch_valid']
+		x_bins = np.minimum(((timecodes[in_view] - x_min)*(DENSITY_BINS[0]/(x_max - x_min))).astype(np.int64), DENSITY_BINS[0] - 1)
+		y_bins = np.minimum(((freqs[in_view] - y_min)*(DENSITY_BINS[1]/(y_max - y_min))).astype(np.int64), DENSITY_BINS[1] - 1)
+		bins = x_bins*DENSITY_BINS[1] + y_bins
+		self.density_histogram += np.bincount(bins, minlength=self.density_histogram.size).reshape(DENSITY_BINS)
+		self.density_chunks.append((seqs[in_view], bins))
+		self.density_count += len(bins)
+
+	def trimDensity(self, first):
+		'''
+		Subtract the rows evicted from the store from the density histogram.
+		'''
+		while self.density_chunks:
+			seqs, bins = self.density_chunks[0]
+			stale = int(np.searchsorted(seqs, first))
+			if stale:
+				self.density_histogram -= np.bincount(bins[:stale], minlength=self.density_histogram.size).reshape(DENSITY_BINS)
+				self.density_count -= stale
+			if stale < len(seqs):
+				self.density_chunks[0] = (seqs[stale:], bins[stale:])
+				break
+			self.density_chunks.popleft()
+
+	def rebinDensity(self):
+		'''
+		Bin the stored rows for the current view range, called once the range stopped changing.
+		'''
+		(x_min, x_max), (y_min, y_max) = self.beaconwindow.getViewBox().viewRange()
+		self.density_range = ((x_min, x_max), (y_min, y_max)) if x_max > x_min and y_max > y_min else None
+		self.density_histogram[:] = 0
+		self.density_count = 0
+		self.density_chunks.clear()
+		if self.density_range is not None:
+			store = self.adapter.sarp_messages
+			count = self.plotted_seq #newer rows are added on the next tick
+			rows = store.rowRange(store.first(), count)
+			self.addDensity(rows, np.arange(count - len(rows), count))
+		self.updateDensityView()
+
+	def updateDensityView(self):
+		density_mode = self.density_range is not None and self.density_count > self.density_threshold
+		if density_mode:
+			(x_min, x_max), (y_min, y_max) = self.density_range
+			self.density_image.setImage(np.log1p(self.density_histogram), autoLevels=True)
+			self.density_image.setRect(QtCore.QRectF(x_min, y_min, x_max - x_min, y_max - y_min))
+
+		if density_mode != self.density_mode:
+			self.density_mode = density_mode
+			self.density_image.setVisible(density_mode)
+			for plot in self.beaconplots.values():
+				plot.setVisible(not density_mode)
+
+
+
+
+class TMAdapter(QtCore.QObject, EngineConsumer):
+
+	'''
+	GUI side consumer of the DecoderEngine. The engine callbacks only record the latest decoder state and counters,
+	a timer in the GUI thread publishes them as one StatusSnapshot when something changed, so a burst of frames
+	costs the event loop one signal per refresh instead of several per frame.
+	'''
+
+	status_signal = QtCore.Signal(object)
+
+	def __init__(self, parent, streams, frame_store=None, message_store=None, workers=0, slots=256, receive=DEFAULT_RECEIVE, archive=None):
+		QtCore.QObject.__init__(self, parent)
+		self.parent = parent
+		self.engine = DecoderEngine(streams, frame_store, message_store, workers, slots, receive, archive)
+		self.engine.addConsumer(self)
+		self.host = ', '.join(stream.endpoint for stream in streams)
 
-		self.beaconplot.setData(	x=[x.data['timecode'] for x in current_sarp_messages],
-									y=[x.data['abs_freq'] for x in current_sarp_messages],
-									data=[x for x in current_sarp_messages],
-									symbol=symbols,
-									brush=brushes)
+		self.symbol = self.decoder = self.sync = self.format = False
+		self.frames = self.messages = 0
+		self.received = self.dropped = self.late = 0
+		self.published = None
+		self.statusTimer = QtCore.QTimer(self)
+		self.statusTimer.timeout.connect(self.publishStatus)
 
+	@property
+	def sarp_frames(self):
+		return self.engine.sarp_frames
 
+	@property
+	def sarp_messages(self):
+		return self.engine.sarp_messages
 
+	def setMessageFormat(self, message_format):
+		self.engine.setMessageFormat(message_format)
 
-class TMAdapter(QtCore.QThread):
+	def start(self):
+		self.engine.start()
 
+	def stop(self):
+		self.engine.stop()
+		self.engine.join(2.0) #the engine closes the stores and the raw archive on its way out
 
-	count_signal = QtCore.Signal(int, int)
-	update_signal = QtCore.Signal(bool)
-	plot_message_signal = QtCore.Signal(object)
+	def startStatusTimer(self, interval_ms):
+		self.publishStatus()
+		self.statusTimer.start(interval_ms)
 
-	symbol_signal = QtCore.Signal(bool)
-	decoder_signal = QtCore.Signal(bool)
-	sync_signal = QtCore.Signal(bool)
-	format_signal = QtCore.Signal(bool)
+	def publishStatus(self):
+		status = StatusSnapshot(self.symbol, self.decoder, self.sync, self.format, self.frames, self.messages,
+								self.received, self.dropped, self.late)
+		if status != self.published:
+			self.published = status
+			self.status_signal.emit(status)
 
-	sarp_frames = []
-	sarp_messages = []
-	message_format = None
+	def updateSymbolStatus(self, ok):
+		self.symbol = ok
 
-	active = False
-	host = None
+	def updateDecoderStatus(self, ok):
+		self.decoder = ok
 
-	def __init__(self, parent, ip, port, message_format):
-		QtCore.QThread.__init__(self, parent)
-		self.parent = parent
-		self.active = True
-		self.message_format = message_format
+	def updateSyncStatus(self, ok):
+		self.sync = ok
 
-		self.context = zmq.Context()
-		self.socket = self.context.socket(zmq.SUB)
-		self.host = 'tcp://' + ip + ':' + str(port)
-		self.socket.connect(self.host)
-		self.socket.setsockopt_string(zmq.SUBSCRIBE, "")
-		self.socket.setsockopt(zmq.RCVTIMEO, 1000)
+	def updateFormatStatus(self, ok):
+		self.format = ok
 
-		eventLogger.info('Started listening on {HOST} for incoming data from GNU Radio flowgraph'.format(HOST=self.host))
+	def updateCounters(self, len_frames, len_messages):
+		self.frames = len_frames
+		self.messages = len_messages
 
-	def setMessageFormat(self, message_format):
-		self.message_format = message_format
-
-	def run(self):
-		while self.active:
-			try:
-				data = self.socket.recv() #receive 1200 symbols
-				self.symbol_signal.emit(True)
-				b = bitarray(endian='big')
-				b.extend([True if x == 1 else False for x in data])
-				try:
-					bytes = decodeManchester(b, inverted=False) #if we have a bad decode, this will raise an exception and the frame will not be considered
-					self.decoder_signal.emit(True)
-					sarp_frame = SARPFrame(bytes, self.message_format)
-					self.sarp_frames.append(sarp_frame)
-					if sarp_frame.valid: #if the frame structure looks ok, proceed and get the messages
-						self.sync_signal.emit(True)
-						if sarp_frame.message1.data['format_valid'] and sarp_frame.message2.data['format_valid'] and sarp_frame.message3.data['format_valid']:
-							self.sarp_messages.append(sarp_frame.message1)
-							self.sarp_messages.append(sarp_frame.message2)
-							self.sarp_messages.append(sarp_frame.message3)
-							self.plot_message_signal.emit([sarp_frame.message1, sarp_frame.message2, sarp_frame.message3])
-							self.format_signal.emit(True)
-						else:
-							self.format_signal.emit(False)
-					else:
-						self.sync_signal.emit(False)
-						self.format_signal.emit(False)
-
-
-					self.update_signal.emit(True)
-					eventLogger.info('GOOD FRAME DECODE: {LEN} bytes, Frame valid: {CHECK}'.format(LEN=len(bytes), CHECK=sarp_frame.valid))
-				except Exception as e:
-					self.decoder_signal.emit(False)
-					self.sync_signal.emit(False)
-					self.format_signal.emit(False)
-					eventLogger.error('BAD FRAME DECODE: {ERR}'.format(ERR=e))
-
-				self.count_signal.emit(len(self.sarp_frames), len(self.sarp_messages))
-			except Exception as e:
-				self.symbol_signal.emit(False)
-				self.decoder_signal.emit(False)
-				self.sync_signal.emit(False)
-				self.format_signal.emit(False)
-				self.update_signal.emit(True)
-
-
-def setup_logger(name, log_file, level=logging.INFO):
-	formatter = logging.Formatter('%(asctime)s %(levelname)s %(message)s')
-	logging.Formatter.converter = time.gmtime
-	fileHandler = logging.FileHandler(log_file)
-	streamHandler = logging.StreamHandler()
-
-	fileHandler.setFormatter(formatter)
-	streamHandler.setFormatter(formatter)
-
-	logger = logging.getLogger(name)
-	logger.setLevel(level)
-	logger.addHandler(fileHandler)
-	logger.addHandler(streamHandler)
-	return logger
+	def updateReceiveCounters(self, received, dropped, late):
+		self.received = received
+		self.dropped = dropped
+		self.late = late
 
 
 if __name__ == '__main__':
 
 	path = os.path.dirname(os.path.abspath(__file__))
 	now = datetime.datetime.utcnow()
+	config = configparser.ConfigParser()
+	config.read(path + '/config/config.ini')
 	subprocess.run(["mkdir", "-p", "log"])  # doesn't capture output
-	eventLogger = setup_logger('event_logger', path + '/log/sarp_processor_{DATE}.log'.format(DATE=now.strftime("%Y%m%d_%H%M%SZ")), level=logging.INFO)
+	eventLogger = setup_logger('event_logger', path + '/log/sarp_processor_{DATE}.log'.format(DATE=now.strftime("%Y%m%d_%H%M%SZ")), level=logging.INFO,
+							limits=readEventLimits(config), interval=config.getfloat('LOG', 'SUMMARY_INTERVAL', fallback=1.0))
+
+	BEACON_CACHE.resize(config.getint('STORE', 'BEACON_CACHE_SIZE', fallback=4096))
 
 	QtCore.QCoreApplication.setAttribute(QtCore.Qt.AA_ShareOpenGLContexts)
 	a = QtWidgets.QApplication(sys.argv)
@@ -552,4 +686,9 @@ if __name__ == '__main__':
 	app = Main()
 	app.show()
 	a.exec_()
+	app.adapter.stop()
+	if app.database:
+		app.database.close()
+	eventLogger.info('Beacon cache: {HITS} hits, {MISSES} misses'.format(HITS=BEACON_CACHE.hits, MISSES=BEACON_CACHE.misses))
+	shutdown_logger('event_logger') #os._exit skips the atexit handlers, flush the log queue first
 	os._exit(0)
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+__author__ = "Tom Mladenov, tom.mladenov@ieee.org"
+
+import os
+import csv
+import json
+import argparse
+import datetime
+import multiprocessing
+from collections import Counter
+import numpy as np
+from manchester import decodeManchesterFrames, FRAME_SYMBOLS
+from SARPFrame import decodeFrames
+from SARPMessage import MESSAGE_FORMATS, MESSAGE_LAYOUTS, FORMAT_NAMES, SNO_LEVELS
+from BeaconMessage import LAYOUTS, LAYOUT_PROTOCOL_NUMS, SHORT_BEACON_LENGTH, decodeBeacons
+from countries import COUNTRIES
+from bch import checkBeacons
+from rawlog import RawArchive, isArchive, formatName
+
+VERSION = 'v1.3'
+
+RESULT_HEADER = ['frame', 'message', 'format', 'rt/pb', 'timecode', 'timecode_parity_valid', 'doppler_word', 'abs_freq', 'doppler_parity_valid',
+				'level_dbm', 's/no_db', 'beacon_hex', 'country_code', 'country_name_alpha2', 'protocol_num', 'protocol_name_shortened',
+				'bch1_errors', 'bch2_errors', 'bch_valid', 'latitude', 'longitude']
+
+#Every worker process maps the recording or raw archive itself, only the chunk boundaries travel through the pool
+recording = None
+archive = None
+worker_settings = None
+
+
+def initWorker(filename, message_format, inverted):
+	global recording, archive, worker_settings
+	if isArchive(filename):
+		archive = RawArchive(filename)
+	else:
+		recording = np.memmap(filename, dtype=np.uint8, mode='r')
+	worker_settings = (message_format, inverted)
+
+
+def decodeChunk(chunk):
+	'''
+	Decode the frames start up to stop. Archive records are decoded with the message format they were received with,
+	message_format is used for recordings and for archive records without one.
+	'''
+	start, stop = chunk
+	message_format, inverted = worker_settings
+	if archive is None:
+		return decodeSymbols(recording[start*FRAME_SYMBOLS:stop*FRAME_SYMBOLS].reshape(-1, FRAME_SYMBOLS), start, message_format, inverted)
+
+	symbols, times, sources, formats = archive.symbolFrames(start, stop)
+	rows = []
+	stats = Counter()
+	protocols = Counter()
+	runs = np.flatnonzero(np.diff(formats)) + 1 #records of one pass are normally all of one format
+	for first, last in zip(np.concatenate(([0], runs)).tolist(), np.concatenate((runs, [len(formats)])).tolist()):
+		run_rows, run_stats, run_protocols = decodeSymbols(symbols[first:last], start + first, formatName(int(formats[first])) or message_format, inverted)
+		rows.extend(run_rows)
+		stats.update(run_stats)
+		protocols.update(run_protocols)
+	return rows, stats, protocols
+
+
+def decodeSymbols(symbols, start, message_format, inverted):
+	'''
+	Rows, stats and protocol counts of the (n, FRAME_SYMBOLS) symbols of the frames numbered from start.
+	'''
+	frames, valid = decodeManchesterFrames(symbols, inverted)
+
+	stats = Counter()
+	stats['frames'] = len(symbols)
+	stats['bad_decodes'] = int(np.count_nonzero(~valid))
+	protocols = Counter()
+	rows = []
+
+	#Frame, message and beacon fields are decoded for the whole chunk at once
+	frame_columns, columns = decodeFrames(frames[valid], message_format)
+	stats['good_frames'] = int(np.count_nonzero(frame_columns['valid']))
+	stats['bad_frames'] = len(frame_columns['valid']) - stats['good_frames']
+
+	format_ok = columns['format_valid'].reshape(-1, 3).all(axis=1)
+	stats['format_errors'] = int(np.count_nonzero(frame_columns['valid'] & ~format_ok))
+	selected = np.flatnonzero(np.repeat(frame_columns['valid'] & format_ok, 3))
+
+	frame_index = (start + np.flatnonzero(valid)[columns['frame'][selected]]).tolist()
+	number = (columns['message'][selected] + 1).tolist()
+	format = [FORMAT_NAMES[code] for code in columns['format'][selected]]
+	timecode = columns['timecode'][selected].tolist()
+	timecode_parity_valid = columns['timecode_parity_valid'][selected].tolist()
+	abs_freq = columns['abs_freq'][selected].tolist()
+	doppler_word = columns['doppler_word'][selected].tolist()
+	doppler_parity_valid = columns['doppler_parity_valid'][selected].tolist()
+	if 'level' in columns:
+		rt_pb = ['REALTIME' if realtime else 'PLAYBACK' for realtime in columns['rt/pb'][selected]]
+		level_dbm = columns['level_dbm'][selected].tolist()
+	else:
+		rt_pb = level_dbm = ['N/A']*len(selected)
+	if 's/no' in columns:
+		s_no_db = [SNO_LEVELS.get(s_no) for s_no in columns['s/no'][selected].tolist()]
+	else:
+		s_no_db = ['N/A']*len(selected)
+	if not MESSAGE_LAYOUTS[message_format].timecode:
+		timecode = timecode_parity_valid = ['N/A']*len(selected)
+
+	beacon_lengths = columns['beacon_length'][selected]
+	bch1_errors, bch2_errors, beacons = checkBeacons(columns['beacon'][selected], beacon_lengths)
+	bch_valid = (bch1_errors >= 0) & (bch2_errors >= 0)
+	stats['bad_beacons'] = int(np.count_nonzero(~bch_valid))
+	long = (beacon_lengths > SHORT_BEACON_LENGTH).tolist()
+	bch1_errors, bch2_errors, bch_valid = bch1_errors.tolist(), bch2_errors.tolist(), bch_valid.tolist()
+
+	fields = decodeBeacons(beacons, beacon_lengths) #from the corrected bits
+	beacon_hex = [beacon.tobytes().hex()[:length//4] for beacon, length in zip(beacons, beacon_lengths.tolist())]
+	country_code = fields['country_code'].tolist()
+	country = [COUNTRIES.get(code, ('N/A',))[0] for code in country_code]
+	protocol_num = [num if num >= 0 else 'N/A' for num in LAYOUT_PROTOCOL_NUMS[fields['layout']].tolist()]
+	protocol = [LAYOUTS[layout].shortened for layout in fields['layout'].tolist()]
+	latitude = fields['latitude'].tolist()
+	longitude = fields['longitude'].tolist()
+
+	for i in range(len(selected)):
+		has_doppler = abs_freq[i] == abs_freq[i] #NaN when the format has no doppler word
+		rows.append([frame_index[i], number[i], format[i], rt_pb[i], timecode[i], timecode_parity_valid[i],
+					doppler_word[i] if has_doppler else 'N/A', abs_freq[i] if has_doppler else 'N/A', doppler_parity_valid[i] if has_doppler else 'N/A',
+					level_dbm[i], s_no_db[i], beacon_hex[i], country_code[i], country[i], protocol_num[i], protocol[i],
+					bch1_errors[i], bch2_errors[i] if long[i] else 'N/A', bch_valid[i],
+					latitude[i] if latitude[i] == latitude[i] else 'N/A', longitude[i] if longitude[i] == longitude[i] else 'N/A'])
+	protocols.update(protocol)
+	stats['messages'] = len(selected)
+
+	return rows, stats, protocols
+
+
+if __name__ == '__main__':
+
+	parser = argparse.ArgumentParser(description='Offline replay of recorded SARP symbol files (1 byte per symbol) or raw archives')
+	parser.add_argument("-f", "--filename", required=True, help="path to recording or raw archive")
+	parser.add_argument("-o", "--output", help="CSV file for the decoded messages, defaults to <recording>.csv")
+	parser.add_argument("-s", "--summary", help="optional JSON file for the decode summary")
+	parser.add_argument("--format", default='SARSAT SARP-3', choices=MESSAGE_FORMATS, help="SARP message format, for raw archives only of records without one")
+	parser.add_argument("--inverted", action='store_true', help="invert the Manchester decoded bits")
+	parser.add_argument("--workers", type=int, default=os.cpu_count(), help="number of decode processes")
+	parser.add_argument("--chunk", type=int, default=1024, help="frames per work unit")
+	parser.add_argument("--start", type=datetime.datetime.fromisoformat, help="raw archive only, first UTC receive time to replay (ISO 8601)")
+	parser.add_argument("--stop", type=datetime.datetime.fromisoformat, help="raw archive only, replay up to this UTC receive time (ISO 8601)")
+	args = parser.parse_args()
+
+	output = args.output if args.output else args.filename + '.csv'
+	if isArchive(args.filename): #frame numbers are the record numbers of the archive
+		raw_archive = RawArchive(args.filename)
+		first = raw_archive.find(args.start) if args.start else 0
+		n_frames = raw_archive.find(args.stop) if args.stop else len(raw_archive)
+	else:
+		first = 0
+		n_frames = os.path.getsize(args.filename) // FRAME_SYMBOLS
+	chunks = [(start, min(start + args.chunk, n_frames)) for start in range(first, n_frames, args.chunk)]
+
+	totals = Counter()
+	protocols = Counter()
+
+	with open(output, 'w', newline='') as file:
+		writer = csv.writer(file)
+		writer.writerow(RESULT_HEADER)
+
+		with multiprocessing.Pool(args.workers, initializer=initWorker, initargs=(args.filename, args.format, args.inverted)) as pool:
+			for rows, stats, chunk_protocols in pool.imap(decodeChunk, chunks): #imap keeps the chunks in recording order
+				writer.writerows(rows)
+				totals.update(stats)
+				protocols.update(chunk_protocols)
+
+	summary = {
+		'recording': args.filename,
+		'message_format': args.format,
+		'frames': totals['frames'],
+		'bad_decodes': totals['bad_decodes'],
+		'good_frames': totals['good_frames'],
+		'bad_frames': totals['bad_frames'],
+		'format_errors': totals['format_errors'],
+		'messages': totals['messages'],
+		'bad_beacons': totals['bad_beacons'],
+		'messages_per_protocol': dict(protocols)
+		}
+
+	print('Processed {N} frames:'.format(N=summary['frames']))
+	print('{N} BAD decodes'.format(N=summary['bad_decodes']))
+	print('{N} GOOD frames'.format(N=summary['good_frames']))
+	print('{N} BAD frames'.format(N=summary['bad_frames']))
+	print('{N} FORMAT errors'.format(N=summary['format_errors']))
+	print('{N} messages written to {OUT}'.format(N=summary['messages'], OUT=output))
+	print('{N} messages failed BCH-1/BCH-2'.format(N=summary['bad_beacons']))
+	for protocol, count in sorted(protocols.items(), key=lambda item: -item[1]):
+		print('  {PROT}: {N}'.format(PROT=protocol, N=count))
+
+	if args.summary:
+		with open(args.summary, 'w') as file:
+			json.dump(summary, file, indent=4)
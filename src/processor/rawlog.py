@@ -0,0 +1,210 @@
+import os
+import struct
+import datetime
+import logging
+import numpy as np
+from collections import namedtuple
+from threading import Lock
+from manchester import FRAME_SYMBOLS
+from SARPMessage import MESSAGE_FORMATS
+
+logger = logging.getLogger('event_logger')
+
+#Raw archive of received symbol payloads, one record per payload in arrival order:
+#	header: time (i8, microseconds since the epoch, UTC), source (u1), flags (u1), number of symbols (u2)
+#	        flags bit 0 is FLAG_FRAME, bits 1-3 the message format of the stream (see formatCode), 0 in older archives
+#	symbols: one bit per symbol, packed in ceil(n/8) bytes
+#	frame: the 75 decoded bytes when FLAG_FRAME is set
+#The .idx sidecar holds the time and file offset of every record, sorted by time, so a time is found by bisection.
+
+MAGIC = b'SARPRAW1'
+EXTENSION = '.raw'
+INDEX_EXTENSION = '.idx'
+FRAME_BYTES = 75
+
+FLAG_FRAME = 0x01
+FORMAT_SHIFT = 1
+FORMAT_MASK = 0x07
+
+RECORD_HEADER = struct.Struct('<qBBH')
+INDEX_DTYPE = np.dtype([('time', '<i8'), ('offset', '<u8')])
+
+EPOCH = datetime.datetime(1970, 1, 1)
+
+RawRecord = namedtuple('RawRecord', ['time', 'source', 'symbols', 'frame', 'message_format'])
+
+
+def toMicroseconds(time):
+	return (time - EPOCH) // datetime.timedelta(microseconds=1)
+
+
+def fromMicroseconds(us):
+	return EPOCH + datetime.timedelta(microseconds=int(us))
+
+
+def formatCode(message_format):
+	'''
+	Code of a message format in the record flags, 1 + its index in MESSAGE_FORMATS, 0 for an unknown format.
+	'''
+	return MESSAGE_FORMATS.index(message_format) + 1 if message_format in MESSAGE_FORMATS else 0
+
+
+def formatName(code):
+	'''
+	Message format of a formatCode(), None when the record has none.
+	'''
+	return MESSAGE_FORMATS[code - 1] if 0 < code <= len(MESSAGE_FORMATS) else None
+
+
+def isArchive(filename):
+	with open(filename, 'rb') as file:
+		return file.read(len(MAGIC)) == MAGIC
+
+
+class RawArchiveWriter(object):
+
+	'''
+	Append only writer of raw archives named <prefix>_<start time>.raw with their .idx sidecar.
+	Both files are written through large buffers, a new pair is started for every pass: when no payload
+	arrived for pass_gap seconds. write() may be called from the engine thread and the pipeline sequencer.
+	'''
+
+	def __init__(self, prefix, pass_gap=300, buffer_size=1 << 20):
+		self.prefix = prefix
+		self.pass_gap = datetime.timedelta(seconds=pass_gap)
+		self.buffer_size = buffer_size
+		self.lock = Lock()
+		self.file = None
+		self.index = None
+		self.filename = None
+		self.last_time = None
+		self.offset = 0
+		self.records = 0
+
+	def open(self, time):
+		self.filename = '{PREFIX}_{DATE}{EXT}'.format(PREFIX=self.prefix, DATE=time.strftime('%Y%m%d_%H%M%SZ'), EXT=EXTENSION)
+		self.file = open(self.filename, 'wb', buffering=self.buffer_size)
+		self.index = open(self.filename + INDEX_EXTENSION, 'wb', buffering=self.buffer_size // 8)
+		self.file.write(MAGIC)
+		self.offset = len(MAGIC)
+		logger.info('Raw archive {FILE} started'.format(FILE=self.filename))
+
+	def rotate(self):
+		if self.file is not None:
+			self.file.close()
+			self.index.close()
+			self.file = self.index = None
+			logger.info('Raw archive {FILE} closed'.format(FILE=self.filename))
+
+	def write(self, time, source, symbols, frame=None, message_format=None):
+		'''
+		Append one received payload (uint8 symbols, 0 or 1) with its decoded frame bytes, if any, and the message format of its stream.
+		'''
+		n_symbols = len(symbols)
+		flags = (FLAG_FRAME if frame is not None else 0) | formatCode(message_format) << FORMAT_SHIFT
+		record = b''.join((RECORD_HEADER.pack(toMicroseconds(time), source, flags, n_symbols),
+						np.packbits(np.asarray(symbols, dtype=np.uint8) != 0).tobytes(), frame if frame is not None else b''))
+		with self.lock:
+			if self.last_time is not None and time - self.last_time > self.pass_gap:
+				self.rotate()
+			if self.file is None:
+				self.open(time)
+			self.last_time = time
+			self.file.write(record)
+			self.index.write(struct.pack('<qQ', toMicroseconds(time), self.offset))
+			self.offset += len(record)
+			self.records += 1
+
+	def close(self):
+		with self.lock:
+			self.rotate()
+
+
+class RawArchive(object):
+
+	'''
+	Reader of one raw archive, records are addressed by their number in the file.
+	The sidecar index is memory mapped, without it (or when it is shorter than the archive) it is rebuilt by a scan.
+	'''
+
+	def __init__(self, filename):
+		self.filename = filename
+		self.data = np.memmap(filename, dtype=np.uint8, mode='r')
+		if self.data[:len(MAGIC)].tobytes() != MAGIC:
+			raise ValueError("{FILE} is not a raw archive".format(FILE=filename))
+
+		index = None
+		if os.path.exists(filename + INDEX_EXTENSION) and os.path.getsize(filename + INDEX_EXTENSION) >= INDEX_DTYPE.itemsize:
+			index = np.memmap(filename + INDEX_EXTENSION, dtype=INDEX_DTYPE, mode='r')
+			index = index[index['offset'] + RECORD_HEADER.size <= len(self.data)] #records still in the write buffer when the process stopped
+		if index is None or len(index) == 0 or self.recordEnd(index[-1]['offset']) != len(self.data):
+			index = self.scan()
+		self.index = index
+		self.times = self.index['time']
+
+	def recordEnd(self, offset):
+		time, source, flags, n_symbols = RECORD_HEADER.unpack_from(self.data, int(offset))
+		return int(offset) + RECORD_HEADER.size + (n_symbols + 7)//8 + (FRAME_BYTES if flags & FLAG_FRAME else 0)
+
+	def scan(self):
+		entries = []
+		offset = len(MAGIC)
+		while offset + RECORD_HEADER.size <= len(self.data):
+			end = self.recordEnd(offset)
+			if end > len(self.data):
+				break
+			entries.append((RECORD_HEADER.unpack_from(self.data, offset)[0], offset))
+			offset = end
+		return np.array(entries, dtype=INDEX_DTYPE)
+
+	def __len__(self):
+		return len(self.index)
+
+	def find(self, time):
+		'''
+		Number of the first record received at or after time.
+		'''
+		return int(np.searchsorted(self.times, toMicroseconds(time), side='left'))
+
+	def record(self, number):
+		offset = int(self.index[number]['offset'])
+		time, source, flags, n_symbols = RECORD_HEADER.unpack_from(self.data, offset)
+		start = offset + RECORD_HEADER.size
+		stop = start + (n_symbols + 7)//8
+		symbols = np.unpackbits(self.data[start:stop])[:n_symbols]
+		frame = self.data[stop:stop + FRAME_BYTES].tobytes() if flags & FLAG_FRAME else None
+		return RawRecord(fromMicroseconds(time), source, symbols, frame, formatName(flags >> FORMAT_SHIFT & FORMAT_MASK))
+
+	def __iter__(self):
+		for number in range(len(self)):
+			yield self.record(number)
+
+	def symbolFrames(self, start, stop):
+		'''
+		(stop - start, FRAME_SYMBOLS) uint8 symbols of the records start up to stop, payloads of another length are left 0
+		so they fail the Manchester decode. Also returns the receive times (datetime64[us]), sources and message format codes (see formatName).
+		'''
+		symbols = np.zeros((max(0, stop - start), FRAME_SYMBOLS), dtype=np.uint8)
+		sources = np.zeros(len(symbols), dtype=np.uint8)
+		formats = np.zeros(len(symbols), dtype=np.uint8)
+		for row, number in enumerate(range(start, stop)):
+			offset = int(self.index[number]['offset'])
+			time, source, flags, n_symbols = RECORD_HEADER.unpack_from(self.data, offset)
+			sources[row] = source
+			formats[row] = flags >> FORMAT_SHIFT & FORMAT_MASK
+			if n_symbols == FRAME_SYMBOLS:
+				first = offset + RECORD_HEADER.size
+				symbols[row] = np.unpackbits(self.data[first:first + FRAME_SYMBOLS//8])
+		return symbols, self.times[start:stop].astype('datetime64[us]'), sources, formats
+
+
+def createArchive(config, prefix):
+	'''
+	Raw archive writer from the [FILE] section of config.ini, None when RAWLOG_ENABLED is off.
+	'''
+	if not config.getboolean('FILE', 'RAWLOG_ENABLED', fallback=False):
+		return None
+	raw_format = config.get('FILE', 'RAWLOG_FORMAT', fallback='binary')
+	if raw_format != 'binary':
+		raise ValueError("Unsupported raw log format {FMT}".format(FMT=raw_format))
+	return RawArchiveWriter(prefix, config.getint('FILE', 'RAWLOG_PASS_GAP', fallback=300), config.getint('FILE', 'RAWLOG_BUFFER', fallback=1 << 20))
@@ -0,0 +1,160 @@
+import numpy as np
+from bch import BCH1, BCH2, BCH1_LEN, BCH2_LEN
+from SARPMessage import FIELDS, MESSAGE_LAYOUTS, MESSAGE_BITS, PARITY12, SHORT_LAST_WORD
+from SARPFrame import SYNCWORD, MARKER, MESSAGE_STARTS
+from BeaconMessage import SHORT_BEACON_LENGTH
+from manchester import FRAME_SYMBOLS
+
+#Synthetic SARP data for benchmarks and checks without a flowgraph: beacons of every protocol with valid BCH codes,
+#SARP-2/SARP-3 messages, frames with markers and syncword, and their Manchester symbols as published by the flowgraph.
+#Errors are injected as flipped beacon bits (corrected or detected by the BCH check) or invalid symbol pairs (bad decodes).
+
+LONG_BEACON_LENGTH = 120
+PDF1_BITS = 61
+PDF2_BITS = 26
+SHORT_PDF2_BITS = SHORT_BEACON_LENGTH - BCH1_LEN
+
+#(user/location, protocol code), location protocols 0 and 1 are spare
+PROTOCOLS = [('USER', code) for code in range(8)] + [('LOCATION', code) for code in range(2, 16)]
+SYNTHETIC_FORMATS = ['SARSAT SARP-2', 'SARSAT SARP-3']
+
+COUNTRY_CODE = 366 #USA
+
+
+def randomBits(rng, n):
+	return int.from_bytes(rng.bytes((n + 7)//8), 'big') >> (-n % 8)
+
+
+def encodeBeacon(rng, protocol=('USER', 3), long=False, country_code=COUNTRY_CODE):
+	'''
+	Beacon of the given protocol with random identification and position bits and valid BCH-1/BCH-2 codes,
+	returns (beacon as integer including the format flag, beacon length). Location protocols are always long.
+	'''
+	kind, code = protocol
+	long = long or kind == 'LOCATION'
+	pdf1 = randomBits(rng, PDF1_BITS)
+	pdf1 &= (1 << (PDF1_BITS - 16)) - 1 #format flag, protocol flag, country code and protocol code are set below
+	pdf1 |= int(long) << (PDF1_BITS - 1)
+	pdf1 |= country_code << (PDF1_BITS - 12)
+	if kind == 'USER':
+		pdf1 |= 1 << (PDF1_BITS - 2)
+		pdf1 |= code << (PDF1_BITS - 15)
+		pdf1 |= randomBits(rng, 1) << (PDF1_BITS - 16)
+	else:
+		pdf1 |= code << (PDF1_BITS - 16)
+
+	if long:
+		return (BCH1.encode(pdf1) << BCH2_LEN) | BCH2.encode(randomBits(rng, PDF2_BITS)), LONG_BEACON_LENGTH
+	return (BCH1.encode(pdf1) << SHORT_PDF2_BITS) | randomBits(rng, SHORT_PDF2_BITS), SHORT_BEACON_LENGTH
+
+
+def injectBeaconErrors(rng, beacon, beacon_length, n_errors):
+	'''
+	Flip n_errors distinct bits of the BCH protected part of a beacon, the format flag is left alone.
+	'''
+	protected = BCH1_LEN if beacon_length == SHORT_BEACON_LENGTH else beacon_length
+	for position in rng.choice(np.arange(1, protected), size=n_errors, replace=False).tolist():
+		beacon ^= 1 << (beacon_length - 1 - position)
+	return beacon
+
+
+def parityWord(value):
+	'''
+	23 bit value followed by its even parity bit.
+	'''
+	word = (value & 0x7FFFFF) << 1
+	return word | (PARITY12[word >> 12] ^ PARITY12[word & 0xFFF])
+
+
+def encodeMessage(beacon, beacon_length, message_format='SARSAT SARP-3', timecode=0, doppler_word=0, level=32, realtime=True, s_no=3):
+	'''
+	24 bytes of a SARP message carrying the beacon, timecode and doppler word (23 bit two's complement).
+	'''
+	layout = MESSAGE_LAYOUTS[message_format]
+	long = beacon_length > SHORT_BEACON_LENGTH
+	value = 0
+
+	def put(field, field_value):
+		start, length = FIELDS[field]
+		return (field_value & ((1 << length) - 1)) << (MESSAGE_BITS - start - length)
+
+	value |= MARKER[0] << (MESSAGE_BITS - 8)
+	if 'level' in layout.word0:
+		value |= put('level', level) | put('rt/pb', int(realtime)) | put('latest', 1)
+	if 's/no' in layout.word0:
+		value |= put('s/no', s_no) | put('type', 1)
+	value |= int(long) << (MESSAGE_BITS - 1 - layout.format_flag)
+
+	data_bits = beacon_length - 1 #the format flag has its own position in the message
+	value |= (beacon & ((1 << data_bits) - 1)) << (MESSAGE_BITS - layout.beacon_start - data_bits)
+	if layout.timecode:
+		value |= parityWord(timecode) << (MESSAGE_BITS - 48)
+	if long:
+		value |= put('long_doppler', parityWord(doppler_word))
+	else:
+		value |= put('short_doppler', parityWord(doppler_word)) | put('last_word', SHORT_LAST_WORD)
+	return value.to_bytes(MESSAGE_BITS//8, 'big')
+
+
+def encodeFrame(messages):
+	'''
+	75 byte SARP frame of three messages followed by the syncword of the next frame.
+	'''
+	frame = bytearray(75)
+	for start, message in zip(MESSAGE_STARTS, messages):
+		frame[start:start + len(message)] = message
+	frame[72:75] = SYNCWORD
+	return bytes(frame)
+
+
+def encodeSymbols(frame, inverted=False):
+	'''
+	Manchester symbols (uint8 0/1) of a frame, a 1 bit is sent as 1 0.
+	'''
+	bits = np.unpackbits(np.frombuffer(frame, dtype=np.uint8))
+	if inverted:
+		bits = 1 - bits
+	return np.stack((bits, 1 - bits), axis=1).reshape(-1).astype(np.uint8)
+
+
+def injectSymbolErrors(rng, symbols, n_errors):
+	'''
+	Copy of the symbols with n_errors symbol pairs made invalid (both symbols equal), the frame fails the Manchester decode.
+	'''
+	symbols = symbols.copy()
+	for pair in rng.choice(len(symbols)//2, size=n_errors, replace=False).tolist():
+		symbols[2*pair + 1] = symbols[2*pair]
+	return symbols
+
+
+def generateFrames(n_frames, message_format='SARSAT SARP-3', seed=0, long_fraction=0.5, protocols=PROTOCOLS,
+					beacon_errors=0, symbol_error_rate=0.0, distinct_beacons=1024):
+	'''
+	n_frames synthetic frames, returns ((n_frames, FRAME_SYMBOLS) uint8 symbols, (n_frames, 75) uint8 frames).
+	Beacons are drawn from a pool of distinct_beacons with the given protocols, like a pass with a limited number of beacons;
+	every message gets beacon_errors flipped beacon bits and a fraction symbol_error_rate of the frames gets one invalid symbol pair.
+	Timecodes increase by 100 ms per message, the doppler words follow a slow sweep.
+	'''
+	rng = np.random.default_rng(seed)
+	pool = []
+	for index in range(distinct_beacons):
+		protocol = protocols[index % len(protocols)]
+		pool.append(encodeBeacon(rng, protocol, rng.random() < long_fraction))
+
+	symbols = np.zeros((n_frames, FRAME_SYMBOLS), dtype=np.uint8)
+	frames = np.zeros((n_frames, 75), dtype=np.uint8)
+	for index in range(n_frames):
+		messages = []
+		for number in range(len(MESSAGE_STARTS)):
+			beacon, beacon_length = pool[rng.integers(len(pool))]
+			if beacon_errors:
+				beacon = injectBeaconErrors(rng, beacon, beacon_length, beacon_errors)
+			sequence = 3*index + number
+			messages.append(encodeMessage(beacon, beacon_length, message_format, timecode=100*sequence,
+										doppler_word=int(200000*np.sin(sequence/5000.0)), level=int(rng.integers(64)), realtime=bool(rng.random() < 0.8)))
+		frame = encodeFrame(messages)
+		frames[index] = np.frombuffer(frame, dtype=np.uint8)
+		symbols[index] = encodeSymbols(frame)
+		if rng.random() < symbol_error_rate:
+			symbols[index] = injectSymbolErrors(rng, symbols[index], 1)
+	return symbols, frames
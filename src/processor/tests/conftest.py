@@ -0,0 +1,5 @@
+import os
+import sys
+
+#The processor modules are imported by their file name, like the scripts in the parent directory do
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
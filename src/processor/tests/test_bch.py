@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+from bch import checkBeacon, checkBeacons
+from synthetic import encodeBeacon, injectBeaconErrors, PROTOCOLS
+
+KNOWN_BEACON = 0xD6E6202820000C29FF51041775302D
+
+
+def beaconColumns(beacons):
+	'''
+	decodeMessages() style beacon and beacon_length columns of (beacon, length) pairs.
+	'''
+	column = np.array([np.frombuffer((beacon << (120 - length)).to_bytes(15, 'big'), dtype=np.uint8) for beacon, length in beacons])
+	return column, np.array([length for beacon, length in beacons])
+
+
+def syntheticBeacons(seed, n, max_errors):
+	rng = np.random.default_rng(seed)
+	originals, received = [], []
+	for index in range(n):
+		beacon, length = encodeBeacon(rng, PROTOCOLS[index % len(PROTOCOLS)], index % 2 == 0)
+		originals.append((beacon, length))
+		received.append((injectBeaconErrors(rng, beacon, length, index % (max_errors + 1)), length))
+	return originals, received
+
+
+def testKnownBeacon():
+	assert checkBeacon(KNOWN_BEACON, 120) == (0, 0, KNOWN_BEACON)
+
+
+def testCorrection():
+	originals, received = syntheticBeacons(1, 200, 2)
+	for (beacon, length), (bad, length) in zip(originals, received):
+		bch1_errors, bch2_errors, corrected = checkBeacon(bad, length)
+		assert bch1_errors >= 0 and (bch2_errors is None or bch2_errors >= 0)
+		assert corrected == beacon
+
+
+@pytest.mark.parametrize('max_errors', [0, 2, 5])
+def testBatchAgrees(max_errors):
+	originals, received = syntheticBeacons(2, 300, max_errors)
+	received.append((0, 0)) #no beacon
+	column, lengths = beaconColumns(received)
+	bch1_errors, bch2_errors, corrected = checkBeacons(column, lengths)
+	for index, (beacon, length) in enumerate(received[:-1]):
+		errors1, errors2, scalar = checkBeacon(beacon, length)
+		assert bch1_errors[index] == errors1
+		assert bch2_errors[index] == (errors2 if errors2 is not None else 0)
+		assert int.from_bytes(corrected[index].tobytes(), 'big') >> (120 - length) == scalar
+	assert bch1_errors[-1] == 0 and bch2_errors[-1] == 0
@@ -0,0 +1,46 @@
+import datetime
+import numpy as np
+import pytest
+from bitarray import util
+from BeaconMessage import BeaconMessage, decodeBeaconFields, decodeBeacons, beaconId, LAYOUTS
+from synthetic import encodeBeacon, PROTOCOLS
+
+KNOWN_BEACON = 0xD6E6202820000C29FF51041775302D
+
+#scalar keys that are not layout fields of the batch decode
+PROTOCOL_KEYS = ['protocol', 'protocol_name', 'protocol_name_shortened', 'protocol_num', 'location_protocol_num']
+
+
+def testKnownBeaconId():
+	assert beaconId(KNOWN_BEACON, 120) == 'ADCC40504000185'
+
+
+@pytest.mark.parametrize('length', [88, 120])
+def testCachedRecordImmutable(length):
+	beacon = KNOWN_BEACON >> (120 - length)
+	bits = format(beacon, '0{N}b'.format(N=length))
+	data = BeaconMessage(util.int2ba(beacon, length=length, endian='big'), datetime.datetime(2026, 1, 1)).data
+	assert data['BCH-1'] == bits[61:82]
+	assert data['BCH-2'] == (bits[108:120] if length == 120 else 'N/A')
+	assert all(isinstance(value, (str, int, float, bool)) for value in data.values())
+	with pytest.raises(TypeError):
+		data['BCH-1'] = '0'
+
+
+@pytest.mark.parametrize('long_fraction', [0.0, 0.5, 1.0])
+def testBatchAgrees(long_fraction):
+	rng = np.random.default_rng(3)
+	beacons = [encodeBeacon(rng, PROTOCOLS[index % len(PROTOCOLS)], rng.random() < long_fraction) for index in range(10*len(PROTOCOLS))]
+	column = np.array([np.frombuffer((beacon << (120 - length)).to_bytes(15, 'big'), dtype=np.uint8) for beacon, length in beacons])
+	columns = decodeBeacons(column, np.array([length for beacon, length in beacons]))
+
+	for index, (beacon, length) in enumerate(beacons):
+		data = decodeBeaconFields(beacon, length)
+		assert LAYOUTS[columns['layout'][index]].shortened == data['protocol_name_shortened']
+		for name, value in data.items():
+			if name in PROTOCOL_KEYS:
+				continue
+			if name in ('latitude', 'longitude'):
+				assert columns[name][index] == pytest.approx(value, nan_ok=True)
+			else:
+				assert columns[name][index] == value, name
@@ -0,0 +1,82 @@
+import datetime
+import pytest
+from SARPFrame import SARPFrame
+from SARPDatabase import SARPDatabase, SARPQuery
+from synthetic import generateFrames
+
+TIME = datetime.datetime(2026, 1, 1, 12)
+
+
+def makeMessages(n_frames, message_format='SARSAT SARP-3'):
+	'''
+	Messages of n_frames frames one second apart, frames alternate between source 0 and 1.
+	'''
+	symbols, frames = generateFrames(n_frames, message_format, seed=13, beacon_errors=1)
+	messages = []
+	for index, frame in enumerate(frames):
+		sarp_frame = SARPFrame(frame.tobytes(), message_format, TIME + datetime.timedelta(seconds=index), index % 2)
+		messages.append([sarp_frame.message1, sarp_frame.message2, sarp_frame.message3])
+	return messages
+
+
+@pytest.fixture(scope='module')
+def frames():
+	return makeMessages(40)
+
+
+@pytest.fixture
+def query(frames, tmp_path):
+	filename = str(tmp_path / 'messages.db')
+	database = SARPDatabase(filename, batch_size=16, flush_interval=0.05)
+	for messages in frames:
+		database.newMessages(messages)
+	database.close()
+	assert (database.rows, database.dropped, database.skipped) == (3*len(frames), 0, 0)
+	query = SARPQuery(filename)
+	yield query
+	query.close()
+
+
+def testTimeRange(frames, query):
+	messages = [message for messages in frames for message in messages]
+	rows = list(query.timeRange())
+	assert [row['message_hex'] for row in rows] == [message.bytes.hex().upper() for message in messages]
+	for row, message in zip(rows, messages):
+		beacon = message.beacon_message.data
+		assert datetime.datetime.fromisoformat(row['time']) == message.message_creation_time
+		assert row['source'] == message.source
+		assert row['message_format'] == 'SARSAT SARP-3'
+		assert row['format'] == message.record.format
+		assert row['timecode'] == message.record.timecode
+		assert row['abs_freq'] == pytest.approx(message.record.abs_freq)
+		assert row['beacon_hex'] == beacon['beacon_hex'].upper()
+		assert row['beacon_id'] == beacon['beacon_id']
+		assert row['bch_valid'] == beacon['bch_valid']
+		assert row['bch2_errors'] == (beacon['BCH-2_errors'] if beacon['BCH-2_errors'] != 'N/A' else None)
+		assert row['latitude'] == (pytest.approx(beacon['latitude']) if beacon['latitude'] == beacon['latitude'] else None)
+
+	start, stop = TIME + datetime.timedelta(seconds=10), TIME + datetime.timedelta(seconds=20)
+	rows = list(query.timeRange(start, stop))
+	assert [row['message_hex'] for row in rows] == [message.bytes.hex().upper() for messages in frames[10:20] for message in messages]
+	valid = list(query.timeRange(valid_only=True))
+	assert len(valid) == sum(message.bch_valid for message in messages) and all(row['bch_valid'] for row in valid)
+
+
+def testBeaconHistory(frames, query):
+	message = frames[3][1]
+	beacon_id = message.beacon_message.data['beacon_id']
+	expected = [other.bytes.hex().upper() for messages in frames for other in messages
+				if other.beacon_message.data['beacon_id'] == beacon_id]
+	assert [row['message_hex'] for row in query.beaconHistory(beacon_id.lower())] == expected
+	assert [row['message_hex'] for row in query.beaconHistory(message.beacon_message.data['beacon_hex'])] == [message.bytes.hex().upper()]
+
+
+def testBeacons(frames, query):
+	messages = [message for messages in frames for message in messages if message.bch_valid]
+	beacons = {row['beacon_id']: row for row in query.beacons()}
+	assert set(beacons) == set(message.beacon_message.data['beacon_id'] for message in messages)
+	assert sum(row['messages'] for row in beacons.values()) == len(messages)
+	for row in beacons.values():
+		times = [message.message_creation_time for message in messages if message.beacon_message.data['beacon_id'] == row['beacon_id']]
+		assert datetime.datetime.fromisoformat(row['first']) == min(times)
+		assert datetime.datetime.fromisoformat(row['last']) == max(times)
@@ -0,0 +1,73 @@
+import datetime
+import numpy as np
+from DecodePipeline import DecodePipeline
+from synthetic import generateFrames
+
+TIME = datetime.datetime(2026, 1, 1)
+FORMAT = 'SARSAT SARP-3'
+
+
+def makePayloads(n_payloads):
+	'''
+	Symbols of valid frames with an undecodable payload every 7th and a short payload every 11th, the short ones
+	are decoded in the submitting thread and so overtake the payloads in the pool.
+	'''
+	symbols, frames = generateFrames(n_payloads, FORMAT, seed=17)
+	payloads = [symbols[index] for index in range(n_payloads)]
+	for index in range(0, n_payloads, 7):
+		payloads[index] = np.zeros_like(payloads[index])
+	for index in range(3, n_payloads, 11):
+		payloads[index] = payloads[index][:600]
+	return payloads, frames
+
+
+def submitAll(pipeline, payloads, batch=5):
+	'''
+	Submit like the receiver: at most available() payloads at a time, flushed in small tasks so the workers finish them out of order.
+	'''
+	index = 0
+	while index < len(payloads):
+		for _ in range(min(batch, pipeline.available(1.0), len(payloads) - index)):
+			assert pipeline.submit(payloads[index], FORMAT, index % 4, TIME + datetime.timedelta(milliseconds=index))
+			index += 1
+		pipeline.flush()
+
+
+def testOrderRestored():
+	payloads, frames = makePayloads(300)
+	delivered = []
+
+	def deliver(source, sarp_frame, error, symbols, creation_time):
+		delivered.append((source, sarp_frame, error, symbols.copy(), creation_time))
+
+	pipeline = DecodePipeline(deliver, workers=2, n_slots=16)
+	submitAll(pipeline, payloads)
+	pipeline.close()
+
+	assert len(delivered) == len(payloads)
+	for index, (source, sarp_frame, error, symbols, creation_time) in enumerate(delivered):
+		assert source == index % 4
+		assert creation_time == TIME + datetime.timedelta(milliseconds=index)
+		assert (symbols == payloads[index]).all()
+		if index % 7 == 0 or index % 11 == 3:
+			assert sarp_frame is None and error
+		else:
+			assert error is None
+			assert sarp_frame.bytes == frames[index].tobytes()
+			assert sarp_frame.source == source and sarp_frame.frame_creation_time == creation_time
+
+
+def testFailedDeliveryFreesSlot():
+	payloads, frames = makePayloads(60)
+	delivered = []
+
+	def deliver(source, sarp_frame, error, symbols, creation_time):
+		delivered.append(creation_time)
+		if len(delivered) % 5 == 0:
+			raise RuntimeError('consumer failed')
+
+	pipeline = DecodePipeline(deliver, workers=2, n_slots=4)
+	submitAll(pipeline, payloads, batch=4)
+	pipeline.close()
+
+	assert delivered == [TIME + datetime.timedelta(milliseconds=index) for index in range(len(payloads))]
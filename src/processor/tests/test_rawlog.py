@@ -0,0 +1,96 @@
+import os
+import glob
+import datetime
+import numpy as np
+import pytest
+from manchester import FRAME_SYMBOLS
+from rawlog import RawArchiveWriter, RawArchive, isArchive, formatCode, INDEX_EXTENSION, INDEX_DTYPE
+from synthetic import generateFrames
+
+TIME = datetime.datetime(2026, 1, 1, 12)
+FORMATS = ['SARSAT SARP-3', 'SARSAT SARP-2', None]
+
+
+def writeArchive(prefix, n_records=60):
+	'''
+	One pass of payloads 10 ms apart, with a frame for every second one, a short payload and a record without a message format.
+	'''
+	symbols, frames = generateFrames(n_records, seed=3)
+	payloads = [symbols[index] for index in range(n_records)]
+	payloads[7] = payloads[7][:600]
+	records = []
+	writer = RawArchiveWriter(prefix, pass_gap=60, buffer_size=4096)
+	for index, payload in enumerate(payloads):
+		record = (TIME + datetime.timedelta(milliseconds=10*index), index % 2, payload,
+				frames[index].tobytes() if index % 2 == 0 else None, FORMATS[index % 3])
+		writer.write(*record)
+		records.append(record)
+	writer.close()
+	return writer.filename, records
+
+
+def checkRecords(archive, records):
+	assert len(archive) == len(records)
+	for record, (time, source, symbols, frame, message_format) in zip(archive, records):
+		assert record.time == time
+		assert record.source == source
+		assert (record.symbols == symbols).all()
+		assert record.frame == frame
+		assert record.message_format == message_format
+
+
+def testRoundTrip(tmp_path):
+	filename, records = writeArchive(str(tmp_path / 'sarp_raw'))
+	assert isArchive(filename)
+	archive = RawArchive(filename)
+	checkRecords(archive, records)
+
+	assert archive.find(TIME) == 0
+	assert archive.find(TIME + datetime.timedelta(milliseconds=105)) == 11
+	assert archive.find(TIME + datetime.timedelta(hours=1)) == len(records)
+
+	symbols, times, sources, formats = archive.symbolFrames(5, 10)
+	assert symbols.shape == (5, FRAME_SYMBOLS)
+	assert (symbols[0] == records[5][2]).all() and not symbols[2].any() #the short payload is left 0
+	assert times[0] == np.datetime64(records[5][0], 'us')
+	assert sources.tolist() == [record[1] for record in records[5:10]]
+	assert formats.tolist() == [formatCode(record[4]) for record in records[5:10]] == [0, 2, 1, 0, 2]
+
+
+@pytest.mark.parametrize('damage', ['missing', 'empty', 'short'])
+def testIndexRebuilt(tmp_path, damage):
+	filename, records = writeArchive(str(tmp_path / 'sarp_raw'))
+	index_file = filename + INDEX_EXTENSION
+	expected = np.fromfile(index_file, dtype=INDEX_DTYPE)
+	if damage == 'missing':
+		os.remove(index_file)
+	else:
+		with open(index_file, 'r+b') as file:
+			file.truncate(0 if damage == 'empty' else 20*INDEX_DTYPE.itemsize)
+
+	archive = RawArchive(filename)
+	assert (archive.index == expected).all()
+	checkRecords(archive, records)
+
+
+def testTruncatedArchive(tmp_path):
+	'''
+	Records still in the write buffer when the process stopped are left out, the index is cut to the complete records.
+	'''
+	filename, records = writeArchive(str(tmp_path / 'sarp_raw'))
+	offsets = np.fromfile(filename + INDEX_EXTENSION, dtype=INDEX_DTYPE)['offset']
+	with open(filename, 'r+b') as file:
+		file.truncate(int(offsets[40]) + 10)
+	checkRecords(RawArchive(filename), records[:40])
+
+
+def testPassRotation(tmp_path):
+	prefix = str(tmp_path / 'sarp_raw')
+	symbols, frames = generateFrames(4, seed=3)
+	writer = RawArchiveWriter(prefix, pass_gap=60)
+	for index, minutes in enumerate([0, 0.5, 5, 5.5]):
+		writer.write(TIME + datetime.timedelta(minutes=minutes), 0, symbols[index], frames[index].tobytes(), 'SARSAT SARP-3')
+	writer.close()
+	files = sorted(glob.glob(prefix + '_*.raw'))
+	assert len(files) == 2
+	assert [len(RawArchive(filename)) for filename in files] == [2, 2]
@@ -0,0 +1,180 @@
+import datetime
+import numpy as np
+import pytest
+from SARPMessage import SARPMessage, decodeMessages, FORMAT_NAMES, HK_WORD2, MESSAGE_DECODERS, NA
+from synthetic import generateFrames, SYNTHETIC_FORMATS
+
+NAN = float('nan')
+TIME = datetime.datetime(2026, 1, 1)
+
+#Messages made by synthetic.encodeMessage from encodeBeacon beacons (numpy seed 2026), some with injected beacon bit errors:
+#(format, message, beacon format, timecode, doppler word, level, rt/pb, (BCH-1, BCH-2 errors), protocol_num,
+# corrected beacon hex, beacon ID, protocol, latitude, longitude)
+VECTORS = [
+	('SARSAT SARP-3', 'D607D10007D056E712DA04ACCE2EAABC1900006072000001', 'SHORT', 1000, 12345, 17, 'REALTIME', (0, None), 3,
+		'56E712DA04ACCE2EAABC19', 'ADCE25B409599C5', 'Serial User', NAN, NAN),
+	('SARSAT SARP-3', 'D60792000898D6E48F5DE5E69E70A96A17C7F650AEFF3F1D', 'LONG', 1100, -24690, 18, 'PLAYBACK', (1, 0), 2,
+		'D6E48F5DE5E69E70A96E17C7F650AE', 'ADC91EBBCBCD3CE', 'EPIRB User', -62.2, NAN),
+	('SARSAT SARP-3', 'D607D300096096E2DB5A286BC0D1EB619F19D7F68E012157', 'LONG', 1200, 37035, 19, 'REALTIME', (0, 2), NA,
+		'96E2DB5A286BC0D1EB619719D7FE8E', '2DC5B6B450FFBFF', 'Std Loc EPIRB MMSI', NAN, 6.5),
+	('SARSAT SARP-3', 'D60794000A2896ED672D4FB3C3DBB08AA8B9C72F51FE7E38', 'LONG', 1300, -49380, 20, 'PLAYBACK', (0, 0), NA,
+		'96ED672D4FB3C3DBB08AA8B9C72F51', '2DDACE5A9F6787B', 'RLS Loc', NAN, NAN),
+	('SARSAT SARP-3', 'D607D5000AF056EC3519F6915D5CE95F2C0001E23B000001', 'SHORT', 1400, 61725, 21, 'REALTIME', (2, None), 6,
+		'56EC3519F6915D4CE94F2C', 'ADD86A33ED22BA9', 'EPIRB - Radio Call', NAN, NAN),
+	('SARSAT SARP-2', 'D600D10007D0ADCF91440053573A1FEA3000006072000001', 'SHORT', 1000, 12345, 17, 'REALTIME', (0, None), 3,
+		'56E7C8A20029AB9D0FF518', 'ADCF91440053573', 'Serial User', NAN, NAN),
+	('SARSAT SARP-2', 'D60192000898ADC9C3066B9205427CE10A24FAD0BAFF3F1D', 'LONG', 1100, -24690, 18, 'PLAYBACK', (1, 0), 2,
+		'D6E4E18335C900A13E7085127D685D', 'ADC9C3066B92014', 'EPIRB User', 40.6, 125.4),
+	('SARSAT SARP-2', 'D601D30009602DC5D6EBECD378A8FB7886EDA014E2012157', 'LONG', 1200, 37035, 19, 'REALTIME', (2, 0), NA,
+		'96E2CB75B669BC547DBC4376D00A71', '2DC596EB6CFFBFF', 'Std Loc EPIRB MMSI', NAN, NAN),
+	('SARSAT SARP-2', 'D60194000A282DDB25B583DD370ED5B8BB11399628FE7E38', 'LONG', 1300, -49380, 20, 'PLAYBACK', (0, 0), NA,
+		'96ED92DAC1EE9B876ADC5D889CCB14', '2DDB25B583DD370', 'RLS Loc', NAN, NAN),
+	('SARSAT SARP-2', 'D600D5000AF0EDDAA0DC3066A48B6841380001E23B000001', 'SHORT', 1400, 61725, 21, 'REALTIME', (2, None), 6,
+		'56ED506E1A335245B4209C', 'ADDAA0DC3466A48', 'EPIRB - Radio Call', NAN, NAN),
+	]
+
+#SARPMessage.data of the original bit by bit decoder for the same messages, with the keys in its order. The one deliberate
+#difference is format_valid of the HK message, which is False instead of 'N/A'.
+GOLDEN = [
+	('SARSAT SARP-3', 'D607D10007D056E712DA04ACCE2EAABC1900006072000001', {
+		'message_creation_time': '2026-01-01 00:00:00', 'message_format': 'SARSAT SARP-3', 'format': 'SHORT', 'format_valid': True,
+		'level': 17, 'level_dbm': -130.65, 'rt/pb': 'REALTIME', 'latest': 'Most recent message', 'dru': 'N/A', 'pseudo': 'N/A',
+		'type': 'C/S T.001', 's/no': 3, 's/no_db': '41.1', 'timecode': 1000, 'timecode_parity_valid': True, 'doppler_word': 12345,
+		'abs_freq': 406050185.17499995, 'doppler_parity_valid': True,
+		'beacon_bits': '0101011011100111000100101101101000000100101011001100111000101110101010101011110000011001',
+		'beacon_hex': '56e712da04acce2eaabc19'}),
+	('SARSAT SARP-3', 'D60792000898D6E48F5DE5E69E70A96A17C7F650AEFF3F1D', {
+		'message_creation_time': '2026-01-01 00:00:00', 'message_format': 'SARSAT SARP-3', 'format': 'LONG', 'format_valid': True,
+		'level': 18, 'level_dbm': -130.1, 'rt/pb': 'PLAYBACK', 'latest': 'Most recent message', 'dru': 'N/A', 'pseudo': 'N/A',
+		'type': 'C/S T.001', 's/no': 3, 's/no_db': '41.1', 'timecode': 1100, 'timecode_parity_valid': True, 'doppler_word': -24690,
+		'abs_freq': 406049629.6499999, 'doppler_parity_valid': 'N/A',
+		'beacon_bits': '110101101110010010001111010111011110010111100110100111100111000010101001011010100001011111000111111101100101000010101110',
+		'beacon_hex': 'd6e48f5de5e69e70a96a17c7f650ae', 'doppler_parity': True}),
+	('SARSAT SARP-2', 'D60192000898ADC9C3066B9205427CE10A24FAD0BAFF3F1D', {
+		'message_creation_time': '2026-01-01 00:00:00', 'message_format': 'SARSAT SARP-2', 'format': 'LONG', 'format_valid': True,
+		'level': 18, 'level_dbm': -130.1, 'rt/pb': 'PLAYBACK', 'latest': 'Most recent message', 'dru': 3, 'pseudo': False, 'type': 'N/A',
+		's/no': 'N/A', 's/no_db': 'N/A', 'timecode': 1100, 'timecode_parity_valid': True, 'doppler_word': -24690,
+		'abs_freq': 406049629.6499999, 'doppler_parity_valid': 'N/A',
+		'beacon_bits': '110101101110010011100001100000110011010111001001000000101010000100111110011100001000010100010010011111010110100001011101',
+		'beacon_hex': 'd6e4e18335c902a13e7085127d685d', 'doppler_parity': True}),
+	('SARSAT SARP-2', 'D600D10007D0ADCF91440053573A1FEA3000006072000001', {
+		'message_creation_time': '2026-01-01 00:00:00', 'message_format': 'SARSAT SARP-2', 'format': 'SHORT', 'format_valid': True,
+		'level': 17, 'level_dbm': -130.65, 'rt/pb': 'REALTIME', 'latest': 'Most recent message', 'dru': 1, 'pseudo': False,
+		'type': 'N/A', 's/no': 'N/A', 's/no_db': 'N/A', 'timecode': 1000, 'timecode_parity_valid': True, 'doppler_word': 12345,
+		'abs_freq': 406050185.17499995, 'doppler_parity_valid': True,
+		'beacon_bits': '0101011011100111110010001010001000000000001010011010101110011101000011111111010100011000',
+		'beacon_hex': '56e7c8a20029ab9d0ff518'}),
+	('SARSAT SARP-3', 'D607D10007D0CE3E00DA04ACCE2EAABC1900006072000001', {
+		'message_creation_time': '2026-01-01 00:00:00', 'message_format': 'SARSAT SARP-3', 'format': 'N/A', 'format_valid': False,
+		'level': 17, 'level_dbm': -130.65, 'rt/pb': 'REALTIME', 'latest': 'Most recent message', 'dru': 'N/A', 'pseudo': 'N/A',
+		'type': 'C/S T.001', 's/no': 3, 's/no_db': '41.1', 'timecode': 1000, 'timecode_parity_valid': True, 'doppler_word': 'N/A',
+		'abs_freq': 'N/A', 'doppler_parity_valid': 'N/A', 'beacon_bits': 'N/A', 'beacon_hex': 'N/A'}),
+	('SARSAT SARP-3', 'D607D300096096E2DB5A286BC0D1EB619F19D7F68E000000', {
+		'message_creation_time': '2026-01-01 00:00:00', 'message_format': 'SARSAT SARP-3', 'format': 'LONG', 'format_valid': True,
+		'level': 19, 'level_dbm': -129.55, 'rt/pb': 'REALTIME', 'latest': 'Most recent message', 'dru': 'N/A', 'pseudo': 'N/A',
+		'type': 'C/S T.001', 's/no': 3, 's/no_db': '41.1', 'timecode': 1200, 'timecode_parity_valid': True, 'doppler_word': 0,
+		'abs_freq': 406049999.99999994, 'doppler_parity_valid': 'N/A',
+		'beacon_bits': '100101101110001011011011010110100010100001101011110000001101000111101011011000011001111100011001110101111111011010001110',
+		'beacon_hex': '96e2db5a286bc0d1eb619f19d7f68e', 'doppler_parity': True}),
+	('COSPAS SARP-2', 'D607D10007D056E712DA04ACCE2EAABC1900006072000001', {
+		'message_creation_time': '2026-01-01 00:00:00', 'message_format': 'COSPAS SARP-2', 'format': 'SHORT', 'format_valid': False,
+		'level': 'N/A', 'level_dbm': 'N/A', 'rt/pb': 'N/A', 'latest': 'N/A', 'dru': 'N/A', 'pseudo': 'N/A', 'type': 'N/A', 's/no': 'N/A',
+		's/no_db': 'N/A', 'timecode': 'N/A', 'timecode_parity_valid': 'N/A', 'doppler_word': 'N/A', 'abs_freq': 'N/A',
+		'doppler_parity_valid': 'N/A', 'beacon_bits': 'N/A', 'beacon_hex': 'N/A'}),
+	('COSPAS SARP-2', 'D60792000898D6E48F5DE5E69E70A96A17C7F650AEFF3F1D', {
+		'message_creation_time': '2026-01-01 00:00:00', 'message_format': 'COSPAS SARP-2', 'format': 'LONG', 'format_valid': False,
+		'level': 'N/A', 'level_dbm': 'N/A', 'rt/pb': 'N/A', 'latest': 'N/A', 'dru': 'N/A', 'pseudo': 'N/A', 'type': 'N/A', 's/no': 'N/A',
+		's/no_db': 'N/A', 'timecode': 'N/A', 'timecode_parity_valid': 'N/A', 'doppler_word': 'N/A', 'abs_freq': 'N/A',
+		'doppler_parity_valid': 'N/A', 'beacon_bits': 'N/A', 'beacon_hex': 'N/A'}),
+	('bogus', 'D60792000898D6E48F5DE5E69E70A96A17C7F650AEFF3F1D', {
+		'message_creation_time': '2026-01-01 00:00:00', 'message_format': 'bogus', 'format': 'LONG', 'format_valid': 'N/A',
+		'level': 'N/A', 'level_dbm': 'N/A', 'rt/pb': 'N/A', 'latest': 'N/A', 'dru': 'N/A', 'pseudo': 'N/A', 'type': 'N/A', 's/no': 'N/A',
+		's/no_db': 'N/A', 'timecode': 'N/A', 'timecode_parity_valid': 'N/A', 'doppler_word': -24690, 'abs_freq': 406049629.6499999,
+		'doppler_parity_valid': 'N/A',
+		'beacon_bits': '101011101111001011110011010011110011100001010100101101010000101111100011111110110010100001010111011111111001111110001110',
+		'beacon_hex': 'aef2f34f3854b50be3fb28577f9f8e', 'doppler_parity': True}),
+	]
+
+
+def hkMessage(message):
+	return message[:6] + HK_WORD2.to_bytes(3, 'big') + message[9:]
+
+
+@pytest.mark.parametrize('message_format, message, format, timecode, doppler_word, level, rt_pb, errors, protocol_num, beacon_hex, beacon_id, protocol, latitude, longitude', VECTORS)
+def testMessageVectors(message_format, message, format, timecode, doppler_word, level, rt_pb, errors, protocol_num, beacon_hex, beacon_id, protocol, latitude, longitude):
+	sarp_message = SARPMessage(bytes.fromhex(message), TIME, message_format)
+	record = sarp_message.record
+	assert record.format == format
+	assert record.format_valid is True
+	assert record.timecode == timecode and record.timecode_parity_valid
+	assert record.doppler_word == doppler_word
+	assert record.abs_freq == pytest.approx(406050000 + doppler_word*0.015)
+	assert record.level == level
+	assert record.rt_pb == rt_pb
+	assert record.beacon_length == (88 if format == 'SHORT' else 120)
+
+	assert sarp_message.bch[:2] == errors
+	assert sarp_message.bch_valid
+	assert sarp_message.protocol_num == protocol_num
+
+	data = sarp_message.beacon_message.data
+	assert data['beacon_hex'].upper() == beacon_hex
+	assert data['beacon_id'] == beacon_id
+	assert data['protocol_name_shortened'] == protocol
+	assert data['country_code'] == 366
+	assert data['latitude'] == pytest.approx(latitude, nan_ok=True)
+	assert data['longitude'] == pytest.approx(longitude, nan_ok=True)
+
+
+@pytest.mark.parametrize('message_format, message, data', GOLDEN)
+def testGoldenData(message_format, message, data):
+	assert list(SARPMessage(bytes.fromhex(message), TIME, message_format).data.items()) == list(data.items())
+
+
+@pytest.mark.parametrize('message_format', SYNTHETIC_FORMATS)
+def testHKMessage(message_format):
+	message = hkMessage(bytes.fromhex(VECTORS[0][1]))
+	sarp_message = SARPMessage(message, TIME, message_format)
+	assert sarp_message.record.format == NA
+	assert sarp_message.record.format_valid is False
+	assert sarp_message.record.beacon is None
+	assert sarp_message.beacon_message is None
+	assert not sarp_message.bch_valid
+
+	columns = decodeMessages(np.frombuffer(message, dtype=np.uint8), message_format)
+	assert FORMAT_NAMES[columns['format'][0]] == NA
+	assert not columns['format_valid'][0]
+	assert columns['beacon_length'][0] == 0
+
+
+@pytest.mark.parametrize('message_format', SYNTHETIC_FORMATS)
+def testBatchDecodeAgrees(message_format):
+	symbols, frames = generateFrames(200, message_format, seed=7, beacon_errors=1)
+	messages = np.concatenate([frames[:, start:start + 24] for start in (0, 24, 48)])
+	messages[::17] = np.frombuffer(hkMessage(bytes(24)), dtype=np.uint8)
+	messages[5::17, 21:24] = 0 #long format without the format flag
+	columns = decodeMessages(messages, message_format)
+	assert columns['format_valid'].any() and not columns['format_valid'].all()
+
+	for index, message in enumerate(messages):
+		record = SARPMessage(message.tobytes(), TIME, message_format).record
+		assert FORMAT_NAMES[columns['format'][index]] == record.format
+		assert columns['format_valid'][index] == record.format_valid
+		assert columns['timecode'][index] == record.timecode
+		assert columns['level'][index] == record.level
+		if record.beacon is None:
+			assert columns['beacon_length'][index] == 0
+			continue
+		length = int(columns['beacon_length'][index])
+		assert length == record.beacon_length
+		assert int.from_bytes(columns['beacon'][index].tobytes(), 'big') >> (120 - length) == record.beacon
+		assert columns['doppler_word'][index] == record.doppler_word
+		assert columns['abs_freq'][index] == record.abs_freq
+
+
+def testUnsupportedFormatWarnsOnce(caplog, capsys):
+	MESSAGE_DECODERS.pop('COSPAS SARP-2', None)
+	for message in VECTORS[:2]:
+		SARPMessage(bytes.fromhex(message[1]), TIME, 'COSPAS SARP-2').record
+	assert [record.levelname for record in caplog.records] == ['WARNING']
+	assert capsys.readouterr().out == ''
@@ -0,0 +1,84 @@
+import datetime
+import numpy as np
+import pytest
+from SARPFrame import SARPFrame
+from SARPStore import SARPFrameStore, SARPMessageStore
+from synthetic import generateFrames
+
+TIME = datetime.datetime(2026, 1, 1)
+CAPACITY = 100
+
+
+def makeMessages(n_frames, message_format='SARSAT SARP-3'):
+	symbols, frames = generateFrames(n_frames, message_format, seed=11, beacon_errors=1)
+	messages = []
+	for index, frame in enumerate(frames):
+		sarp_frame = SARPFrame(frame.tobytes(), message_format, TIME + datetime.timedelta(seconds=index), index % 3)
+		messages.extend((sarp_frame.message1, sarp_frame.message2, sarp_frame.message3))
+	return messages
+
+
+@pytest.fixture(scope='module')
+def messages():
+	return makeMessages(120)
+
+
+def fillStore(messages, spill_file=None, cache_size=16):
+	store = SARPMessageStore(CAPACITY, spill_file, cache_size)
+	for seq, message in enumerate(messages):
+		assert store.appendMessage(message) == seq
+	return store
+
+
+def testSpillReadRange(messages, tmp_path):
+	store = fillStore(messages, str(tmp_path / 'messages.bin'))
+	assert store.count == len(messages) and len(store) == CAPACITY and store.first() == len(messages) - CAPACITY
+
+	rows = store.readRange(0, len(messages))
+	assert len(rows) == len(messages)
+	assert [row.tobytes() for row in rows['bytes']] == [message.bytes for message in messages]
+	assert (rows['time'] == np.array([message.message_creation_time for message in messages], dtype='datetime64[us]')).all()
+	assert rows['source'].tolist() == [message.source for message in messages]
+	assert rows['bch_valid'].tolist() == [message.bch_valid for message in messages]
+
+	#ranges within the spill file, across the boundary, in memory and past the end
+	first = store.first()
+	for start, stop in [(10, 50), (first - 30, first + 30), (first + 5, first + 60), (len(messages) - 10, len(messages) + 10)]:
+		part = store.readRange(start, stop)
+		assert (part == rows[start:stop]).all(), (start, stop)
+	assert (store.rowRange(0, len(messages)) == rows[first:]).all()
+	assert (store.column('timecode') == rows['timecode'][first:]).all()
+	store.close()
+
+
+def testSpilledRowsRebuilt(messages, tmp_path):
+	store = fillStore(messages, str(tmp_path / 'messages.bin'))
+	for seq in (0, 1, store.first() - 1, store.first(), len(messages) - 1):
+		message = store.get(seq)
+		assert message.bytes == messages[seq].bytes
+		assert message.message_creation_time == messages[seq].message_creation_time
+		assert message.source == messages[seq].source
+		assert message.data == messages[seq].data
+	assert store.get(len(messages)) is None
+	assert [message.bytes for message in store] == [message.bytes for message in messages[store.first():]]
+	store.close()
+
+
+def testWithoutSpill(messages):
+	store = fillStore(messages)
+	rows = store.readRange(0, len(messages))
+	assert len(rows) == CAPACITY
+	assert [row.tobytes() for row in rows['bytes']] == [message.bytes for message in messages[-CAPACITY:]]
+	assert store.row(0) is None and store.get(0) is None
+	assert store[0].bytes == messages[-CAPACITY].bytes and store[-1].bytes == messages[-1].bytes
+
+
+def testFrameStoreSpill(tmp_path):
+	symbols, frames = generateFrames(250, 'SARSAT SARP-2', seed=5)
+	store = SARPFrameStore(CAPACITY, str(tmp_path / 'frames.bin'), cache_size=0)
+	for index, frame in enumerate(frames):
+		store.appendFrame(SARPFrame(frame.tobytes(), 'SARSAT SARP-2', TIME + datetime.timedelta(seconds=index), 1))
+	rows = store.readRange(0, len(frames))
+	assert (rows['bytes'] == frames).all()
+	assert store.get(3).bytes == frames[3].tobytes() and store.get(3).message_format == 'SARSAT SARP-2'
+	store.close()